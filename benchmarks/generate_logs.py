@@ -0,0 +1,199 @@
+import io
+import os
+import gzip
+import json
+import random
+import argparse
+from itertools import accumulate
+from datetime import datetime, timedelta, timezone
+
+# Deterministic synthetic Apache logs for the benchmarks: combined-format
+# access logs and a mix of 2.2 and 2.4 style error logs, split into a current
+# file and dated rotations, some of them gzip-compressed. The same arguments
+# always produce byte-identical files.
+
+METHODS = ['GET'] * 90 + ['POST'] * 8 + ['HEAD', 'PUT']
+STATUSES = [200] * 80 + [304] * 6 + [301, 302] * 2 + [404] * 4 + [403, 500, 502, 503]
+PATHS = ['/', '/index.html', '/favicon.ico', '/robots.txt', '/login', '/logout', '/search',
+         '/api/v1/items', '/api/v1/users', '/static/css/site.css', '/static/js/app.js', '/blog', '/about']
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15',
+    'Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148',
+    'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
+    'curl/8.4.0',
+    'python-requests/2.31.0',
+    '-',
+]
+REFERERS = ['-', 'https://www.google.com/', 'https://example.com/', 'https://example.com/blog']
+ERROR_LEVELS = ['error'] * 6 + ['warn'] * 3 + ['notice', 'crit']
+ERROR_MODULES = ['core', 'authz_core', 'proxy', 'ssl', 'php']
+ERROR_MESSAGES = [
+    ('AH00128', 'File does not exist: /var/www/html{path}'),
+    ('AH01630', 'client denied by server configuration: /var/www/html{path}'),
+    ('AH01276', 'Cannot serve directory /var/www/html{path}: No matching DirectoryIndex'),
+    ('AH00124', 'Request exceeded the limit of 10 internal redirects due to probable configuration error.'),
+    ('AH01114', 'HTTP: failed to make connection to backend: 127.0.0.1'),
+    ('AH02032', 'Hostname example.com provided via SNI and hostname {ip} provided via HTTP are different'),
+]
+START = datetime(2026, 1, 1, tzinfo=timezone(timedelta(hours=-3)))
+BLOCK = 10000
+# Requests of one burst, written within the same second: a page view and its
+# assets, a crawler fetching a batch of URLs
+BURST_SIZES = [1] * 3 + [2, 3, 4, 5, 6, 8, 10, 12, 16]
+# Bumped whenever the same arguments start producing different files
+VERSION = 2
+
+# Command line options
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Genera logs sintéticos de Apache deterministas para los benchmarks.")
+    parser.add_argument('output_dir', help="Directorio donde se escriben los logs")
+    parser.add_argument('--lines', type=lambda value: int(float(value)), default=100000,
+                        help="Líneas del log de acceso (admite notación 1e6)")
+    parser.add_argument('--error-lines', type=lambda value: int(float(value)), default=None,
+                        help="Líneas del log de errores (por defecto, 1/20 de --lines)")
+    parser.add_argument('--days', type=int, default=90, help="Días cubiertos por los logs")
+    parser.add_argument('--rotations', type=int, default=3, help="Archivos rotados además del actual")
+    parser.add_argument('--gzip-ratio', type=float, default=0.5,
+                        help="Fracción de las rotaciones comprimidas con gzip (las más antiguas)")
+    parser.add_argument('--gzip-level', type=int, default=6, help="Nivel de compresión gzip")
+    parser.add_argument('--error-24-ratio', type=float, default=0.5,
+                        help="Fracción de líneas de error con el formato de Apache 2.4")
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args()
+
+# Skewed pools: a few IPs and URLs get most of the traffic, as in real logs
+def build_pools(rng):
+    ips = [f'{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}' for _ in range(5000)]
+    urls = PATHS + [f'/articles/{n}' for n in range(2000)] + [f'/search?q=term{n}' for n in range(500)]
+    ip_weights = list(accumulate(1.0 / (rank + 1) for rank in range(len(ips))))
+    url_weights = list(accumulate(1.0 / (rank + 1) for rank in range(len(urls))))
+    return ips, ip_weights, urls, url_weights
+
+# Split total lines into the files of one log, oldest rotation first. Returns
+# (file name, line count, compressed) in chronological order.
+def plan_files(prefix, total, days, rotations, gzip_ratio):
+    compressed = round(rotations * gzip_ratio)
+    files = []
+    for index in range(rotations):
+        # Named after the day the rotation happened, like logrotate's dateext
+        stamp = (START + timedelta(days=days) * (index + 1) / (rotations + 1)).strftime('%Y%m%d')
+        name = f'{prefix}-{stamp}'
+        if index < compressed:
+            files.append((name + '.gz', True))
+        else:
+            files.append((name, False))
+    files.append((prefix, False))
+    share = total // len(files)
+    counts = [share] * len(files)
+    counts[-1] += total - share * len(files)
+    return [(name, count, is_gz) for (name, is_gz), count in zip(files, counts)]
+
+# Compressed files get a fixed header mtime so reruns are byte-identical
+def open_output(path, compressed, level):
+    if compressed:
+        return io.TextIOWrapper(gzip.GzipFile(path, 'wb', level, mtime=0), encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+# Timestamps of the lines of one log: bursts of several requests in the same
+# second, spread evenly over the period, as a real server sees its traffic
+def burst_timestamps(rng, total, days):
+    step = timedelta(days=days) / max(total, 1)
+    index = 0
+    while index < total:
+        second = (START + step * index).replace(microsecond=0)
+        for position in range(min(rng.choice(BURST_SIZES), total - index)):
+            yield second + timedelta(microseconds=997 * position)
+            index += 1
+
+# Write the lines of one log; make_lines turns a block of (timestamp, index)
+# pairs into text
+def write_log(output_dir, prefix, total, rng, args, make_lines):
+    timestamps = burst_timestamps(rng, total, args.days)
+    written = 0
+    files = []
+    for name, count, compressed in plan_files(prefix, total, args.days, args.rotations, args.gzip_ratio):
+        path = os.path.join(output_dir, name)
+        with open_output(path, compressed, args.gzip_level) as f:
+            done = 0
+            while done < count:
+                size = min(BLOCK, count - done)
+                f.write(make_lines([(next(timestamps), written + n) for n in range(size)]))
+                done += size
+                written += size
+        files.append({'name': name, 'lines': count, 'bytes': os.path.getsize(path)})
+    return files
+
+def access_line_maker(rng):
+    ips, ip_weights, urls, url_weights = build_pools(rng)
+    last = [None, None]
+
+    def make_lines(block):
+        size = len(block)
+        chosen_ips = rng.choices(ips, cum_weights=ip_weights, k=size)
+        chosen_urls = rng.choices(urls, cum_weights=url_weights, k=size)
+        methods = rng.choices(METHODS, k=size)
+        statuses = rng.choices(STATUSES, k=size)
+        agents = rng.choices(USER_AGENTS, k=size)
+        referers = rng.choices(REFERERS, k=size)
+        out = []
+        for (timestamp, index), ip, url, method, status, agent, referer in zip(block, chosen_ips, chosen_urls, methods,
+                                                                           statuses, agents, referers):
+            second = timestamp.replace(microsecond=0)
+            if second != last[0]:
+                last[0] = second
+                last[1] = second.strftime('%d/%b/%Y:%H:%M:%S %z')
+            size_sent = '-' if status == 304 else str(200 + (index * 7919) % 50000)
+            out.append(f'{ip} - - [{last[1]}] "{method} {url} HTTP/1.1" {status} {size_sent} "{referer}" "{agent}"\n')
+        return ''.join(out)
+
+    return make_lines
+
+def error_line_maker(rng, ratio_24):
+    ips, ip_weights, urls, url_weights = build_pools(rng)
+
+    def make_lines(block):
+        out = []
+        for timestamp, index in block:
+            level = rng.choice(ERROR_LEVELS)
+            code, template = rng.choice(ERROR_MESSAGES)
+            ip = rng.choices(ips, cum_weights=ip_weights)[0]
+            message = template.format(path=rng.choices(urls, cum_weights=url_weights)[0].split('?')[0], ip=ip)
+            if rng.random() < ratio_24:
+                stamp = timestamp.strftime('%a %b %d %H:%M:%S.%f %Y')
+                module = rng.choice(ERROR_MODULES)
+                out.append(f'[{stamp}] [{module}:{level}] [pid {1000 + index % 64}:tid {140000 + index % 8}] '
+                           f'[client {ip}:{1024 + index % 60000}] {code}: {message}\n')
+            else:
+                stamp = timestamp.strftime('%a %b %d %H:%M:%S %Y')
+                out.append(f'[{stamp}] [{level}] [client {ip}] {message}\n')
+        return ''.join(out)
+
+    return make_lines
+
+# Generate a full log directory and describe it in manifest.json
+def generate(output_dir, args):
+    os.makedirs(output_dir, exist_ok=True)
+    error_lines = args.error_lines if args.error_lines is not None else args.lines // 20
+    rng = random.Random(args.seed)
+    manifest = {
+        'version': VERSION,
+        'params': {key: value for key, value in vars(args).items() if key != 'output_dir'},
+        'access_log': write_log(output_dir, 'access_log', args.lines, rng, args, access_line_maker(rng)),
+        'error_log': write_log(output_dir, 'error_log', error_lines, rng, args,
+                               error_line_maker(rng, args.error_24_ratio)),
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def main():
+    args = parse_arguments()
+    manifest = generate(args.output_dir, args)
+    for kind in ('access_log', 'error_log'):
+        for entry in manifest[kind]:
+            print(f"{entry['name']}: {entry['lines']} líneas, {entry['bytes']} bytes")
+
+if __name__ == '__main__':
+    main()
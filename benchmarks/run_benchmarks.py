@@ -0,0 +1,219 @@
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import resource
+import tempfile
+import subprocess
+import importlib.util
+from contextlib import redirect_stdout
+from datetime import datetime
+from types import SimpleNamespace
+
+import generate_logs
+
+# Benchmarks of every stage of httpd-fancyreport.py over synthetic logs. Each
+# stage is timed on its own and the results (seconds, lines/sec, peak RSS)
+# are written as JSON so runs on different commits can be compared.
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPT_PATH = os.path.join(BENCHMARK_DIR, os.pardir, 'httpd-fancyreport.py')
+# Lines fed to the line parser micro-benchmarks
+MICRO_LINES = 1000000
+
+# Command line options
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Mide el rendimiento de cada etapa de httpd-fancyreport.py.")
+    parser.add_argument('--lines', type=lambda value: int(float(value)), default=100000,
+                        help="Líneas del log de acceso sintético (1e5 a 1e8, admite notación 1e6)")
+    parser.add_argument('--error-lines', type=lambda value: int(float(value)), default=None,
+                        help="Líneas del log de errores (por defecto, 1/20 de --lines)")
+    parser.add_argument('--rotations', type=int, default=3, help="Archivos rotados además del actual")
+    parser.add_argument('--gzip-ratio', type=float, default=0.5, help="Fracción de las rotaciones comprimidas con gzip")
+    parser.add_argument('--gzip-level', type=int, default=6, help="Nivel de compresión gzip")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--data-dir', help="Directorio de los logs sintéticos; se reutiliza si ya tiene los mismos parámetros")
+    parser.add_argument('--jobs', type=int, default=1, help="Procesos para el análisis, los gráficos y los PDF")
+    parser.add_argument('--pdf', action='store_true', help="Incluye la generación de PDF (requiere WeasyPrint)")
+    parser.add_argument('--output', default='benchmark-results.json', help="Archivo JSON de resultados")
+    parser.add_argument('--compare', metavar='JSON', help="Resultados anteriores con los que comparar")
+    return parser.parse_args()
+
+# The script has a dash in its name, so it is loaded by path; registering it
+# in sys.modules lets worker processes unpickle its functions
+def load_report_module():
+    spec = importlib.util.spec_from_file_location('httpd_fancyreport', SCRIPT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+# Generate the synthetic logs unless data_dir already holds the same ones
+def prepare_data(args, data_dir):
+    params = SimpleNamespace(lines=args.lines, error_lines=args.error_lines, days=90, rotations=args.rotations,
+                             gzip_ratio=args.gzip_ratio, gzip_level=args.gzip_level, error_24_ratio=0.5, seed=args.seed)
+    manifest_path = os.path.join(data_dir, 'manifest.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get('version') == generate_logs.VERSION and manifest['params'] == vars(params):
+            return manifest
+    print(f"Generando logs sintéticos en {data_dir}...")
+    return generate_logs.generate(data_dir, params)
+
+# Reset the peak RSS of this process (Linux only) so each stage reports its own
+def reset_peak_rss():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def peak_rss_kib():
+    self_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    if sys.platform == 'darwin':
+        self_peak //= 1024
+        children_peak //= 1024
+    return self_peak, children_peak
+
+# Time one stage; its output is discarded so it does not skew the timings
+def run_stage(results, name, lines, function, *arguments):
+    per_stage = reset_peak_rss()
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    with redirect_stdout(io.StringIO()):
+        value = function(*arguments)
+    seconds = time.perf_counter() - start
+    self_peak, children_peak = peak_rss_kib()
+    results.append({
+        'stage': name,
+        'seconds': round(seconds, 4),
+        'cpu_seconds': round(time.process_time() - cpu_start, 4),
+        'lines': lines,
+        'lines_per_sec': round(lines / seconds) if lines and seconds else None,
+        'peak_rss_kib': self_peak,
+        'peak_rss_children_kib': children_peak,
+        'peak_rss_per_stage': per_stage,
+    })
+    print(f"{name:<20} {seconds:9.3f} s" + (f" {lines / seconds:14,.0f} líneas/s" if lines and seconds else ''))
+    return value
+
+# Parse every line of one in-memory list, as the line parser benchmarks do
+def parse_lines(parse_line, lines):
+    for line in lines:
+        parse_line(line)
+
+def read_lines(file_path, limit):
+    lines = []
+    with open(file_path, encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            lines.append(line)
+            if len(lines) >= limit:
+                break
+    return lines
+
+# Walk every month partition of the detail records, reading each row
+def scan_month_partitions(records, fields):
+    count = 0
+    for month in records.months():
+        for record in records.month_records(month):
+            for field in fields:
+                getattr(record, field)
+            count += 1
+    return count
+
+def run_benchmarks(module, args, data_dir, output_folder, manifest):
+    access_lines = sum(entry['lines'] for entry in manifest['access_log'])
+    error_lines = sum(entry['lines'] for entry in manifest['error_log'])
+    chunk_size = 64 * 1024 * 1024
+    results = []
+
+    # Line parsers on their own, without any file reading
+    access_sample = read_lines(os.path.join(data_dir, 'access_log'), MICRO_LINES)
+    error_sample = read_lines(os.path.join(data_dir, 'error_log'), MICRO_LINES)
+    run_stage(results, 'parse_access_line', len(access_sample), parse_lines,
+              module.access_log_parser(module.DEFAULT_LOG_FORMAT), access_sample)
+    run_stage(results, 'parse_error_line', len(error_sample), parse_lines, module.parse_error_log_line, error_sample)
+    del access_sample, error_sample
+
+    # Full ingestion: reading, decompression, parsing and aggregation
+    aggregator = module.ReportAggregator()
+    run_stage(results, 'ingest_access', access_lines, module.parse_access_logs, data_dir, aggregator, args.jobs, chunk_size)
+    run_stage(results, 'ingest_error', error_lines, module.parse_error_logs, data_dir, aggregator, args.jobs, chunk_size)
+
+    access_summary = run_stage(results, 'summarize_access', aggregator.total_requests,
+                               module.generate_access_summary, aggregator)
+    error_summary = run_stage(results, 'summarize_error', aggregator.total_errors,
+                              module.generate_error_summary, aggregator)
+    run_stage(results, 'monthly_partitions', len(aggregator.access_records) + len(aggregator.error_records),
+              lambda: (scan_month_partitions(aggregator.access_records, ('timestamp', 'ip', 'method', 'request', 'status')),
+                       scan_month_partitions(aggregator.error_records, ('timestamp', 'level', 'message'))))
+
+    # HTML writing registers the charts; rendering them is timed separately
+    charts = module.ChartRenderer(output_folder)
+    chart_paths = {**module.generate_access_charts(aggregator, charts), **module.generate_error_charts(aggregator, charts)}
+    pdf_mode = 'full' if args.pdf else 'none'
+    months = run_stage(results, 'html_monthly', aggregator.total_requests + aggregator.total_errors,
+                       module.generate_monthly_reports, aggregator, output_folder, charts, None, pdf_mode)
+    html_pdf_path = run_stage(results, 'html_index', None, module.generate_index_html, access_summary, error_summary,
+                              chart_paths, output_folder, months, args.pdf)
+    run_stage(results, 'charts', None, charts.render, args.jobs)
+    if args.pdf:
+        if module.HTML is None:
+            print("WeasyPrint no está disponible; se omite la etapa de PDF.")
+        else:
+            run_stage(results, 'pdf', None, module.generate_pdfs, output_folder, months, html_pdf_path, args.jobs)
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Print the speedup of every stage against a previous results file
+def compare_results(results, previous_path):
+    with open(previous_path) as f:
+        previous = {stage['stage']: stage for stage in json.load(f)['stages']}
+    print(f"\nComparación con {previous_path}:")
+    for stage in results:
+        old = previous.get(stage['stage'])
+        if old and stage['seconds']:
+            print(f"{stage['stage']:<20} {old['seconds']:9.3f} s -> {stage['seconds']:9.3f} s "
+                  f"(x{old['seconds'] / stage['seconds']:.2f})")
+
+def main():
+    args = parse_arguments()
+    data_dir = args.data_dir or os.path.join(tempfile.gettempdir(), f'httpd-fancyreport-bench-{args.lines}-{args.seed}')
+    manifest = prepare_data(args, data_dir)
+    module = load_report_module()
+    output_folder = tempfile.mkdtemp(prefix='httpd-fancyreport-bench-out-')
+    try:
+        stages = run_benchmarks(module, args, data_dir, output_folder, manifest)
+    finally:
+        shutil.rmtree(output_folder, ignore_errors=True)
+    report = {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'jobs': args.jobs,
+        'data': manifest,
+        'stages': stages,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados guardados en {args.output}")
+    if args.compare:
+        compare_results(stages, args.compare)
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,151 @@
+import io
 import os
 import re
+import sys
+import bz2
+import math
 import gzip
+import lzma
 import glob
-import matplotlib.pyplot as plt
-from datetime import datetime, timedelta
+import mmap
+import json
+import base64
+import zlib
+import pickle
+import socket
+import sqlite3
+import cProfile
+import resource
+import hashlib
+import argparse
+import time
+import asyncio
+import subprocess
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import shutil
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from datetime import datetime, timedelta, timezone
 from collections import Counter
-from weasyprint import HTML
+from contextlib import contextmanager
+from operator import itemgetter
+from functools import lru_cache
+# zstandard is optional: without it .zst logs are read through the zstd tool
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+# WeasyPrint is only needed when PDFs are generated (--pdf summary/full)
+try:
+    from weasyprint import HTML
+except (ImportError, OSError):
+    HTML = None
+
+# Descriptions of the command line of each mode
+MODE_DESCRIPTIONS = {
+    'report': "Genera reportes HTML y PDF a partir de los logs de Apache.",
+    'summarize': "Analiza los logs de este nodo y guarda un resumen parcial combinable con el modo merge.",
+    'merge': "Combina los resúmenes parciales de varios nodos y genera el reporte conjunto.",
+}
+
+# Command line options. summarize takes only the parsing options and merge
+# only the report ones; the plain report takes both.
+def parse_arguments(argv=None, mode='report'):
+    prog = None if mode == 'report' else f'httpd-fancyreport.py {mode}'
+    parser = argparse.ArgumentParser(prog=prog, description=MODE_DESCRIPTIONS[mode])
+    if mode == 'merge':
+        parser.add_argument('summaries', nargs='+', metavar='RESUMEN',
+                            help="Archivos generados con el modo summarize en cada nodo")
+    else:
+        parser.add_argument('log_dir', nargs='?',
+                            help="Directorio con los archivos de registro (si se omite, se solicita de forma interactiva)")
+    if mode == 'summarize':
+        parser.add_argument('-o', '--output', required=True, metavar='ARCHIVO',
+                            help="Archivo del resumen parcial")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="Cantidad de procesos para analizar los archivos en paralelo (0 = todos los núcleos)")
+    if mode != 'merge':
+        parser.add_argument('--chunk-size', type=int, default=64,
+                            help="Con --jobs, divide los archivos sin comprimir mayores a este tamaño (MiB) en fragmentos paralelos (0 = no dividir)")
+    parser.add_argument('--cache-dir', default=default_cache_dir(),
+                        help="Directorio de la caché de archivos comprimidos ya analizados y de gráficos ya generados")
+    parser.add_argument('--cache-size', type=int, default=1024,
+                        help="Tamaño máximo de la caché en MiB; se descartan las entradas menos usadas")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="No leer ni escribir la caché de archivos comprimidos ni de gráficos")
+    if mode == 'summarize':
+        parser.add_argument('--detail-rows', type=int, default=0,
+                            help="Filas por mes de las tablas de detalle incluidas en el resumen (por defecto, ninguna)")
+    else:
+        parser.add_argument('--detail-rows', type=int, default=0,
+                            help="Máximo de filas por mes en las tablas de detalle (0 = todas)")
+    if mode != 'summarize':
+        parser.add_argument('--detail-page-size', type=int, default=0,
+                            help="Filas por página de detalle en la versión web de los reportes mensuales (0 = una sola página)")
+        parser.add_argument('--pdf', choices=('none', 'summary', 'full'), default='full',
+                            help="PDF a generar: none = solo HTML, summary = sin tablas de detalle, full = completos")
+        parser.add_argument('--chart-format', choices=('png', 'svg'), default='png',
+                            help="Formato de los gráficos")
+    if mode != 'merge':
+        parser.add_argument('--log-format', default='combined', metavar='FORMATO',
+                            help="LogFormat de Apache de los logs de acceso (p. ej. '%%h %%l %%u %%t \"%%r\" %%>s %%b %%D') "
+                                 "o un apodo: common, combined, combinedio, vhost_combined")
+        parser.add_argument('--approximate', action='store_true',
+                            help="Usa estimaciones de memoria acotada (HyperLogLog y Space-Saving) para visitantes únicos y rankings")
+        parser.add_argument('--normalize-urls', action='store_true',
+                            help="Agrupa las URL: quita los parámetros de consulta y reemplaza los segmentos numéricos y UUID por {id} y {uuid}")
+        parser.add_argument('--route', action='append', type=parse_route, metavar='PLANTILLA',
+                            help="Plantilla de ruta (p. ej. /product/{id}/reviews) que agrupa las URL que coinciden; "
+                                 "se puede repetir e implica --normalize-urls")
+        parser.add_argument('--keep-query-param', action='append', metavar='NOMBRE',
+                            help="Parámetro de consulta que se conserva al agrupar las URL; se puede repetir e implica --normalize-urls")
+        parser.add_argument('--incident-window', type=int, default=INCIDENT_WINDOW, metavar='MIN',
+                            help="Minutos de la ventana deslizante de la detección de incidentes")
+        parser.add_argument('--incident-rate', type=int, default=INCIDENT_REQUEST_RATE, metavar='N',
+                            help="Peticiones de una IP en la ventana que constituyen un incidente (0 = no detectar)")
+        parser.add_argument('--incident-error-rate', type=int, default=INCIDENT_ERROR_RATE, metavar='N',
+                            help="Respuestas 4xx/5xx de una IP o URL, o errores graves de error_log, en la ventana que "
+                                 "constituyen un incidente (0 = no detectar)")
+        parser.add_argument('--since', type=parse_time_bound, metavar='FECHA',
+                            help="Solo incluye entradas desde esta fecha ISO (p. ej. 2024-05-01 o 2024-05-01T12:00), inclusive")
+        parser.add_argument('--until', type=parse_time_bound, metavar='FECHA',
+                            help="Solo incluye entradas anteriores a esta fecha ISO")
+    parser.add_argument('--metrics', metavar='ARCHIVO',
+                        help="Escribe en JSON el tiempo, las líneas, los bytes y la memoria de cada etapa y archivo")
+    if mode != 'merge':
+        parser.add_argument('--profile', metavar='ARCHIVO',
+                            help="Escribe un volcado de cProfile del análisis de los logs (con --jobs 1 incluye el análisis línea a línea)")
+    if mode == 'report':
+        parser.add_argument('--follow', action='store_true',
+                            help="Sigue access_log y error_log en vivo y reescribe index.html con ventanas de 5 min, 1 h y 24 h")
+        parser.add_argument('--interval', type=int, default=30,
+                            help="Con --follow, segundos entre actualizaciones de index.html")
+    if mode != 'merge':
+        parser.add_argument('--state', metavar='ARCHIVO',
+                            help="Archivo de estado incremental: solo se analiza lo agregado a los logs desde la ejecución anterior")
+        parser.add_argument('--sqlite', metavar='ARCHIVO',
+                            help="Exporta las entradas a una base SQLite indexada, anexando solo lo nuevo en cada ejecución "
+                                 "(consultas: httpd-fancyreport.py query ARCHIVO 'SELECT ...')")
+        parser.add_argument('--from-sqlite', metavar='ARCHIVO',
+                            help="Genera el reporte a partir de una base exportada con --sqlite en vez de leer los logs")
+    parser.add_argument('--rollup', metavar='ARCHIVO',
+                        help="Guarda los totales por minuto (peticiones, bytes, clases de estado y niveles de error)")
+    if mode == 'summarize':
+        parser.add_argument('--resolution', choices=sorted(ROLLUP_RESOLUTIONS), default='hour',
+                            help="Resolución de los totales por tiempo incluidos en el resumen")
+    if mode == 'report':
+        parser.add_argument('--rollup-query', nargs=2, metavar=('DESDE', 'HASTA'),
+                            help="Muestra los totales de --rollup entre dos fechas ISO (p. ej. 2024-05-01 2024-05-08T12:00) sin analizar logs")
+        parser.add_argument('--resolution', choices=sorted(ROLLUP_RESOLUTIONS), default='hour',
+                            help="Resolución de --rollup-query")
+    return parser.parse_args(argv)
 
 # Function to prompt for the log directory
-def prompt_for_log_directory():
-    dir_path = input("Ingrese la ruta al directorio que contiene los archivos de registro de Apache (por defecto: /var/log/httpd/): ")
+def prompt_for_log_directory(dir_path=None):
+    if dir_path is None:
+        dir_path = input("Ingrese la ruta al directorio que contiene los archivos de registro de Apache (por defecto: /var/log/httpd/): ")
     if not dir_path:
         dir_path = '/var/log/httpd/'
     if not os.path.exists(dir_path):
@@ -24,270 +160,2867 @@ def create_output_folder():
     os.makedirs(folder_name, exist_ok=True)
     return folder_name
 
-# Function to parse access logs
-def parse_access_logs(dir_path):
-    access_logs = glob.glob(os.path.join(dir_path, 'access_log*'))
-    if not access_logs:
-        print("No se encontraron archivos access_log en el directorio especificado.")
+# Function to list the log files of a given kind, in processing order
+def find_log_files(dir_path, prefix):
+    log_files = glob.glob(os.path.join(dir_path, f'{prefix}*'))
+    if not log_files:
+        print(f"No se encontraron archivos {prefix} en el directorio especificado.")
         exit(1)
-    access_logs.sort()
-    access_data = []
-    for file_path in access_logs:
-        print(f"Procesando {file_path}...")
-        data = parse_single_access_log(file_path)
-        print(f"Encontradas {len(data)} entradas en {file_path}")
-        access_data.extend(data)
-    return access_data
-
-# Function to parse a single access log file
-def parse_single_access_log(file_path):
-    data = []
-    # Handle compressed files
-    if file_path.endswith('.gz'):
-        f = gzip.open(file_path, 'rt', encoding='utf-8', errors='ignore')
+    log_files.sort()
+    return log_files
+
+# Suffixes of the compressed rotations logrotate may produce
+COMPRESSED_SUFFIXES = ('.gz', '.bz2', '.xz', '.zst')
+# External decompressors tried in order for sequential reads. They run in
+# their own process, in parallel with parsing (pigz and lbzip2 also use
+# several threads).
+EXTERNAL_DECOMPRESSORS = {
+    '.gz': (('pigz', '-dc'), ('gzip', '-dc')),
+    '.bz2': (('lbzip2', '-dc'), ('pbzip2', '-dc'), ('bzip2', '-dc')),
+    '.xz': (('xz', '-dc'),),
+    '.zst': (('zstd', '-dcq'),),
+}
+# Buffer of the binary streams under the text decoder
+READ_BUFFER_SIZE = 1024 * 1024
+external_decompressors = {}
+
+def compression_suffix(file_path):
+    for suffix in COMPRESSED_SUFFIXES:
+        if file_path.endswith(suffix):
+            return suffix
+    return None
+
+# First external decompressor installed for a suffix, or None
+def find_external_decompressor(suffix):
+    if suffix not in external_decompressors:
+        external_decompressors[suffix] = next((command for command in EXTERNAL_DECOMPRESSORS[suffix]
+                                               if shutil.which(command[0])), None)
+    return external_decompressors[suffix]
+
+# Binary stream over the output of an external decompressor. Closing it
+# early stops the process; after reading to the end its exit status is
+# checked.
+class DecompressorPipe(io.BufferedReader):
+    def __init__(self, command, file_path):
+        self.command = command
+        self.file_path = file_path
+        self.process = subprocess.Popen([*command, file_path], bufsize=0, stdin=subprocess.DEVNULL,
+                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        super().__init__(self.process.stdout, READ_BUFFER_SIZE)
+
+    def close(self):
+        if self.closed:
+            return
+        complete = not self.peek(1)
+        super().close()
+        if not complete:
+            self.process.kill()
+        stderr = self.process.communicate()[1]
+        if complete and self.process.returncode:
+            raise OSError(f"{self.command[0]} no pudo descomprimir {self.file_path}: "
+                          f"{stderr.decode('utf-8', 'ignore').strip()}")
+
+# Open a log file as bytes, decompressing in-process when Python can (the
+# stream is then seekable); .zst needs zstandard or the zstd tool
+def open_log_binary(file_path):
+    suffix = compression_suffix(file_path)
+    if suffix == '.gz':
+        return gzip.open(file_path, 'rb')
+    if suffix == '.bz2':
+        return bz2.open(file_path, 'rb')
+    if suffix == '.xz':
+        return lzma.open(file_path, 'rb')
+    if suffix == '.zst':
+        if zstandard is not None:
+            reader = zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb'), read_across_frames=True, closefd=True)
+            return io.BufferedReader(reader, READ_BUFFER_SIZE)
+        command = find_external_decompressor(suffix)
+        if command is None:
+            raise OSError(f"No se puede leer {file_path}: instale el módulo zstandard o la herramienta zstd")
+        return DecompressorPipe(command, file_path)
+    return open(file_path, 'rb')
+
+# Open a log file as bytes for one sequential read, through an external
+# decompressor when one is installed
+def open_log_stream(file_path):
+    suffix = compression_suffix(file_path)
+    command = find_external_decompressor(suffix) if suffix else None
+    if command is not None:
+        return DecompressorPipe(command, file_path)
+    stream = open_log_binary(file_path)
+    if suffix:
+        stream = io.BufferedReader(stream, READ_BUFFER_SIZE)
+    return stream
+
+# Open a log file as text, handling compressed files. Text mode decoding of
+# a whole buffer is faster than matching bytes and decoding fields one by one.
+def open_log_file(file_path):
+    if compression_suffix(file_path):
+        return io.TextIOWrapper(open_log_stream(file_path), encoding='utf-8', errors='ignore')
+    return open(file_path, 'r', encoding='utf-8', errors='ignore')
+
+# Wall/CPU time, lines, bytes and peak memory of every stage and input file,
+# written as JSON with --metrics
+class RunMetrics:
+    def __init__(self):
+        self.started = datetime.now()
+        self.start = time.perf_counter()
+        self.stages = []
+        self.files = []
+
+    @contextmanager
+    def stage(self, name):
+        reset_peak_rss('stage')
+        first_file = len(self.files)
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        children_start = children_cpu_seconds()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            # Stages that fail, sys.exit() included, are recorded with the error
+            error = type(e).__name__ + (f': {e}' if str(e) else '')
+            raise
+        finally:
+            stats = {
+                'stage': name,
+                'wall_seconds': round(time.perf_counter() - start, 4),
+                'cpu_seconds': round(time.process_time() - cpu_start, 4),
+                'children_cpu_seconds': round(children_cpu_seconds() - children_start, 4),
+                'peak_rss_kib': peak_rss_kib('stage'),
+            }
+            files = self.files[first_file:]
+            if files:
+                for key in ('lines', 'rejected_lines', 'bytes_read'):
+                    stats[key] = sum(entry[key] for entry in files)
+            if error is not None:
+                stats['error'] = error
+            self.stages.append(stats)
+
+    def add_file(self, kind, file_path, parsed, rejected, bytes_read, wall, cpu, peak, cached=False):
+        self.files.append({
+            'kind': kind,
+            'path': file_path,
+            'lines': parsed + rejected,
+            'rejected_lines': rejected,
+            'bytes_read': bytes_read,
+            'wall_seconds': round(wall, 4),
+            'cpu_seconds': round(cpu, 4),
+            'peak_rss_kib': peak,
+            'cached': cached,
+        })
+
+    def write(self, metrics_path):
+        metrics = {
+            'started': self.started.isoformat(timespec='seconds'),
+            'argv': sys.argv[1:],
+            'wall_seconds': round(time.perf_counter() - self.start, 4),
+            'peak_rss_kib': peak_rss_kib('run'),
+            'stages': self.stages,
+            'files': self.files,
+        }
+        with open(metrics_path, 'w') as f:
+            json.dump(metrics, f, indent=2)
+
+# Highest peak RSS read before a reset, per scope: resets for each file or
+# stage must not hide the peak of the stage or of the whole run around them
+rss_peaks = {'run': 0, 'stage': 0}
+
+# Reset the peak RSS reported by peak_rss_kib() (Linux only; elsewhere the
+# peak covers the whole process lifetime). The peak so far is kept for the
+# enclosing scopes; the scope being reset starts from zero.
+def reset_peak_rss(scope=None):
+    peak = peak_rss_kib()
+    for name in rss_peaks:
+        rss_peaks[name] = 0 if name == scope else max(rss_peaks[name], peak)
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+# Peak RSS since the last reset, or since the reset of scope ('stage', or
+# 'run' for the whole process)
+def peak_rss_kib(scope=None):
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak //= 1024
+    return max(peak, rss_peaks[scope]) if scope else peak
+
+def children_cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+# Run a parse task and return its result with its wall time, CPU time and
+# peak memory (runs in worker processes too)
+def run_measured(function, *args):
+    reset_peak_rss()
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    result = function(*args)
+    return result, time.perf_counter() - start, time.process_time() - cpu_start, peak_rss_kib()
+
+# Function to parse access logs, feeding every entry into the aggregator
+def parse_access_logs(dir_path, aggregator, jobs=1, chunk_size=0, cache=None, metrics=None):
+    log_files = plan_time_range(find_log_files(dir_path, 'access_log'), 'access', aggregator, cache)
+    if jobs > 1:
+        return parse_logs_in_pool(log_files, 'access', aggregator, jobs, chunk_size, cache, metrics)
+    for file_path, start, filtered in log_files:
+        parse_log_file(file_path, 'access', aggregator, cache, metrics, start, filtered)
+    return aggregator
+
+# Parse one log file straight into the aggregator, or merge its cached
+# partial. A plain log can be read from a start offset; filtered files only
+# partly match the time range, so their partial is not cached.
+def parse_log_file(file_path, kind, aggregator, cache=None, metrics=None, start=0, filtered=False):
+    print(f"Procesando {file_path}...")
+    cache_entry = cache.entry_path(file_path, kind, aggregator.cache_variant()) if cache and not filtered else None
+    cached = cache_entry is not None and os.path.exists(cache_entry)
+    size = os.path.getsize(file_path)
+    # Every file is its own partial, as with --jobs, so the windows of the
+    # incident detector are recounted across files the same way
+    if cache_entry:
+        partial, *usage = run_measured(cached_aggregate_log_file, file_path, kind, cache_entry, aggregator.new_partial())
+    elif start:
+        partial, *usage = run_measured(aggregate_log_range, file_path, kind, start, size, aggregator.new_partial())
     else:
-        f = open(file_path, 'r', encoding='utf-8', errors='ignore')
+        partial, *usage = run_measured(aggregate_log_file, file_path, kind, aggregator.new_partial())
+    aggregator.merge(partial)
+    count, rejected = aggregate_counts(partial, kind)
+    if metrics:
+        metrics.add_file(kind, file_path, count, rejected, size - start, *usage, cached=cached)
+    print(f"Encontradas {count} entradas en {file_path}")
+
+MONTH_NUMBERS = {
+    'Jan': (1, '01'), 'Feb': (2, '02'), 'Mar': (3, '03'), 'Apr': (4, '04'),
+    'May': (5, '05'), 'Jun': (6, '06'), 'Jul': (7, '07'), 'Aug': (8, '08'),
+    'Sep': (9, '09'), 'Oct': (10, '10'), 'Nov': (11, '11'), 'Dec': (12, '12'),
+}
+
+# Decoded timestamps keyed by the raw %t string; consecutive lines usually
+# share the same second, so most lines are a single dict lookup
+TIMESTAMP_CACHE_SIZE = 4096
+timestamp_cache = {}
+timezone_cache = {}
+
+# Fast decoder for Apache's %t format (10/Oct/2000:13:55:36 -0700).
+# Returns None for anything that is not exactly in that layout.
+def decode_apache_timestamp(date_str):
+    if (len(date_str) != 26 or date_str[2] != '/' or date_str[6] != '/' or date_str[11] != ':'
+            or date_str[14] != ':' or date_str[17] != ':' or date_str[20] != ' '):
+        return None
+    month_info = MONTH_NUMBERS.get(date_str[3:6])
+    sign = date_str[21]
+    if month_info is None or sign not in '+-' or date_str[7] == '0':
+        return None
+    digits = date_str[0:2] + date_str[7:11] + date_str[12:14] + date_str[15:17] + date_str[18:20] + date_str[22:26]
+    if not (digits.isascii() and digits.isdigit()):
+        return None
+    offset = date_str[21:]
+    tz = timezone_cache.get(offset)
+    if tz is None:
+        offset_minutes = int(offset[3:5])
+        if offset_minutes >= 60:
+            return None
+        delta = timedelta(hours=int(offset[1:3]), minutes=offset_minutes)
+        try:
+            tz = timezone(-delta if sign == '-' else delta)
+        except ValueError:
+            return None
+        timezone_cache[offset] = tz
     try:
-        for line in f:
-            parsed_line = parse_access_log_line(line)
-            if parsed_line:
-                data.append(parsed_line)
-    finally:
-        f.close()
-    return data
+        timestamp = datetime(int(date_str[7:11]), month_info[0], int(date_str[0:2]),
+                             int(date_str[12:14]), int(date_str[15:17]), int(date_str[18:20]), tzinfo=tz)
+    except ValueError:
+        return None
+    return timestamp, date_str[7:11] + '-' + month_info[1]
+
+# Original strptime-based timestamp handling, used for lines the fast
+# decoder does not accept (missing offset, unusual spacing, ...)
+def parse_apache_timestamp_fallback(date_str):
+    # Handle timezone offset
+    try:
+        timestamp = datetime.strptime(date_str, '%d/%b/%Y:%H:%M:%S %z')
+    except ValueError:
+        # If timezone offset is not included
+        try:
+            timestamp = datetime.strptime(date_str, '%d/%b/%Y:%H:%M:%S')
+        except ValueError:
+            return None, None
+    return timestamp, timestamp.strftime('%Y-%m')
+
+# Decode a %t timestamp through the shared cache: (timestamp, month), or
+# (None, None) when it cannot be read
+def parse_access_timestamp(date_str):
+    parsed_timestamp = timestamp_cache.get(date_str)
+    if parsed_timestamp is None:
+        parsed_timestamp = decode_apache_timestamp(date_str) or parse_apache_timestamp_fallback(date_str)
+        if len(timestamp_cache) >= TIMESTAMP_CACHE_SIZE:
+            timestamp_cache.clear()
+        timestamp_cache[date_str] = parsed_timestamp
+    return parsed_timestamp
+
+# LogFormat nicknames of the stock httpd.conf
+LOG_FORMAT_NICKNAMES = {
+    'common': '%h %l %u %t "%r" %>s %b',
+    'combined': '%h %l %u %t "%r" %>s %b "%{Referer}i" "%{User-Agent}i"',
+    'combinedio': '%h %l %u %t "%r" %>s %b "%{Referer}i" "%{User-Agent}i" %I %O',
+    'vhost_combined': '%v:%p %h %l %u %t "%r" %>s %O "%{Referer}i" "%{User-Agent}i"',
+}
+DEFAULT_LOG_FORMAT = 'combined'
+# Access log fields the reports use; the compiled parsers capture only these
+ACCESS_FIELDS = ('ip', 'timestamp', 'method', 'request', 'status', 'bytes_sent', 'user_agent', 'response_time')
+# Values of the fields a log format does not include (no %D or %T: no latency)
+ACCESS_FIELD_DEFAULTS = {'ip': '-', 'ident': '-', 'authuser': '-', 'method': '-', 'request': '-', 'protocol': '-',
+                         'status': 0, 'bytes_sent': 0, 'user_agent': '-', 'referer': '-', 'response_time': None,
+                         'vhost': '-'}
+# Every field of the combined format, as returned by parse_access_log_line()
+COMBINED_LOG_FIELDS = ('ip', 'ident', 'authuser', 'timestamp', 'method', 'request', 'protocol', 'status', 'bytes_sent',
+                       'referer', 'user_agent')
+# Conversion of the captured text of each field (fields not listed are kept as is)
+FIELD_CONVERSIONS = {
+    'status': 'int(status)',
+    'bytes_sent': "int(bytes_sent) if bytes_sent != '-' else 0",
+    'user_agent': "user_agent or '-'",
+    'referer': "referer or '-'",
+}
+# %[condition]{argument}letter
+LOG_FORMAT_DIRECTIVE = re.compile(r'%([<>!\d,]*)(?:\{([^}]*)\})?([a-zA-Z%])')
+# Microseconds per unit of %T, by its argument
+RESPONSE_TIME_UNITS = {None: 1000000, 's': 1000000, 'ms': 1000, 'us': 1}
+access_parsers = {}
+
+# Segments matched by one LogFormat directive: literal text, or (field,
+# regex) pairs where field is None for values no report reads. Quoted values
+# may contain spaces.
+def log_format_directive(letter, argument, quoted):
+    if letter in 'ha':
+        return [('ip', r'\S+')]
+    if letter == 'l':
+        return [('ident', r'\S+')]
+    if letter == 'u':
+        return [('authuser', r'\S+')]
+    if letter == 't':
+        if argument is not None:
+            raise ValueError(f"%{{{argument}}}t no está soportado; use %t")
+        return ['[', ('timestamp', r'[^\]]+'), ']']
+    if letter == 'r':
+        return [('method', r'\S+'), ' ', ('request', '.*?'), ' ', ('protocol', r'\S+')]
+    if letter == 's':
+        return [('status', r'\d{3}')]
+    if letter in 'bB':
+        return [('bytes_sent', r'\S+')]
+    # mod_logio bytes sent including headers, used when there is no %b
+    if letter == 'O':
+        return [('bytes_out', r'\S+')]
+    if letter == 'm':
+        return [('method', r'\S+')]
+    if letter == 'U':
+        return [('request', r'\S+')]
+    if letter == 'q':
+        return [('query', r'\S*')]
+    if letter == 'D':
+        return [('response_time', r'\d+')]
+    if letter == 'T':
+        if argument not in RESPONSE_TIME_UNITS:
+            raise ValueError(f"%{{{argument}}}T no está soportado")
+        return [('response_time', r'\d+')]
+    if letter in 'vV':
+        return [('vhost', r'\S+')]
+    if letter == 'i' and argument is not None and argument.lower() in ('user-agent', 'referer'):
+        return [(argument.lower().replace('-', '_'), '.*?' if quoted else r'\S+')]
+    return [(None, '.*?' if quoted else r'\S+')]
+
+# Compile an Apache LogFormat string (or nickname) into a line parser that
+# returns the entry dict of the reports, or None. Only the requested fields
+# are captured and converted; everything else is matched without groups.
+def compile_access_format(log_format, fields=ACCESS_FIELDS):
+    log_format = LOG_FORMAT_NICKNAMES.get(log_format, log_format).replace('\\"', '"')
+    pattern = ['^']
+    names = []
+    response_time_unit = 1
+    request_from_path = False
+    has_bytes = any(directive.group(3) in 'bB' for directive in LOG_FORMAT_DIRECTIVE.finditer(log_format))
+    position = 0
+    for directive in LOG_FORMAT_DIRECTIVE.finditer(log_format):
+        literal = log_format[position:directive.start()]
+        pattern.append(re.escape(literal))
+        position = directive.end()
+        modifiers, argument, letter = directive.groups()
+        if letter == '%':
+            pattern.append('%')
+            continue
+        for segment in log_format_directive(letter, argument, literal.endswith('"')):
+            if isinstance(segment, str):
+                pattern.append(re.escape(segment))
+                continue
+            field, regex = segment
+            if field == 'bytes_out':
+                field = None if has_bytes else 'bytes_sent'
+            # %q only completes a request taken from %U
+            wanted = field in fields or (field == 'query' and request_from_path)
+            if wanted and field not in names:
+                names.append(field)
+                pattern.append(f'({regex})')
+                if letter == 'T':
+                    response_time_unit = RESPONSE_TIME_UNITS[argument]
+                request_from_path = request_from_path or letter == 'U'
+            else:
+                pattern.append(regex)
+    pattern.append(re.escape(log_format[position:]) + '$')
+    if 'timestamp' not in names:
+        raise ValueError("el formato debe incluir %t")
+    # The parser is generated as source, like collections.namedtuple does, so
+    # it unpacks exactly its groups and builds the entry in one dict display
+    values = {field: field for field in names}
+    values.update(FIELD_CONVERSIONS)
+    values['response_time'] = f'int(response_time) * {response_time_unit}'
+    if 'query' in names:
+        values['request'] = 'request + query'
+    entries = ["'month': parsed_timestamp[1]"]
+    for field in fields:
+        if field == 'timestamp':
+            entries.insert(0, "'timestamp': timestamp")
+        elif field in names:
+            entries.append(f"{field!r}: {values[field]}")
+        else:
+            entries.append(f"{field!r}: {ACCESS_FIELD_DEFAULTS[field]!r}")
+    source = f"""def parse(line):
+    match = regex_match(line)
+    if match is None:
+        return None
+    {', '.join(names)}, = match.groups()
+    parsed_timestamp = timestamp_cache.get(timestamp) or parse_access_timestamp(timestamp)
+    timestamp = parsed_timestamp[0]
+    if timestamp is None:
+        return None
+    return {{{', '.join(entries)}}}
+"""
+    namespace = {'regex_match': re.compile(''.join(pattern)).match, 'timestamp_cache': timestamp_cache,
+                 'parse_access_timestamp': parse_access_timestamp}
+    exec(source, namespace)
+    # Fields the format provides; the others get ACCESS_FIELD_DEFAULTS
+    namespace['parse'].fields = tuple(names)
+    return namespace['parse']
+
+# Compiled parser of a log format, built once per process
+def access_log_parser(log_format, fields=ACCESS_FIELDS):
+    parser = access_parsers.get((log_format, fields))
+    if parser is None:
+        parser = access_parsers[log_format, fields] = compile_access_format(log_format, fields)
+    return parser
 
-# Function to parse a single line of access log
+# Function to parse a single line of access log, with every field of the
+# combined format (the reports read lines through access_log_parser())
 def parse_access_log_line(line):
-    # Combined Log Format regex matching your sample
-    regex = r'^(\S+) (\S+) (\S+) \[([^\]]+)\] "(\S+) (.*?) (\S+)" (\d{3}) (\S+) "(.*?)" "(.*?)"$'
-    match = re.match(regex, line)
-    if match:
-        ip, ident, authuser, date_str, method, request, protocol, status, bytes_sent, referer, user_agent = match.groups()
-        # Handle timezone offset
+    return access_log_parser(DEFAULT_LOG_FORMAT, COMBINED_LOG_FIELDS)(line)
+
+# Canonical URLs remembered by each normalizer, least recently used first out
+URL_CACHE_SIZE = 65536
+# Path segments collapsed into a template placeholder when no route matches
+URL_SEGMENT_PLACEHOLDERS = (
+    (re.compile(r'\d+'), '{id}'),
+    (re.compile(r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}'), '{uuid}'),
+)
+# {name} placeholder of a --route template, matching one path segment
+ROUTE_PLACEHOLDER = re.compile(r'\{[^{}/]*\}')
+
+# --route value: a path template such as /product/{id}/reviews
+def parse_route(value):
+    if not value.startswith('/'):
+        raise argparse.ArgumentTypeError(f"la ruta debe empezar con '/': {value}")
+    return value
+
+# Regex matching the paths of a route template; each {name} stands for one
+# non-empty segment and a trailing slash is optional
+def compile_route(route):
+    pattern = []
+    position = 0
+    for placeholder in ROUTE_PLACEHOLDER.finditer(route):
+        pattern.append(re.escape(route[position:placeholder.start()]) + '[^/]+')
+        position = placeholder.end()
+    pattern.append(re.escape(route[position:].rstrip('/')) + '/?')
+    return re.compile(''.join(pattern))
+
+# Maps the raw request URLs of the log to canonical keys for the counters:
+# the query string is dropped except for the whitelisted parameters (sorted
+# by name), a path matching one of the routes becomes that route, and
+# otherwise numeric and UUID segments become {id} and {uuid}. The same URLs
+# repeat millions of times, so results are memoized in a bounded LRU cache.
+class UrlNormalizer:
+    def __init__(self, routes=(), keep_query=()):
+        self.routes = tuple(routes)
+        self.keep_query = frozenset(keep_query)
+        self.route_patterns = [(compile_route(route), route) for route in self.routes]
+        self.canonical = lru_cache(maxsize=URL_CACHE_SIZE)(self.canonicalize)
+
+    def canonicalize(self, url):
+        path, _, query = url.partition('?')
+        for pattern, route in self.route_patterns:
+            if pattern.fullmatch(path):
+                path = route
+                break
+        else:
+            path = '/'.join(map(self.canonical_segment, path.split('/')))
+        if query and self.keep_query:
+            params = sorted(param for param in query.split('&') if param.partition('=')[0] in self.keep_query)
+            if params:
+                return path + '?' + '&'.join(params)
+        return path
+
+    @staticmethod
+    def canonical_segment(segment):
+        for pattern, placeholder in URL_SEGMENT_PLACEHOLDERS:
+            if pattern.fullmatch(segment):
+                return placeholder
+        return segment
+
+    # Rules that change the canonical keys, for cache variants and checks
+    def rules(self):
+        return self.routes, tuple(sorted(self.keep_query))
+
+    def __eq__(self, other):
+        return isinstance(other, UrlNormalizer) and self.rules() == other.rules()
+
+    # Pickle the rules only; the memo cache is rebuilt empty
+    def __reduce__(self):
+        return self.__class__, self.rules()
+
+# Normalizer selected by --normalize-urls, --route and --keep-query-param,
+# or None to count raw URLs
+def url_normalizer_from_args(args):
+    if not (args.normalize_urls or args.route or args.keep_query_param):
+        return None
+    return UrlNormalizer(args.route or (), args.keep_query_param or ())
+
+# Function to parse error logs, feeding every entry into the aggregator
+def parse_error_logs(dir_path, aggregator, jobs=1, chunk_size=0, cache=None, metrics=None):
+    log_files = plan_time_range(find_log_files(dir_path, 'error_log'), 'error', aggregator, cache)
+    if jobs > 1:
+        return parse_logs_in_pool(log_files, 'error', aggregator, jobs, chunk_size, cache, metrics)
+    for file_path, start, filtered in log_files:
+        parse_log_file(file_path, 'error', aggregator, cache, metrics, start, filtered)
+    return aggregator
+
+# Error log lines of Apache 2.2 ([date] [level] [client ip] message) and
+# of the 2.4 default ErrorLogFormat ([date with microseconds]
+# [module:level] [pid N:tid N] [client ip:port] AH01234: message)
+# 2.4 writes the OS error of a failed call, as in "(70007)The timeout
+# specified has expired: ", before the client block
+ERROR_LOG_REGEX = re.compile(r'^\[([^\]]*)\] \[(?:([^\]:]*):)?(\w+)\] (?:\[pid (\d+)(?::tid \d+)?\] )?'
+                             r'(\(-?\d+\)[^:\[\]]*: )?(?:\[client ([^\]]*)\] )?(.*)$')
+# httpd message code of a 2.4 message, after the OS error if there is one
+ERROR_CODE_REGEX = re.compile(r'\b(AH\d{5}):')
+ERROR_TIMESTAMP_CACHE_SIZE = 4096
+error_timestamp_cache = {}
+
+# Decode an error log time (Wed Oct 11 14:32:52 2026, or with .123456 after
+# the seconds in 2.4) into (timestamp, month), or (None, None). The parse of
+# each second is cached and the microseconds added to it.
+def parse_error_timestamp(date_str):
+    seconds, dot, rest = date_str.partition('.')
+    fraction = None
+    if dot:
+        fraction, _, year = rest.partition(' ')
+        if not (fraction.isascii() and fraction.isdigit()):
+            return None, None
+        seconds = seconds + ' ' + year
+    parsed_timestamp = error_timestamp_cache.get(seconds)
+    if parsed_timestamp is None:
         try:
-            timestamp = datetime.strptime(date_str, '%d/%b/%Y:%H:%M:%S %z')
+            timestamp = datetime.strptime(seconds, '%a %b %d %H:%M:%S %Y')
+            parsed_timestamp = timestamp, timestamp.strftime('%Y-%m')
         except ValueError:
-            # If timezone offset is not included
-            try:
-                timestamp = datetime.strptime(date_str, '%d/%b/%Y:%H:%M:%S')
-            except ValueError:
-                return None
-        status = int(status)
-        bytes_sent = int(bytes_sent) if bytes_sent != '-' else 0
+            parsed_timestamp = None, None
+        if len(error_timestamp_cache) >= ERROR_TIMESTAMP_CACHE_SIZE:
+            error_timestamp_cache.clear()
+        error_timestamp_cache[seconds] = parsed_timestamp
+    if fraction and parsed_timestamp[0] is not None:
+        return parsed_timestamp[0].replace(microsecond=int(fraction[:6].ljust(6, '0'))), parsed_timestamp[1]
+    return parsed_timestamp
+
+# Function to parse a single line of error log. Fields missing from 2.2
+# lines are '-' (module, client, code) or None (pid); the client of 2.4
+# lines is kept without its port.
+def parse_error_log_line(line):
+    match = ERROR_LOG_REGEX.match(line)
+    if match:
+        date_str, module, level, pid, os_error, client, message = match.groups()
+        timestamp, month = parse_error_timestamp(date_str)
+        if timestamp is None:
+            return None
+        # The OS error stays in the message, ahead of the AH code
+        message = ((os_error or '') + message).strip()
+        # 2.4 adds the port to the client, after the last colon for IPv6 too
+        if client and module is not None:
+            client = client.rpartition(':')[0] or client
+        code = ERROR_CODE_REGEX.search(message)
         return {
-            'ip': ip,
-            'ident': ident,
-            'authuser': authuser,
             'timestamp': timestamp,
-            'method': method,
-            'request': request,
-            'protocol': protocol,
-            'status': status,
-            'bytes_sent': bytes_sent,
-            'referer': referer if referer else '-',
-            'user_agent': user_agent if user_agent else '-',
-            'month': timestamp.strftime('%Y-%m')
+            'level': level,
+            'message': message,
+            'month': month,
+            'module': module or '-',
+            'pid': int(pid) if pid else None,
+            'client': client or '-',
+            'code': code.group(1) if code else '-',
         }
     else:
         return None
 
-# Function to parse error logs
-def parse_error_logs(dir_path):
-    error_logs = glob.glob(os.path.join(dir_path, 'error_log*'))
-    if not error_logs:
-        print("No se encontraron archivos error_log en el directorio especificado.")
-        exit(1)
-    error_logs.sort()
-    error_data = []
-    for file_path in error_logs:
-        print(f"Procesando {file_path}...")
-        data = parse_single_error_log(file_path)
-        print(f"Encontradas {len(data)} entradas en {file_path}")
-        error_data.extend(data)
-    return error_data
-
-# Function to parse a single error log file
-def parse_single_error_log(file_path):
-    data = []
-    # Handle compressed files
-    if file_path.endswith('.gz'):
-        f = gzip.open(file_path, 'rt', encoding='utf-8', errors='ignore')
+# Distinct error messages whose template is remembered
+ERROR_TEMPLATE_CACHE_SIZE = 65536
+# IPv6 address: eight groups, or fewer around "::", maybe ending in an
+# IPv4 address and a zone. A bare "::", a name like a::b or a time like
+# 12:30:00 is not one.
+IPV6_GROUP = r'[0-9a-fA-F]{1,4}'
+IPV6_ADDRESS = (r'(?:(?:{g}:){{7}}{g}|(?:{g}:){{6}}{v4}'
+                r'|(?:{g}(?::{g})*)?::(?:(?:{g}:)*{v4}|{g}(?::{g})*)'
+                r'|{g}(?::{g})*::)(?:%[\w.-]+)?').format(g=IPV6_GROUP, v4=r'\d{1,3}(?:\.\d{1,3}){3}')
+# Variable parts of error messages, masked by error_message_template():
+# URLs, IPv4 and IPv6 addresses with their port, paths, hex ids and
+# numbers. The AH code is kept since no word boundary precedes its digits.
+ERROR_MESSAGE_TOKENS = re.compile(
+    r"(?P<url>\b[a-zA-Z][\w+.-]*://[^\s,'\"]+)"
+    r"|(?P<ipv6>\[" + IPV6_ADDRESS + r"\](?::\d+)?|(?<![\w:.])(?=[0-9a-fA-F:.]*\d)" + IPV6_ADDRESS + r"(?![\w:]|\.\d))"
+    r"|(?P<ip>\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b)"
+    r"|(?P<path>(?<![\w.{])/[^\s,;:'\"()\[\]]*)"
+    r"|(?P<hex>\b(?=[0-9a-fA-F]*\d)[0-9a-fA-F]{8,}\b)"
+    r"|(?P<n>\b\d+\b)")
+# Tokens masked under another name
+ERROR_TOKEN_NAMES = {'ipv6': 'ip'}
+
+# Template of an error message, with its variable tokens replaced by {url},
+# {ip}, {path}, {hex} or {n}, so messages that only differ in client,
+# path or pid group together. Messages repeat a lot, so templates are
+# memoized in a bounded LRU cache.
+@lru_cache(maxsize=ERROR_TEMPLATE_CACHE_SIZE)
+def error_message_template(message):
+    return ERROR_MESSAGE_TOKENS.sub(lambda token: '{' + ERROR_TOKEN_NAMES.get(token.lastgroup, token.lastgroup) + '}',
+                                    message)
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+# Offset stored for timestamps that had no timezone in the log
+NAIVE_OFFSET = -2 ** 31
+offset_timezones = {}
+
+# Dictionary-encoded string column: every distinct value is stored once and
+# rows only hold an integer code into the value list
+class StringColumn:
+    __slots__ = ('values', 'codes', 'index')
+
+    def __init__(self):
+        self.values = []
+        self.codes = array('I')
+        self.index = {}
+
+    def encode(self, value):
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def append(self, value):
+        code = self.index.get(value)
+        if code is None:
+            code = self.encode(value)
+        self.codes.append(code)
+
+    def extend(self, other):
+        remap = [self.encode(value) for value in other.values]
+        self.codes.extend(remap[code] for code in other.codes)
+
+    def __getitem__(self, row):
+        return self.values[self.codes[row]]
+
+    def __len__(self):
+        return len(self.codes)
+
+    # The reverse index is rebuilt on load instead of being pickled
+    def __getstate__(self):
+        return self.values, self.codes
+
+    def __setstate__(self, state):
+        self.values, self.codes = state
+        self.index = {value: code for code, value in enumerate(self.values)}
+
+# Columnar storage for parsed entries. Timestamps are kept as epoch seconds
+# plus the original UTC offset, so row views rebuild the same datetime the
+# parser produced. Rows are partitioned by month as they are appended.
+class RecordStore:
+    string_columns = ()
+    int_columns = ()
+
+    def __init__(self):
+        self.epoch = array('q')
+        self.utc_offset = array('i')
+        self.month_rows = {}
+        for name in self.string_columns:
+            setattr(self, name, StringColumn())
+        for name, typecode in self.int_columns:
+            setattr(self, name, array(typecode))
+        # Parsed timestamps are shared by the lines of the same second, so
+        # consecutive rows usually reuse the month rows, epoch and offset of
+        # the previous one
+        self.last_timestamp = None
+        self.last_fields = None
+
+    def __len__(self):
+        return len(self.epoch)
+
+    def append_timestamp(self, timestamp, month):
+        if timestamp is not self.last_timestamp:
+            self.last_timestamp = timestamp
+            self.last_fields = self.timestamp_fields(timestamp, month)
+        rows, epoch, offset = self.last_fields
+        rows.append(len(self.epoch))
+        self.epoch.append(epoch)
+        self.utc_offset.append(offset)
+
+    # Month rows, epoch seconds and stored UTC offset of a timestamp
+    def timestamp_fields(self, timestamp, month):
+        rows = self.month_rows.get(month)
+        if rows is None:
+            rows = self.month_rows[month] = array('I')
+        offset = timestamp.utcoffset()
+        if offset is None:
+            return rows, (timestamp - EPOCH) // timedelta(seconds=1), NAIVE_OFFSET
+        return rows, (timestamp - EPOCH_UTC) // timedelta(seconds=1), offset // timedelta(seconds=1)
+
+    # The lookup shortcut is not pickled: it only matters while parsing
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['last_timestamp'] = state['last_fields'] = None
+        return state
+
+    # Append every row of another store of the same kind, in order. With
+    # month_limit, each month keeps only its first month_limit rows.
+    def extend(self, other, month_limit=None):
+        if month_limit is not None and any(self.month_count(month) + len(rows) > month_limit
+                                           for month, rows in other.month_rows.items()):
+            other = other.select_first(month_limit, self)
+        base = len(self.epoch)
+        for month, rows in other.month_rows.items():
+            own_rows = self.month_rows.get(month)
+            if own_rows is None:
+                own_rows = self.month_rows[month] = array('I')
+            own_rows.extend(row + base for row in rows)
+        self.epoch.extend(other.epoch)
+        self.utc_offset.extend(other.utc_offset)
+        for name in self.string_columns:
+            getattr(self, name).extend(getattr(other, name))
+        for name, typecode in self.int_columns:
+            getattr(self, name).extend(getattr(other, name))
+
+    # Copy of the first rows of each month that still fit next to the rows
+    # already in `existing`
+    def select_first(self, month_limit, existing):
+        selected = []
+        for month, rows in self.month_rows.items():
+            room = max(0, month_limit - existing.month_count(month))
+            selected.extend((row, month) for row in rows[:room])
+        selected.sort()
+        subset = type(self)()
+        for row, month in selected:
+            subset.append_row(self, row, month)
+        return subset
+
+    def append_row(self, other, row, month):
+        rows = self.month_rows.get(month)
+        if rows is None:
+            rows = self.month_rows[month] = array('I')
+        rows.append(len(self.epoch))
+        self.epoch.append(other.epoch[row])
+        self.utc_offset.append(other.utc_offset[row])
+        for name in self.string_columns:
+            getattr(self, name).append(getattr(other, name)[row])
+        for name, typecode in self.int_columns:
+            getattr(self, name).append(getattr(other, name)[row])
+
+    def timestamp_at(self, row):
+        offset = self.utc_offset[row]
+        if offset == NAIVE_OFFSET:
+            return EPOCH + timedelta(seconds=self.epoch[row])
+        tz = offset_timezones.get(offset)
+        if tz is None:
+            tz = offset_timezones[offset] = timezone(timedelta(seconds=offset))
+        return datetime.fromtimestamp(self.epoch[row], tz)
+
+    def months(self):
+        return sorted(self.month_rows)
+
+    def month_count(self, month):
+        return len(self.month_rows.get(month, ()))
+
+    # Rows of one month, in input order, without scanning the other months
+    def month_records(self, month):
+        rows = self.month_rows.get(month, ())
+        return (self.record_class(self, row) for row in rows)
+
+    def __iter__(self):
+        return (self.record_class(self, row) for row in range(len(self)))
+
+    def __getitem__(self, row):
+        return self.record_class(self, row)
+
+# Lightweight view over one row of a record store
+class RecordView:
+    __slots__ = ('store', 'row')
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    @property
+    def timestamp(self):
+        return self.store.timestamp_at(self.row)
+
+class AccessRecord(RecordView):
+    __slots__ = ()
+
+    ip = property(lambda self: self.store.ip[self.row])
+    method = property(lambda self: self.store.method[self.row])
+    request = property(lambda self: self.store.request[self.row])
+    user_agent = property(lambda self: self.store.user_agent[self.row])
+    status = property(lambda self: self.store.status[self.row])
+    bytes_sent = property(lambda self: self.store.bytes_sent[self.row])
+
+class ErrorRecord(RecordView):
+    __slots__ = ()
+
+    level = property(lambda self: self.store.level[self.row])
+    message = property(lambda self: self.store.message[self.row])
+    module = property(lambda self: self.store.module[self.row])
+    client = property(lambda self: self.store.client[self.row])
+
+# Row-level access data: status, bytes and epoch as typed arrays, the
+# repetitive string fields dictionary-encoded
+class AccessRecordStore(RecordStore):
+    string_columns = ('ip', 'method', 'request', 'user_agent')
+    int_columns = (('status', 'H'), ('bytes_sent', 'q'))
+    record_class = AccessRecord
+
+    def append(self, entry):
+        self.append_timestamp(entry['timestamp'], entry['month'])
+        self.ip.append(entry['ip'])
+        self.method.append(entry['method'])
+        self.request.append(entry['request'])
+        self.user_agent.append(entry['user_agent'])
+        self.status.append(entry['status'])
+        self.bytes_sent.append(entry['bytes_sent'])
+
+# Row-level error data
+class ErrorRecordStore(RecordStore):
+    string_columns = ('level', 'message', 'module', 'client')
+    record_class = ErrorRecord
+
+    def append(self, entry):
+        self.append_timestamp(entry['timestamp'], entry['month'])
+        self.level.append(entry['level'])
+        self.message.append(entry['message'])
+        self.module.append(entry['module'])
+        self.client.append(entry['client'])
+
+# Registers of the HyperLogLog unique visitor estimate (2**14, ~0.8% error)
+HLL_PRECISION = 14
+# Counters kept by each Space-Saving top-K sketch
+TOPK_CAPACITY = 1000
+
+# HyperLogLog distinct count estimator. Values are hashed with BLAKE2b (not
+# hash(), which is salted per process) so sketches from workers merge.
+class HyperLogLog:
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value):
+        x = int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+        width = 64 - self.precision
+        index = x >> width
+        rank = width - (x & ((1 << width) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        # Linear counting is more accurate for small cardinalities
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    # Standard error of the estimate, relative to the true count
+    def relative_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+# Space-Saving top-K sketch usable as a drop-in for the Counters of the
+# aggregator: `sketch[key] += 1` and update(other) work the same way. Beyond
+# 2 * capacity keys only the capacity heaviest are kept, and floor records
+# the largest count dropped; unseen keys start from floor, so counts are
+# never underestimated and overestimated by at most floor.
+class SpaceSaving(dict):
+    def __init__(self, capacity=TOPK_CAPACITY):
+        super().__init__()
+        self.capacity = capacity
+        self.floor = 0
+
+    def __missing__(self, key):
+        return self.floor
+
+    def __setitem__(self, key, count):
+        dict.__setitem__(self, key, count)
+        if len(self) > 2 * self.capacity:
+            self.prune()
+
+    def prune(self):
+        ranked = sorted(self.items(), key=itemgetter(1), reverse=True)
+        self.floor = max(self.floor, ranked[self.capacity][1])
+        self.clear()
+        dict.update(self, ranked[:self.capacity])
+
+    def most_common(self, n=None):
+        return sorted(self.items(), key=itemgetter(1), reverse=True)[:n]
+
+    # Merge another sketch (or an exact Counter): keys missing on one side
+    # may have had up to that side's floor occurrences
+    def update(self, other):
+        own_floor = self.floor
+        other_floor = getattr(other, 'floor', 0)
+        if other_floor:
+            for key in self:
+                if key not in other:
+                    dict.__setitem__(self, key, dict.__getitem__(self, key) + other_floor)
+        for key, count in other.items():
+            dict.__setitem__(self, key, dict.get(self, key, own_floor) + count)
+        self.floor = own_floor + other_floor
+        if len(self) > 2 * self.capacity:
+            self.prune()
+
+    # Pickle through the constructor so capacity is set before the items
+    def __reduce__(self):
+        return self.__class__, (self.capacity,), {'floor': self.floor}, None, iter(dict.items(self))
+
+# Columns of every minute of the rollup, then one column per error level
+ROLLUP_COLUMNS = ('requests', 'bytes', '1xx', '2xx', '3xx', '4xx', '5xx')
+# Status class column by status // 100
+ROLLUP_STATUS_CLASSES = {1: '1xx', 2: '2xx', 3: '3xx', 4: '4xx', 5: '5xx'}
+# Minutes per bucket of each query resolution
+ROLLUP_RESOLUTIONS = {'minute': 1, 'hour': 60, 'day': 24 * 60}
+ROLLUP_EPOCH = datetime(1970, 1, 1)
+ROLLUP_EPOCH_ORDINAL = ROLLUP_EPOCH.toordinal()
+# Layout version of the files written by --rollup
+ROLLUP_VERSION = 1
+
+def status_class(status):
+    return ROLLUP_STATUS_CLASSES.get(status // 100, 'otros')
+
+# Minutes since 1970-01-01 on the log's own wall clock. Apache writes local
+# time, so days and hours derived from it match the dates in the log.
+def rollup_minute(timestamp):
+    return (timestamp.toordinal() - ROLLUP_EPOCH_ORDINAL) * 1440 + timestamp.hour * 60 + timestamp.minute
+
+def rollup_datetime(minute):
+    return ROLLUP_EPOCH + timedelta(minutes=minute)
+
+# Per-minute totals of requests, bytes, status classes and error levels,
+# stored by column like RecordStore: one row per minute with traffic, in
+# first-seen order. Hour and day totals are derived from it, so time series
+# of any range come from a few arrays instead of the logs.
+class MinuteRollup:
+    def __init__(self):
+        self.rows = {}
+        self.minutes = array('q')
+        self.columns = {name: array('q') for name in ROLLUP_COLUMNS}
+        self.levels = {}
+        # Parsed timestamps are shared by the lines of the same second, so
+        # consecutive entries usually skip the minute computation
+        self.last_timestamp = None
+        self.last_minute = None
+        self.last_row = None
+
+    def row(self, minute):
+        if minute == self.last_minute:
+            return self.last_row
+        row = self.rows.get(minute)
+        if row is None:
+            row = self.rows[minute] = len(self.minutes)
+            self.minutes.append(minute)
+            for column in self.columns.values():
+                column.append(0)
+            for column in self.levels.values():
+                column.append(0)
+        self.last_minute = minute
+        self.last_row = row
+        return row
+
+    def level_column(self, level):
+        column = self.levels.get(level)
+        if column is None:
+            column = self.levels[level] = array('q', bytes(8 * len(self.minutes)))
+        return column
+
+    def timestamp_row(self, timestamp):
+        if timestamp is not self.last_timestamp:
+            self.last_timestamp = timestamp
+            self.row(rollup_minute(timestamp))
+        return self.last_row
+
+    def add_access(self, timestamp, status, bytes_sent):
+        row = self.last_row if timestamp is self.last_timestamp else self.timestamp_row(timestamp)
+        columns = self.columns
+        columns['requests'][row] += 1
+        columns['bytes'][row] += bytes_sent
+        status_class = ROLLUP_STATUS_CLASSES.get(status // 100)
+        if status_class:
+            columns[status_class][row] += 1
+
+    def add_error(self, timestamp, level):
+        self.level_column(level)[self.timestamp_row(timestamp)] += 1
+
+    # Add the totals of another rollup; with step, each of its rows goes to
+    # the first minute of its step-minute bucket
+    def merge(self, other, step=1):
+        self.last_timestamp = None
+        rows = [self.row(minute - minute % step) for minute in other.minutes]
+        for name, column in self.columns.items():
+            for row, value in zip(rows, other.columns[name]):
+                if value:
+                    column[row] += value
+        for level, other_column in other.levels.items():
+            column = self.level_column(level)
+            for row, value in zip(rows, other_column):
+                if value:
+                    column[row] += value
+
+    # Copy kept at a coarser resolution: series at that resolution or above
+    # are unchanged, with far fewer rows
+    def coarsened(self, resolution):
+        rollup = MinuteRollup()
+        rollup.merge(self, ROLLUP_RESOLUTIONS[resolution])
+        return rollup
+
+    # Totals of one column per bucket of the resolution, keyed by the first
+    # minute of the bucket
+    def counts(self, name, resolution='minute'):
+        step = ROLLUP_RESOLUTIONS[resolution]
+        column = self.columns[name] if name in self.columns else self.levels.get(name, ())
+        totals = Counter()
+        for minute, value in zip(self.minutes, column):
+            if value:
+                totals[minute - minute % step] += value
+        return totals
+
+    # Every column per bucket of the resolution for minutes in [start, end),
+    # oldest first, as (bucket start datetime, {column: total})
+    def series(self, start=None, end=None, resolution='minute'):
+        step = ROLLUP_RESOLUTIONS[resolution]
+        first = rollup_minute(start) if start is not None else None
+        last = rollup_minute(end) if end is not None else None
+        names = list(self.columns) + sorted(self.levels)
+        columns = [self.columns[name] if name in self.columns else self.levels[name] for name in names]
+        buckets = {}
+        for row, minute in enumerate(self.minutes):
+            if (first is not None and minute < first) or (last is not None and minute >= last):
+                continue
+            bucket = buckets.get(minute - minute % step)
+            if bucket is None:
+                bucket = buckets[minute - minute % step] = [0] * len(names)
+            for i, column in enumerate(columns):
+                bucket[i] += column[row]
+        return [(rollup_datetime(minute), dict(zip(names, buckets[minute]))) for minute in sorted(buckets)]
+
+    # The lookup shortcut is not pickled: it only matters while parsing
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['last_timestamp'] = state['last_minute'] = state['last_row'] = None
+        return state
+
+def save_rollup(rollup_path, rollup):
+    tmp_path = rollup_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({'version': ROLLUP_VERSION, 'rollup': rollup}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, rollup_path)
+
+def load_rollup(rollup_path):
+    try:
+        with open(rollup_path, 'rb') as f:
+            data = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError) as e:
+        print(f"No se pudo leer el resumen por minuto {rollup_path}: {e}")
+        return None
+    if not isinstance(data, dict) or data.get('version') != ROLLUP_VERSION:
+        print(f"El resumen por minuto {rollup_path} tiene un formato distinto.")
+        return None
+    return data['rollup']
+
+# --rollup-query: print the rollup totals of a time range
+def print_rollup_series(rollup, start, end, resolution):
+    series = rollup.series(start, end, resolution)
+    if not series:
+        print("No hay datos en ese intervalo.")
+        return
+    names = list(series[0][1])
+    print('\t'.join(['inicio'] + names))
+    for bucket_start, totals in series:
+        print('\t'.join([bucket_start.strftime('%Y-%m-%d %H:%M')] + [str(totals[name]) for name in names]))
+
+# Linear sub-buckets per power of two in the latency and size histograms:
+# values are kept to within 1/64 (1.6%) and are exact below 128
+HISTOGRAM_SUB_BUCKET_BITS = 6
+HISTOGRAM_SUB_BUCKETS = 1 << HISTOGRAM_SUB_BUCKET_BITS
+PERCENTILES = (('p50', 0.5), ('p90', 0.9), ('p99', 0.99))
+# URLs with their own latency and size histograms; beyond twice as many,
+# only the most requested ones keep them
+URL_HISTOGRAM_CAPACITY = 1000
+
+# Bucket of a non-negative value: the value itself below 2 * sub-buckets,
+# then the top bits of the value (HDR histogram layout)
+def histogram_bucket(value):
+    if value < 2 * HISTOGRAM_SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - HISTOGRAM_SUB_BUCKET_BITS - 1
+    return (shift << HISTOGRAM_SUB_BUCKET_BITS) + (value >> shift)
+
+# Highest value that falls in a bucket, so reported values are never low
+def histogram_value(bucket):
+    if bucket < 2 * HISTOGRAM_SUB_BUCKETS:
+        return bucket
+    shift = (bucket >> HISTOGRAM_SUB_BUCKET_BITS) - 1
+    mantissa = (bucket & (HISTOGRAM_SUB_BUCKETS - 1)) + HISTOGRAM_SUB_BUCKETS
+    return ((mantissa + 1) << shift) - 1
+
+# Log-bucketed histogram as a Counter of bucket -> count: its size depends
+# on the spread of the values, not on how many there are, and merging is
+# Counter.update()
+class LogHistogram(Counter):
+    # Count, p50, p90, p99 and max of the recorded values
+    def percentiles(self):
+        total = sum(self.values())
+        stats = {'count': total}
+        ranked = sorted(self.items())
+        seen = 0
+        position = 0
+        for name, quantile in PERCENTILES:
+            rank = max(1, math.ceil(quantile * total))
+            while seen < rank:
+                seen += ranked[position][1]
+                position += 1
+            stats[name] = histogram_value(ranked[position - 1][0])
+        stats['max'] = histogram_value(ranked[-1][0])
+        return stats
+
+# Response time (microseconds) and size (bytes) histograms of one group of
+# requests. Latency is only recorded when the log format has %D or %T.
+class ResponseDistribution:
+    def __init__(self):
+        self.latency = LogHistogram()
+        self.size = LogHistogram()
+
+    def add(self, latency_bucket, size_bucket):
+        self.size[size_bucket] += 1
+        if latency_bucket is not None:
+            self.latency[latency_bucket] += 1
+
+    def merge(self, other):
+        self.latency.update(other.latency)
+        self.size.update(other.size)
+
+# Per-month counters needed by the monthly charts
+class MonthBucket:
+    def __init__(self, approximate=False):
+        # Exact count of the month; url_counter may be a sketch that overcounts
+        self.requests = 0
+        self.url_counter = SpaceSaving() if approximate else Counter()
+        self.level_counter = Counter()
+        self.distribution = ResponseDistribution()
+
+    def merge(self, other):
+        self.requests += other.requests
+        self.url_counter.update(other.url_counter)
+        self.level_counter.update(other.level_counter)
+        self.distribution.merge(other.distribution)
+
+# Sliding window of the incident detector, in minutes
+INCIDENT_WINDOW = 10
+# Default thresholds within the window: requests of one IP, and 4xx/5xx
+# responses of one IP or URL or error log entries of one severe level
+INCIDENT_REQUEST_RATE = 600
+INCIDENT_ERROR_RATE = 100
+INCIDENT_ERROR_LEVELS = frozenset(('error', 'crit', 'alert', 'emerg'))
+# Incidents kept, highest peaks first
+INCIDENT_LIMIT = 100
+# Keys tracked by each window counter before idle ones are evicted
+INCIDENT_KEY_CAPACITY = 20000
+INCIDENT_KINDS = {
+    'ip_rate': 'Ráfaga de peticiones de una IP',
+    'ip_errors': 'Ráfaga de respuestas 4xx/5xx a una IP',
+    'url_errors': 'Ráfaga de respuestas 4xx/5xx de una URL',
+    'error_level': 'Pico de errores en error_log',
+}
+
+# Sliding-window event counts per key. A key's ring holds its per-minute
+# [count, first time, last time] for the last two windows, plus the running
+# total of the last `window` minutes. Lines up to a window late still count
+# in the minutes they belong to. The head keeps the same per-minute entries
+# for the first two windows of the input. With the ring, that is all a merge
+# needs to recount the windows across the seam between consecutive inputs.
+# At capacity, keys idle for two windows are evicted, then the least
+# recently seen, so memory stays bounded.
+class WindowCounter:
+    def __init__(self, window=INCIDENT_WINDOW):
+        self.window = window
+        # Minutes kept per key in the ring and in the head
+        self.span = 2 * window
+        # key -> [last minute, window total, {minute: [count, first, last]}]
+        self.rings = {}
+        # key -> {minute: [count, first, last]} for minutes before head_end
+        self.head = {}
+        self.first = self.last = self.head_end = None
+
+    # Count one event of key at minute. Returns the total of its window, None
+    # when the event is late (the windows of several minutes changed; see
+    # recount()), or 0 when it is too late to count.
+    def add(self, key, minute, timestamp):
+        if self.first is None or minute < self.first:
+            self.first = minute
+            self.head_end = minute + self.span
+            if self.last is None:
+                self.last = minute
+        elif minute > self.last:
+            self.last = minute
+        ring = self.rings.get(key)
+        if ring is None:
+            if len(self.rings) >= INCIDENT_KEY_CAPACITY:
+                self.evict(minute)
+            ring = self.rings[key] = [minute, 0, {}]
+        last, total, minutes = ring
+        if minute > last:
+            if minute - last >= self.span:
+                minutes.clear()
+                total = 0
+            else:
+                # Minutes leaving the window, then the ring
+                if minute - last >= self.window:
+                    total = 0
+                else:
+                    for past in range(last - self.window + 1, minute - self.window + 1):
+                        entry = minutes.get(past)
+                        if entry is not None:
+                            total -= entry[0]
+                for past in range(last - self.span + 1, minute - self.span + 1):
+                    minutes.pop(past, None)
+            ring[0] = last = minute
+        elif minute <= last - self.window:
+            return 0
+        ring[1] = total + 1
+        entry = minutes.get(minute)
+        if entry is None:
+            minutes[minute] = [1, timestamp, timestamp]
+        else:
+            entry[0] += 1
+            if timestamp < entry[1]:
+                entry[1] = timestamp
+            elif timestamp > entry[2]:
+                entry[2] = timestamp
+        if minute < self.head_end:
+            self.add_head(key, minute, timestamp)
+        return total + 1 if minute == last else None
+
+    def add_head(self, key, minute, timestamp):
+        minutes = self.head.get(key)
+        if minutes is None:
+            if len(self.head) >= INCIDENT_KEY_CAPACITY:
+                return
+            minutes = self.head[key] = {}
+        entry = minutes.get(minute)
+        if entry is None:
+            minutes[minute] = [1, timestamp, timestamp]
+        else:
+            entry[0] += 1
+            entry[1] = min(entry[1], timestamp)
+            entry[2] = max(entry[2], timestamp)
+
+    # First and last times of key within minute
+    def times(self, key, minute):
+        count, first, last = self.rings[key][2][minute]
+        return first, last
+
+    # (minute, window total, first, last) of every minute of key from minute
+    # on whose window a late event changed
+    def recount(self, key, minute):
+        last, total, minutes = self.rings[key]
+        for current in range(minute, min(last, minute + self.window - 1) + 1):
+            entry = minutes.get(current)
+            if entry is not None:
+                total = sum(minutes[past][0] for past in range(current - self.window + 1, current + 1) if past in minutes)
+                yield current, total, entry[1], entry[2]
+
+    def evict(self, minute):
+        self.rings = {key: ring for key, ring in self.rings.items() if minute - ring[0] < self.span}
+        if len(self.rings) > INCIDENT_KEY_CAPACITY // 2:
+            recent = sorted(self.rings.items(), key=lambda item: item[1][0])[-(INCIDENT_KEY_CAPACITY // 2):]
+            self.rings = dict(recent)
+
+    # Per-minute entries of key known exactly: the head, then the ring
+    def known(self, key):
+        minutes = {minute: entry for minute, entry in self.head.get(key, {}).items() if minute < self.head_end}
+        ring = self.rings.get(key)
+        if ring is not None:
+            minutes.update((minute, entry) for minute, entry in ring[2].items() if minute >= self.head_end)
+        return minutes
+
+    # Whether every minute of the window ending at minute is known exactly:
+    # the input has nothing outside first..last, and the head and the rings
+    # cover its first and last two windows
+    def covers(self, minute):
+        return minute < self.head_end or minute - self.window >= self.last - self.span
+
+    # Fold in the counts of later input. Returns (key, minute, window total,
+    # first, last) for every minute whose window holds events of both sides;
+    # neither side could see those totals alone.
+    def merge(self, other):
+        if other.first is None:
+            return []
+        if self.first is None:
+            self.first, self.last, self.head_end = other.first, other.last, other.head_end
+            self.head = {key: {minute: list(entry) for minute, entry in minutes.items()}
+                         for key, minutes in other.head.items()}
+            self.rings = {key: [last, total, {minute: list(entry) for minute, entry in minutes.items()}]
+                          for key, (last, total, minutes) in other.rings.items()}
+            return []
+        seam = []
+        keys = (other.head.keys() | other.rings.keys()) & (self.head.keys() | self.rings.keys())
+        for key in keys:
+            mine = self.known(key)
+            theirs = other.known(key)
+            if not mine or not theirs:
+                continue
+            start = max(min(mine), min(theirs))
+            end = min(max(mine), max(theirs)) + self.window - 1
+            for minute in sorted((mine.keys() | theirs.keys()) & set(range(start, end + 1))):
+                if not (self.covers(minute) and other.covers(minute)):
+                    continue
+                window = range(minute - self.window + 1, minute + 1)
+                mine_total = sum(mine[past][0] for past in window if past in mine)
+                theirs_total = sum(theirs[past][0] for past in window if past in theirs)
+                if mine_total and theirs_total:
+                    entries = [entry for entry in (mine.get(minute), theirs.get(minute)) if entry is not None]
+                    seam.append((key, minute, mine_total + theirs_total,
+                                 min(entry[1] for entry in entries), max(entry[2] for entry in entries)))
+        self.first = min(self.first, other.first)
+        self.last = max(self.last, other.last)
+        self.head_end = self.first + self.span
+        head = {}
+        for counter in (self, other):
+            for key, minutes in counter.head.items():
+                for minute, entry in minutes.items():
+                    if minute < self.head_end:
+                        self.add_entry(head.setdefault(key, {}), minute, entry)
+        self.head = dict(list(head.items())[:INCIDENT_KEY_CAPACITY])
+        for key, (last, total, minutes) in other.rings.items():
+            ring = self.rings.get(key)
+            if ring is None:
+                if len(self.rings) >= INCIDENT_KEY_CAPACITY:
+                    self.evict(self.last)
+                ring = self.rings[key] = [last, 0, {}]
+            ring[0] = max(ring[0], last)
+            for minute, entry in minutes.items():
+                self.add_entry(ring[2], minute, entry)
+            for past in [past for past in ring[2] if past <= ring[0] - self.span]:
+                del ring[2][past]
+            ring[1] = sum(entry[0] for minute, entry in ring[2].items() if minute > ring[0] - self.window)
+        return seam
+
+    @staticmethod
+    def add_entry(minutes, minute, entry):
+        current = minutes.get(minute)
+        if current is None:
+            minutes[minute] = list(entry)
+        else:
+            current[0] += entry[0]
+            current[1] = min(current[1], entry[1])
+            current[2] = max(current[2], entry[2])
+
+# Period during which the window total of one key stayed at or above its
+# threshold. Minutes are rollup minutes (wall clock of the log).
+class Incident:
+    def __init__(self, kind, key, start, minute):
+        self.kind = kind
+        self.key = key
+        self.start = self.end = start
+        self.first_minute = self.last_minute = minute
+        self.peak = 0
+
+    def extend(self, timestamp, minute, total):
+        self.start = min(self.start, timestamp)
+        self.end = max(self.end, timestamp)
+        self.first_minute = min(self.first_minute, minute)
+        self.last_minute = max(self.last_minute, minute)
+        self.peak = max(self.peak, total)
+
+    def copy(self):
+        incident = Incident(self.kind, self.key, self.start, self.first_minute)
+        incident.extend(self.end, self.last_minute, self.peak)
+        return incident
+
+# Streaming rate detector fed by the aggregator: per-IP request and 4xx/5xx
+# counts, per-URL 4xx/5xx counts and per-level counts of severe error log
+# entries, each over a sliding window. A minute of a key is part of an
+# incident when the key has events in it and the window ending there reaches
+# the threshold; minutes less than a window apart form one incident, from
+# the first event of its first minute to the last one of its last minute. A
+# threshold of 0 disables the check. This depends only on the per-minute
+# counts, so partials of consecutive files or byte ranges merged in order
+# give the incidents of a serial run, as long as the inputs overlap in time
+# by less than a window and no key is evicted.
+class IncidentDetector:
+    def __init__(self, window=INCIDENT_WINDOW, request_rate=INCIDENT_REQUEST_RATE, error_rate=INCIDENT_ERROR_RATE):
+        self.window = window
+        self.request_rate = request_rate
+        self.error_rate = error_rate
+        self.ip_requests = WindowCounter(window)
+        self.ip_errors = WindowCounter(window)
+        self.url_errors = WindowCounter(window)
+        self.level_errors = WindowCounter(window)
+        self.incidents = []
+        # Latest incident of each (kind, key), extended while it lasts
+        self.open = {}
+        # Incidents left out beyond INCIDENT_LIMIT
+        self.dropped = 0
+        self.prune_at = 2 * INCIDENT_LIMIT
+        self.last_timestamp = self.last_minute = None
+        # With both thresholds at 0 nothing is counted, so the aggregator
+        # does not feed the detector at all
+        self.enabled = bool(request_rate or error_rate)
+
+    def settings(self):
+        return self.window, self.request_rate, self.error_rate
+
+    # Empty detector with the same thresholds
+    def new_partial(self):
+        return IncidentDetector(*self.settings())
+
+    # (kind, counter, threshold) of every check
+    def checks(self):
+        return (('ip_rate', self.ip_requests, self.request_rate), ('ip_errors', self.ip_errors, self.error_rate),
+                ('url_errors', self.url_errors, self.error_rate), ('error_level', self.level_errors, self.error_rate))
+
+    # Parsed timestamps are shared between lines of the same second
+    def minute(self, timestamp):
+        if timestamp is not self.last_timestamp:
+            self.last_timestamp = timestamp
+            self.last_minute = rollup_minute(timestamp)
+        return self.last_minute
+
+    def add_access(self, ip, url, status, timestamp):
+        minute = self.last_minute if timestamp is self.last_timestamp else self.minute(timestamp)
+        if self.request_rate:
+            self.count('ip_rate', self.ip_requests, self.request_rate, ip, minute, timestamp)
+        if status >= 400 and self.error_rate:
+            self.count('ip_errors', self.ip_errors, self.error_rate, ip, minute, timestamp)
+            self.count('url_errors', self.url_errors, self.error_rate, url, minute, timestamp)
+
+    def add_error(self, level, timestamp):
+        if level in INCIDENT_ERROR_LEVELS and self.error_rate:
+            self.count('error_level', self.level_errors, self.error_rate, level, self.minute(timestamp), timestamp)
+
+    def count(self, kind, counter, threshold, key, minute, timestamp):
+        total = counter.add(key, minute, timestamp)
+        if total is None:
+            for current, total, first, last in counter.recount(key, minute):
+                if total >= threshold:
+                    self.flag(kind, key, current, total, first, last)
+        elif total >= threshold:
+            self.flag(kind, key, minute, total, *counter.times(key, minute))
+
+    def flag(self, kind, key, minute, total, first, last):
+        incident = self.open.get((kind, key))
+        if incident is None or minute - incident.last_minute > self.window:
+            incident = self.open[kind, key] = Incident(kind, key, first, minute)
+            self.incidents.append(incident)
+        incident.extend(first, minute, total)
+        incident.extend(last, minute, total)
+        if len(self.incidents) > self.prune_at:
+            self.prune()
+
+    # Keep the INCIDENT_LIMIT closed incidents with the highest peaks. An
+    # incident within two windows of the latest one may still grow or join
+    # another, so it is never dropped.
+    def prune(self):
+        latest = max(incident.last_minute for incident in self.incidents)
+        closed = sorted((incident for incident in self.incidents if latest - incident.last_minute > 2 * self.window),
+                        key=self.rank)
+        dropped_ids = set(map(id, closed[INCIDENT_LIMIT:]))
+        self.dropped += len(dropped_ids)
+        self.incidents = [incident for incident in self.incidents if id(incident) not in dropped_ids]
+        self.open = {key: incident for key, incident in self.open.items() if id(incident) not in dropped_ids}
+        self.prune_at = max(2 * INCIDENT_LIMIT, 2 * len(self.incidents))
+
+    @staticmethod
+    def rank(incident):
+        return -incident.peak, incident.first_minute, incident.kind, incident.key
+
+    # Join the incidents of a key less than a window apart, as a serial run
+    # would have found them
+    def coalesce(self):
+        incidents = []
+        self.open = {}
+        for incident in sorted(self.incidents, key=lambda incident: (incident.kind, incident.key, incident.first_minute)):
+            current = self.open.get((incident.kind, incident.key))
+            if current is not None and incident.first_minute - current.last_minute <= self.window:
+                current.extend(incident.start, incident.first_minute, incident.peak)
+                current.extend(incident.end, incident.last_minute, incident.peak)
+            else:
+                incidents.append(incident)
+                self.open[incident.kind, incident.key] = incident
+        self.incidents = incidents
+
+    # Fold in the detector of later input. Windows across the seam are
+    # recounted from the head of other and the rings of self, and the minutes
+    # they bring over a threshold join the incidents of both sides.
+    def merge(self, other):
+        self.incidents.extend(incident.copy() for incident in other.incidents)
+        for (kind, counter, threshold), other_check in zip(self.checks(), other.checks()):
+            for key, minute, total, first, last in counter.merge(other_check[1]):
+                if threshold and total >= threshold:
+                    incident = Incident(kind, key, first, minute)
+                    incident.extend(last, minute, total)
+                    self.incidents.append(incident)
+        self.dropped += other.dropped
+        self.coalesce()
+        if len(self.incidents) > self.prune_at:
+            self.prune()
+
+    # Incidents left out of the report
+    def omitted(self):
+        self.coalesce()
+        return self.dropped + max(0, len(self.incidents) - INCIDENT_LIMIT)
+
+    # The INCIDENT_LIMIT incidents with the highest peaks in time order,
+    # optionally only those starting in a month
+    def report(self, month=None):
+        self.coalesce()
+        incidents = sorted(self.incidents, key=self.rank)[:INCIDENT_LIMIT]
+        incidents.sort(key=lambda incident: (incident.first_minute, incident.kind, incident.key))
+        if month is not None:
+            incidents = [incident for incident in incidents if rollup_datetime(incident.first_minute).strftime('%Y-%m') == month]
+        return incidents
+
+# Detector with the thresholds of --incident-window, --incident-rate and
+# --incident-error-rate
+def detector_from_args(args):
+    return IncidentDetector(args.incident_window, args.incident_rate, args.incident_error_rate)
+
+# Single-pass aggregator: every summary, chart series and monthly bucket is
+# updated as entries stream in, so parsed entries never need to be kept.
+# detail_limit caps the rows kept per month for the detail tables. In
+# approximate mode the high-cardinality counters are Space-Saving sketches
+# and unique visitors come from a HyperLogLog, so memory stays bounded.
+class ReportAggregator:
+    def __init__(self, detail_limit=None, approximate=False, log_format=DEFAULT_LOG_FORMAT, time_range=None,
+                 url_normalizer=None, detector=None):
+        self.detail_limit = detail_limit
+        self.approximate = approximate
+        self.log_format = log_format
+        # UrlNormalizer of the URL counters, or None to count raw URLs
+        self.url_normalizer = url_normalizer
+        # (since, until) wall-clock bounds of the entries to keep, or None
+        self.time_range = time_range
+        top_counter = SpaceSaving if approximate else Counter
+        self.visitors = HyperLogLog() if approximate else None
+        self.total_requests = 0
+        self.ip_counter = top_counter()
+        self.url_counter = top_counter()
+        self.status_counter = Counter()
+        self.user_agent_counter = top_counter()
+        self.rollup = MinuteRollup()
+        self.detector = detector if detector is not None else IncidentDetector()
+        # Latency and size histograms per status code and per URL
+        self.status_distributions = {}
+        self.url_distributions = {}
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.total_errors = 0
+        self.level_counter = Counter()
+        self.message_counter = top_counter()
+        self.months = {}
+        # Lines the parsers could not read, by kind
+        self.rejected_lines = Counter()
+        self.access_records = AccessRecordStore()
+        self.error_records = ErrorRecordStore()
+
+    def month_bucket(self, month):
+        bucket = self.months.get(month)
+        if bucket is None:
+            bucket = self.months[month] = MonthBucket(self.approximate)
+        return bucket
+
+    # Empty aggregator with the same detail limit, counters, log format, time
+    # range, URL normalization and incident thresholds, for partials built in
+    # workers. Each partial keeps the first detail_limit rows per month of its
+    # own input, which include the first ones of the merged aggregate.
+    def new_partial(self):
+        return ReportAggregator(self.detail_limit, self.approximate, self.log_format, self.time_range,
+                                self.url_normalizer, self.detector.new_partial())
+
+    # Settings that change what a partial aggregate contains
+    def settings(self):
+        url_rules = self.url_normalizer.rules() if self.url_normalizer is not None else None
+        return self.approximate, self.log_format, url_rules, self.detector.settings()
+
+    # Suffix of the cache entries built with these settings; partials keep
+    # only detail_limit rows per month, so the limit is part of it unless
+    # detail is False
+    def cache_variant(self, detail=True):
+        variant = '-approx' if self.approximate else ''
+        if detail and self.detail_limit is not None:
+            variant += f'-rows{self.detail_limit}'
+        if self.log_format != DEFAULT_LOG_FORMAT:
+            variant += '-' + hashlib.blake2b(self.log_format.encode('utf-8'), digest_size=6).hexdigest()
+        if self.url_normalizer is not None:
+            url_rules = repr(self.url_normalizer.rules()).encode('utf-8')
+            variant += '-urls' + hashlib.blake2b(url_rules, digest_size=6).hexdigest()
+        if self.detector.settings() != IncidentDetector().settings():
+            variant += '-incidents' + '-'.join(map(str, self.detector.settings()))
+        return variant
+
+    def distribution(self, distributions, key):
+        distribution = distributions.get(key)
+        if distribution is None:
+            distribution = distributions[key] = ResponseDistribution()
+        return distribution
+
+    # Histograms of the status codes merged by status class
+    def class_distributions(self):
+        classes = {}
+        for status in sorted(self.status_distributions):
+            self.distribution(classes, status_class(status)).merge(self.status_distributions[status])
+        return classes
+
+    # Keep the histograms of the most requested URLs only
+    def prune_url_distributions(self):
+        ranked = sorted(self.url_distributions, key=self.url_counter.__getitem__, reverse=True)
+        for url in ranked[URL_HISTOGRAM_CAPACITY:]:
+            del self.url_distributions[url]
+
+    def unique_visitors(self):
+        if self.visitors is not None:
+            return self.visitors.estimate()
+        return len(self.ip_counter)
+
+    def add_access(self, entry):
+        timestamp = entry['timestamp']
+        self.total_requests += 1
+        self.ip_counter[entry['ip']] += 1
+        if self.visitors is not None:
+            self.visitors.add(entry['ip'])
+        url = entry['request']
+        if self.url_normalizer is not None:
+            url = self.url_normalizer.canonical(url)
+        self.url_counter[url] += 1
+        self.status_counter[entry['status']] += 1
+        self.user_agent_counter[entry['user_agent']] += 1
+        self.rollup.add_access(timestamp, entry['status'], entry['bytes_sent'])
+        if self.detector.enabled:
+            self.detector.add_access(entry['ip'], url, entry['status'], timestamp)
+        response_time = entry['response_time']
+        latency_bucket = None if response_time is None else histogram_bucket(response_time)
+        size_bucket = histogram_bucket(entry['bytes_sent'])
+        distribution = self.status_distributions.get(entry['status'])
+        if distribution is None:
+            distribution = self.status_distributions[entry['status']] = ResponseDistribution()
+        distribution.add(latency_bucket, size_bucket)
+        distribution = self.url_distributions.get(url)
+        if distribution is None:
+            distribution = self.url_distributions[url] = ResponseDistribution()
+            if len(self.url_distributions) > 2 * URL_HISTOGRAM_CAPACITY:
+                self.prune_url_distributions()
+        distribution.add(latency_bucket, size_bucket)
+        # Same tie-breaking as sorting every timestamp: first minimum, last maximum
+        if self.first_timestamp is None or timestamp < self.first_timestamp:
+            self.first_timestamp = timestamp
+        if self.last_timestamp is None or timestamp >= self.last_timestamp:
+            self.last_timestamp = timestamp
+
+        bucket = self.month_bucket(entry['month'])
+        bucket.requests += 1
+        bucket.url_counter[url] += 1
+        bucket.distribution.add(latency_bucket, size_bucket)
+        # A detail_limit of 0 (summaries, --follow windows) keeps no rows at all
+        limit = self.detail_limit
+        if limit is None or limit and self.access_records.month_count(entry['month']) < limit:
+            self.access_records.append(entry)
+
+    def add_error(self, entry):
+        self.total_errors += 1
+        self.level_counter[entry['level']] += 1
+        self.message_counter[error_message_template(entry['message'])] += 1
+        self.rollup.add_error(entry['timestamp'], entry['level'])
+        if self.detector.enabled:
+            self.detector.add_error(entry['level'], entry['timestamp'])
+
+        bucket = self.month_bucket(entry['month'])
+        bucket.level_counter[entry['level']] += 1
+        limit = self.detail_limit
+        if limit is None or limit and self.error_records.month_count(entry['month']) < limit:
+            self.error_records.append(entry)
+
+    # Fold in the aggregate of input that comes after everything seen so far.
+    # Counters keep first-seen key order, so merging partials in file order
+    # gives exactly the same result as a serial run.
+    def merge(self, other):
+        self.total_requests += other.total_requests
+        self.ip_counter.update(other.ip_counter)
+        if self.visitors is not None:
+            self.visitors.merge(other.visitors)
+        self.url_counter.update(other.url_counter)
+        self.status_counter.update(other.status_counter)
+        self.user_agent_counter.update(other.user_agent_counter)
+        self.rollup.merge(other.rollup)
+        self.detector.merge(other.detector)
+        for status, distribution in other.status_distributions.items():
+            self.distribution(self.status_distributions, status).merge(distribution)
+        for url, distribution in other.url_distributions.items():
+            self.distribution(self.url_distributions, url).merge(distribution)
+        if len(self.url_distributions) > 2 * URL_HISTOGRAM_CAPACITY:
+            self.prune_url_distributions()
+        if other.first_timestamp is not None:
+            if self.first_timestamp is None or other.first_timestamp < self.first_timestamp:
+                self.first_timestamp = other.first_timestamp
+            if self.last_timestamp is None or other.last_timestamp >= self.last_timestamp:
+                self.last_timestamp = other.last_timestamp
+        self.total_errors += other.total_errors
+        self.level_counter.update(other.level_counter)
+        self.message_counter.update(other.message_counter)
+        for month, bucket in other.months.items():
+            self.month_bucket(month).merge(bucket)
+        self.rejected_lines.update(other.rejected_lines)
+        self.access_records.extend(other.access_records, self.detail_limit)
+        self.error_records.extend(other.error_records, self.detail_limit)
+        return self
+
+# Parse one log file into its own partial aggregate (runs in worker processes)
+def aggregate_log_file(file_path, kind, partial=None):
+    with open_log_file(file_path) as f:
+        return aggregate_lines(f, kind, partial)
+
+# Parse the lines of one byte range of a memory-mapped plain log file
+def aggregate_log_range(file_path, kind, start, end, partial=None):
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return aggregate_lines(iter_mapped_lines(mapped, start, end), kind, partial)
+
+def aggregate_lines(lines, kind, aggregator=None):
+    if aggregator is None:
+        aggregator = ReportAggregator()
+    if aggregator.time_range is not None:
+        return aggregate_lines_in_range(lines, kind, aggregator)
+    rejected = 0
+    if kind == 'access':
+        parse_line = access_log_parser(aggregator.log_format)
+        for line in lines:
+            entry = parse_line(line)
+            if entry:
+                aggregator.add_access(entry)
+            else:
+                rejected += 1
     else:
-        f = open(file_path, 'r', encoding='utf-8', errors='ignore')
+        for line in lines:
+            entry = parse_error_log_line(line)
+            if entry:
+                aggregator.add_error(entry)
+            else:
+                rejected += 1
+    aggregator.rejected_lines[kind] += rejected
+    return aggregator
+
+# Like aggregate_lines, but only entries whose wall-clock time falls in the
+# time range of the aggregator are added, and reading stops once the log is
+# clearly past its end
+def aggregate_lines_in_range(lines, kind, aggregator):
+    since, until = aggregator.time_range
+    stop = until + TIME_RANGE_SLACK if until is not None else None
+    if kind == 'access':
+        parse_line = access_log_parser(aggregator.log_format)
+        add_entry = aggregator.add_access
+    else:
+        parse_line = parse_error_log_line
+        add_entry = aggregator.add_error
+    rejected = 0
+    for line in lines:
+        entry = parse_line(line)
+        if not entry:
+            rejected += 1
+            continue
+        timestamp = entry['timestamp'].replace(tzinfo=None)
+        if (since is None or timestamp >= since) and (until is None or timestamp < until):
+            add_entry(entry)
+        elif stop is not None and timestamp >= stop:
+            break
+    aggregator.rejected_lines[kind] += rejected
+    return aggregator
+
+# Entries and rejected lines of one kind seen by an aggregator
+def aggregate_counts(aggregator, kind):
+    parsed = aggregator.total_requests if kind == 'access' else aggregator.total_errors
+    return parsed, aggregator.rejected_lines[kind]
+
+# Size of the blocks decoded at once when reading memory-mapped log ranges
+MMAP_BLOCK_SIZE = 4 * 1024 * 1024
+
+# Yield the text lines of mapped[start:end]. Blocks are decoded straight from
+# the mapping through a memoryview, and newlines are translated the same way
+# text mode does, so lines match what open_log_file() would return.
+def iter_mapped_lines(mapped, start, end):
+    with memoryview(mapped) as view:
+        pos = start
+        while pos < end:
+            block_end = min(pos + MMAP_BLOCK_SIZE, end)
+            if block_end < end:
+                newline = mapped.rfind(b'\n', pos, block_end)
+                if newline == -1:
+                    newline = mapped.find(b'\n', block_end, end)
+                block_end = end if newline == -1 else newline + 1
+            yield from decode_log_lines(view[pos:block_end])
+            pos = block_end
+
+# Decode a buffer of whole log lines into text lines, dropping invalid UTF-8
+# and translating newlines the same way text mode does
+def decode_log_lines(buffer):
+    text = str(buffer, 'utf-8', 'ignore')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    lines = text.split('\n')
+    if not lines[-1]:
+        lines.pop()
+    return lines
+
+# Split a plain log file, from a start offset, into byte ranges of about
+# chunk_size bytes, each ending right after a newline. Compressed files and
+# small files read from the start stay whole (None).
+def split_log_file(file_path, chunk_size, start=0):
+    size = os.path.getsize(file_path)
+    if compression_suffix(file_path) or (not start and (not chunk_size or size <= chunk_size)):
+        return [None]
+    if not chunk_size:
+        return [(start, size)]
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return split_mapped_range(mapped, start, size, chunk_size)
+
+def split_mapped_range(mapped, start, end, chunk_size):
+    ranges = []
+    while start < end:
+        newline = mapped.find(b'\n', min(start + chunk_size, end) - 1, end)
+        stop = end if newline == -1 else newline + 1
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+# Apache writes the time a request started when it ends, so slow requests
+# leave log lines slightly out of order. Time range decisions taken from a
+# few lines (pruning files, seeking, stopping early) keep this margin.
+TIME_RANGE_SLACK = timedelta(minutes=5)
+# Bytes read at each end of a log to find its first and last timestamps,
+# and at each binary search probe
+SPAN_BLOCK_SIZE = 64 * 1024
+# The binary search stops once this few bytes remain; the line filter
+# handles the rest
+SEEK_WINDOW = 64 * 1024
+
+# --since/--until value: an ISO date on the wall clock of the logs
+def parse_time_bound(value):
     try:
-        for line in f:
-            parsed_line = parse_error_log_line(line)
-            if parsed_line:
-                data.append(parsed_line)
-    finally:
-        f.close()
-    return data
+        bound = datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"fecha inválida: {value}")
+    if bound.tzinfo is not None:
+        raise argparse.ArgumentTypeError(f"la fecha no debe tener zona horaria (se usa la hora de los logs): {value}")
+    return bound
 
-# Function to parse a single line of error log
-def parse_error_log_line(line):
-    # Error Log Format matching your sample
-    regex = r'^\[(.*?)\] \[(\w+)\] (.*)$'
-    match = re.match(regex, line)
-    if match:
-        date_str, level, message = match.groups()
+# Wall-clock time of the first line that parses, or None
+def first_line_time(lines, kind, log_format):
+    parse_line = access_log_parser(log_format) if kind == 'access' else parse_error_log_line
+    for line in lines:
+        entry = parse_line(line)
+        if entry:
+            return entry['timestamp'].replace(tzinfo=None)
+    return None
+
+# First and last wall-clock times of a log, from the lines that parse at
+# each end. A compressed log has to be decompressed whole to reach its end,
+# so its last time is None unless need_last is set.
+def log_time_span(file_path, kind, log_format, need_last=True):
+    compressed = compression_suffix(file_path)
+    with open_log_stream(file_path) as f:
+        tail = head = f.read(SPAN_BLOCK_SIZE)
+        first = first_line_time(decode_log_lines(head), kind, log_format)
+        if compressed and not need_last:
+            return first, None
+        if compressed:
+            while True:
+                block = f.read(TAIL_BLOCK_SIZE)
+                if not block:
+                    break
+                tail = tail[-SPAN_BLOCK_SIZE:] + block
+        else:
+            f.seek(max(0, os.fstat(f.fileno()).st_size - SPAN_BLOCK_SIZE))
+            tail = f.read(SPAN_BLOCK_SIZE)
+    return first, first_line_time(reversed(decode_log_lines(tail)), kind, log_format)
+
+# Offset of a line of a plain log at or before the first one timed at or
+# after bound. Binary search over byte offsets: each probe resyncs on the
+# next newline and reads the first line that parses. The log is assumed to
+# be in time order.
+def seek_log_time(file_path, kind, log_format, bound):
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        low, high = 0, len(mapped)
+        while high - low > SEEK_WINDOW:
+            middle = (low + high) // 2
+            line_start = mapped.find(b'\n', middle, high) + 1
+            time = None
+            if line_start:
+                probe = mapped[line_start:min(line_start + SPAN_BLOCK_SIZE, high)]
+                time = first_line_time(decode_log_lines(probe), kind, log_format)
+            if time is not None and time < bound:
+                low = line_start
+            else:
+                high = middle
+    return low
+
+# Files of one log to read for the time range of the aggregator, as
+# (file_path, start offset, filtered). Files whose first and last times fall
+# outside the range are skipped, and plain files that begin before it are
+# read from the offset found by binary search. Files wholly inside the range
+# need no filtering, so their parsed partials can be cached. Spans of
+# compressed logs cost a full decompression and are kept in the cache.
+def plan_time_range(log_files, kind, aggregator, cache=None):
+    if aggregator.time_range is None:
+        return [(file_path, 0, False) for file_path in log_files]
+    since, until = aggregator.time_range
+    span_kind = kind + aggregator.cache_variant(detail=False)
+    plan = []
+    for file_path in log_files:
+        compressed = compression_suffix(file_path)
+        span = cache.time_span(file_path, span_kind) if cache and compressed else None
+        if span is None:
+            span = log_time_span(file_path, kind, aggregator.log_format, need_last=False)
+            first = span[0]
+            # Without a cache, a compressed log is only read whole to find
+            # out whether it ends before the range
+            if (compressed and first is not None and (until is None or first - TIME_RANGE_SLACK < until)
+                    and (cache or (since is not None and first - TIME_RANGE_SLACK < since))):
+                span = log_time_span(file_path, kind, aggregator.log_format)
+                if cache:
+                    cache.set_time_span(file_path, span_kind, span)
+        first, last = span
+        if ((until is not None and first is not None and first - TIME_RANGE_SLACK >= until)
+                or (since is not None and last is not None and last + TIME_RANGE_SLACK < since)):
+            print(f"Se omite {file_path}: sus entradas están fuera del intervalo pedido")
+            continue
+        inside = (first is not None and last is not None
+                  and (since is None or first - TIME_RANGE_SLACK >= since)
+                  and (until is None or last + TIME_RANGE_SLACK < until))
+        start = 0
+        if not compressed and since is not None and first is not None and first - TIME_RANGE_SLACK < since:
+            start = seek_log_time(file_path, kind, aggregator.log_format, since - TIME_RANGE_SLACK)
+        plan.append((file_path, start, not inside))
+    return plan
+
+# Parse log files, as planned by plan_time_range(), in a process pool. Big
+# plain files are split into byte ranges; the largest tasks are submitted
+# first to balance the workers, but partials are merged in file and range
+# order so the result is identical to a serial run.
+def parse_logs_in_pool(log_files, kind, aggregator, jobs, chunk_size=0, cache=None, metrics=None):
+    tasks = []
+    uncacheable = set()
+    for file_path, start, filtered in log_files:
+        if filtered:
+            uncacheable.add(file_path)
+        for byte_range in split_log_file(file_path, chunk_size, start):
+            size = os.path.getsize(file_path) if byte_range is None else byte_range[1] - byte_range[0]
+            tasks.append((file_path, byte_range, size))
+    cached = set()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {}
+        for file_path, byte_range, size in sorted(tasks, key=lambda task: task[2], reverse=True):
+            cache_entry = None
+            if cache and file_path not in uncacheable:
+                cache_entry = cache.entry_path(file_path, kind, aggregator.cache_variant())
+            if cache_entry:
+                if os.path.exists(cache_entry):
+                    cached.add(file_path)
+                futures[file_path, byte_range] = executor.submit(run_measured, cached_aggregate_log_file, file_path, kind,
+                                                                 cache_entry, aggregator.new_partial())
+            elif byte_range is None:
+                futures[file_path, byte_range] = executor.submit(run_measured, aggregate_log_file, file_path, kind,
+                                                                 aggregator.new_partial())
+            else:
+                futures[file_path, byte_range] = executor.submit(run_measured, aggregate_log_range, file_path, kind,
+                                                                 *byte_range, aggregator.new_partial())
+        for file_path, start, filtered in log_files:
+            print(f"Procesando {file_path}...")
+            count = rejected = read = 0
+            usage = [0, 0, 0]
+            for task_file, byte_range, size in tasks:
+                if task_file != file_path:
+                    continue
+                partial, wall, cpu, peak = futures.pop((file_path, byte_range)).result()
+                parsed, partial_rejected = aggregate_counts(partial, kind)
+                count += parsed
+                rejected += partial_rejected
+                read += size
+                usage = [usage[0] + wall, usage[1] + cpu, max(usage[2], peak)]
+                aggregator.merge(partial)
+            if metrics:
+                metrics.add_file(kind, file_path, count, rejected, read, *usage, cached=file_path in cached)
+            print(f"Encontradas {count} entradas en {file_path}")
+    return aggregator
+
+# Layout version of the parse cache entries; bump when ReportAggregator changes
+CACHE_VERSION = 1
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# On-disk cache of the partial aggregate of each compressed rotated log. Entries are
+# content-addressed (hash of the compressed file) and stored as zlib-compressed
+# pickles; an index keyed by path, size and mtime avoids rehashing unchanged
+# files. Rendered charts are kept alongside, keyed by their input series.
+# Least recently used entries are evicted beyond max_bytes.
+class ParseCache:
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, 'index.pkl')
+        self.spans_path = os.path.join(cache_dir, 'spans.pkl')
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index = self.load_index(self.index_path)
+        # First and last times of compressed logs, keyed by path and kind
+        self.spans = self.load_index(self.spans_path)
+
+    @staticmethod
+    def load_index(index_path):
         try:
-            timestamp = datetime.strptime(date_str, '%a %b %d %H:%M:%S %Y')
-        except ValueError:
+            with open(index_path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return {}
+
+    # Cache entry for a log file, or None for files that may still change
+    def entry_path(self, file_path, kind, variant=''):
+        if not compression_suffix(file_path):
             return None
-        return {
-            'timestamp': timestamp,
-            'level': level,
-            'message': message.strip(),
-            'month': timestamp.strftime('%Y-%m')
-        }
+        st = os.stat(file_path)
+        identity = (st.st_size, st.st_mtime_ns)
+        known = self.index.get(file_path)
+        if known is not None and known[0] == identity:
+            digest = known[1]
+        else:
+            digest = hash_file(file_path)
+            self.index[file_path] = (identity, digest)
+        entry = os.path.join(self.cache_dir, f'v{CACHE_VERSION}-{kind}{variant}-{digest}.bin')
+        if os.path.exists(entry):
+            os.utime(entry)
+        return entry
+
+    # Cached (first, last) times of a compressed log, or None
+    def time_span(self, file_path, kind):
+        st = os.stat(file_path)
+        known = self.spans.get((file_path, kind))
+        if known is not None and known[0] == (st.st_size, st.st_mtime_ns):
+            return known[1]
+        return None
+
+    def set_time_span(self, file_path, kind, span):
+        st = os.stat(file_path)
+        self.spans[file_path, kind] = ((st.st_size, st.st_mtime_ns), span)
+
+    # Cache entry for a rendered chart, addressed by its spec and format
+    def chart_entry(self, spec, chart_format):
+        key = repr((matplotlib.__version__, chart_format, sorted(spec.items())))
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=20).hexdigest()
+        return os.path.join(self.cache_dir, f'chart-{digest}.{chart_format}')
+
+    # Save the index and evict the least recently used entries
+    def finish(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(('.bin', '.png', '.svg')):
+                st = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((st.st_mtime, st.st_size, name))
+        entries.sort(reverse=True)
+        total = 0
+        for mtime, size, name in entries:
+            total += size
+            if total > self.max_bytes:
+                os.remove(os.path.join(self.cache_dir, name))
+        self.index = {path: known for path, known in self.index.items() if os.path.exists(path)}
+        self.spans = {key: known for key, known in self.spans.items() if os.path.exists(key[0])}
+        for index_path, index in ((self.index_path, self.index), (self.spans_path, self.spans)):
+            tmp_path = index_path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, index_path)
+
+def hash_file(file_path):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as f:
+        while True:
+            block = f.read(HASH_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+# Partial aggregate of a log file, read from its cache entry when present
+# and written to it otherwise (runs in worker processes)
+def cached_aggregate_log_file(file_path, kind, cache_entry, partial=None):
+    try:
+        with open(cache_entry, 'rb') as f:
+            return pickle.loads(zlib.decompress(f.read()))
+    except FileNotFoundError:
+        pass
+    except (OSError, EOFError, zlib.error, pickle.UnpicklingError, AttributeError) as e:
+        print(f"Entrada de caché inválida {cache_entry}: {e}")
+    aggregator = aggregate_log_file(file_path, kind, partial)
+    tmp_path = f'{cache_entry}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(zlib.compress(pickle.dumps(aggregator, protocol=pickle.HIGHEST_PROTOCOL), 1))
+    os.replace(tmp_path, cache_entry)
+    return aggregator
+
+def default_cache_dir():
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'httpd-fancyreport')
+
+# Layout version of the incremental state file
+STATE_VERSION = 1
+# Leading bytes of every log (decompressed) hashed to recognize it after a rename
+FINGERPRINT_SIZE = 1024
+# Size of the blocks read when parsing the new tail of a compressed log
+TAIL_BLOCK_SIZE = 1024 * 1024
+
+# Raised when a tracked log no longer matches what the state file recorded
+class IncrementalStateError(Exception):
+    pass
+
+def read_log_head(file_path):
+    with open_log_binary(file_path) as f:
+        return f.read(FINGERPRINT_SIZE)
+
+def fingerprint(data):
+    return hashlib.sha1(data).hexdigest()
+
+# Yield (lines, offset after them) for the blocks of a log from a byte
+# offset to its end; offsets of compressed logs count decompressed bytes.
+# A plain log may still be written to, so its unterminated last line is
+# left for later.
+def iter_log_blocks(file_path, offset):
+    compressed = compression_suffix(file_path)
+    with open_log_stream(file_path) if compressed else open(file_path, 'rb') as f:
+        if compressed:
+            # Decompressed streams cannot seek cheaply; skip what was read before
+            remaining = offset
+            while remaining:
+                skipped = len(f.read(min(remaining, TAIL_BLOCK_SIZE)))
+                if not skipped:
+                    raise IncrementalStateError(f"{file_path} es más corto que lo ya procesado")
+                remaining -= skipped
+        else:
+            f.seek(offset)
+        pending = b''
+        while True:
+            block = f.read(TAIL_BLOCK_SIZE)
+            if not block:
+                break
+            data = pending + block
+            cut = data.rfind(b'\n') + 1
+            pending = data[cut:]
+            if cut:
+                offset += cut
+                yield decode_log_lines(data[:cut]), offset
+        # Rotated archives are complete, so a last line without newline counts
+        if pending and compressed:
+            offset += len(pending)
+            yield decode_log_lines(pending), offset
+
+# Parse a compressed log from a decompressed byte offset to its end
+def aggregate_log_tail(file_path, kind, offset, aggregator):
+    for lines, offset in iter_log_blocks(file_path, offset):
+        aggregate_lines(lines, kind, aggregator)
+    return aggregator, offset
+
+# Match the current log files against the records of the previous run.
+# Unchanged files are skipped outright; otherwise a record follows its file
+# across renames and compression through the fingerprint of its first bytes,
+# and the same inode wins when several records match.
+def plan_log_updates(log_files, records):
+    available = list(records)
+    plan = []
+    for file_path in log_files:
+        st = os.stat(file_path)
+        identity = [st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns]
+        record = next((r for r in available if r['path'] == file_path and r['identity'] == identity), None)
+        head = None
+        if record is None:
+            head = read_log_head(file_path)
+            candidates = [r for r in available
+                          if 0 < r['fingerprint_len'] <= len(head) and fingerprint(head[:r['fingerprint_len']]) == r['fingerprint']]
+            candidates.sort(key=lambda r: r['identity'][:2] != identity[:2])
+            record = candidates[0] if candidates else None
+            if record is not None:
+                if not compression_suffix(file_path) and st.st_size < record['offset']:
+                    raise IncrementalStateError(f"{file_path} es más corto que lo ya procesado")
+                if record['path'] != file_path:
+                    print(f"Rotación detectada: {file_path} continúa {record['path']}")
+        if record is not None:
+            available.remove(record)
+        plan.append((file_path, identity, head, record))
+    # A path still present whose old content went nowhere was truncated
+    for record in available:
+        if record['path'] in log_files:
+            print(f"Archivo truncado o reemplazado: {record['path']}")
+    return plan
+
+# Parse only the bytes of each log that previous runs have not seen, merging
+# them into the stored aggregator. Returns the records for the next run.
+def update_log_files(log_files, kind, aggregator, records, jobs, chunk_size, metrics=None):
+    plan = plan_log_updates(log_files, records)
+    tasks = []
+    ends = {}
+    for file_path, identity, head, record in plan:
+        if head is None:
+            continue
+        offset = record['offset'] if record else 0
+        if compression_suffix(file_path):
+            tasks.append((file_path, ('tail', offset)))
+            continue
+        # Only complete lines are parsed; a partially written last line is
+        # picked up on the next run
+        end = offset
+        if identity[2] > offset:
+            with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                end = mapped.rfind(b'\n', offset) + 1 or offset
+                if end > offset:
+                    ranges = split_mapped_range(mapped, offset, end, chunk_size if jobs > 1 and chunk_size else end - offset)
+                    tasks.extend((file_path, ('range', byte_range)) for byte_range in ranges)
+        ends[file_path] = end
+
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {task: executor.submit(run_measured, run_update_task, kind, *task, aggregator.new_partial())
+                       for task in tasks}
+            results = {task: future.result() for task, future in futures.items()}
     else:
+        results = {task: run_measured(run_update_task, kind, *task, aggregator.new_partial()) for task in tasks}
+
+    new_records = []
+    for file_path, identity, head, record in plan:
+        if head is None:
+            new_records.append(record)
+            continue
+        offset = ends.get(file_path, record['offset'] if record else 0)
+        file_tasks = [task for task in tasks if task[0] == file_path]
+        if file_tasks:
+            print(f"Procesando {file_path}...")
+            count = rejected = read = 0
+            usage = [0, 0, 0]
+            for task in file_tasks:
+                (partial, task_end), wall, cpu, peak = results[task]
+                parsed, partial_rejected = aggregate_counts(partial, kind)
+                count += parsed
+                rejected += partial_rejected
+                usage = [usage[0] + wall, usage[1] + cpu, max(usage[2], peak)]
+                aggregator.merge(partial)
+                if task[1][0] == 'tail':
+                    read += task_end - task[1][1]
+                    offset = task_end
+                else:
+                    read += task_end - task[1][1][0]
+            if metrics:
+                metrics.add_file(kind, file_path, count, rejected, read, *usage)
+            print(f"Encontradas {count} entradas nuevas en {file_path}")
+        if not head:
+            continue
+        new_records.append({
+            'path': file_path,
+            'identity': identity,
+            'offset': offset,
+            'fingerprint': fingerprint(head),
+            'fingerprint_len': len(head),
+        })
+    return new_records
+
+def run_update_task(kind, file_path, task, partial):
+    if task[0] == 'tail':
+        return aggregate_log_tail(file_path, kind, task[1], partial)
+    return aggregate_log_range(file_path, kind, *task[1], partial), task[1][1]
+
+def load_incremental_state(state_path):
+    if not os.path.exists(state_path):
+        return None
+    try:
+        with open(state_path, 'rb') as f:
+            state = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError) as e:
+        print(f"No se pudo leer el estado incremental {state_path}: {e}")
+        return None
+    if not isinstance(state, dict) or state.get('version') != STATE_VERSION:
+        print(f"El estado incremental {state_path} tiene un formato distinto; se ignora.")
         return None
+    return state
+
+def save_incremental_state(state_path, state):
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, state_path)
+
+# Incremental parsing: the state file keeps, per log, its identity, the
+# offset already parsed and a head fingerprint, together with the running
+# aggregator. Each run only parses what was appended since the last one.
+# aggregator is the empty aggregator to start from when there is no usable
+# state; its settings must match the stored one.
+def parse_logs_incrementally(dir_path, state_path, aggregator, jobs=1, chunk_size=0, metrics=None):
+    access_logs = find_log_files(dir_path, 'access_log')
+    error_logs = find_log_files(dir_path, 'error_log')
+    state = load_incremental_state(state_path)
+    if state is not None and state['aggregator'].settings() != aggregator.settings():
+        print(f"El estado incremental {state_path} se creó con otros valores de --approximate, --log-format, de agrupación de URL "
+              "o de umbrales de incidentes; "
+              "se reconstruye desde cero.")
+        state = None
+    if state is not None:
+        state['aggregator'].detail_limit = aggregator.detail_limit
+        try:
+            return update_incremental_state(state, access_logs, error_logs, state_path, jobs, chunk_size, metrics)
+        except IncrementalStateError as e:
+            print(f"Estado incremental inconsistente ({e}); se reconstruye desde cero.")
+    state = {'version': STATE_VERSION, 'files': {'access': [], 'error': []}, 'aggregator': aggregator}
+    return update_incremental_state(state, access_logs, error_logs, state_path, jobs, chunk_size, metrics)
+
+def update_incremental_state(state, access_logs, error_logs, state_path, jobs, chunk_size, metrics=None):
+    aggregator = state['aggregator']
+    files = state['files']
+    files['access'] = update_log_files(access_logs, 'access', aggregator, files['access'], jobs, chunk_size, metrics)
+    files['error'] = update_log_files(error_logs, 'error', aggregator, files['error'], jobs, chunk_size, metrics)
+    save_incremental_state(state_path, state)
+    return aggregator
+
+# Rows inserted per executemany() call when exporting to SQLite
+SQLITE_BATCH_SIZE = 10000
+# Access fields exported to SQLite (the referer is kept there, not in reports)
+SQLITE_ACCESS_FIELDS = ACCESS_FIELDS + ('referer',)
+SQLITE_TABLES = """
+    CREATE TABLE IF NOT EXISTS access (
+        time TEXT NOT NULL, utc_offset INTEGER, ip TEXT, method TEXT, url TEXT,
+        status INTEGER, bytes INTEGER, referer TEXT, user_agent TEXT, response_time INTEGER);
+    CREATE TABLE IF NOT EXISTS errors (
+        time TEXT NOT NULL, level TEXT, message TEXT, module TEXT, pid INTEGER, client TEXT, code TEXT);
+    CREATE TABLE IF NOT EXISTS log_files (
+        kind TEXT NOT NULL, path TEXT NOT NULL, identity TEXT NOT NULL, offset INTEGER NOT NULL,
+        fingerprint TEXT NOT NULL, fingerprint_len INTEGER NOT NULL);
+"""
+# Created after the first load, which is faster than filling indexed tables
+SQLITE_INDEXES = """
+    CREATE INDEX IF NOT EXISTS access_time ON access (time);
+    CREATE INDEX IF NOT EXISTS access_status ON access (status);
+    CREATE INDEX IF NOT EXISTS access_ip ON access (ip);
+    CREATE INDEX IF NOT EXISTS access_url ON access (url);
+    CREATE INDEX IF NOT EXISTS errors_time ON errors (time);
+    CREATE INDEX IF NOT EXISTS errors_level ON errors (level);
+    CREATE INDEX IF NOT EXISTS errors_code ON errors (code);
+"""
+SQLITE_INSERTS = {
+    'access': 'INSERT INTO access VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+    'error': 'INSERT INTO errors (time, level, message, module, pid, client, code) VALUES (?, ?, ?, ?, ?, ?, ?)',
+}
+# Columns added to the errors table after its first layout, for older databases
+SQLITE_ERROR_COLUMNS = (('module', 'TEXT'), ('pid', 'INTEGER'), ('client', 'TEXT'), ('code', 'TEXT'))
+
+# Wall-clock time of an entry as sortable text, plus its UTC offset in
+# seconds (None for timestamps without one)
+def sqlite_time(timestamp):
+    offset = timestamp.utcoffset()
+    return (timestamp.replace(tzinfo=None).isoformat(' '),
+            None if offset is None else int(offset.total_seconds()))
+
+# Table rows of the new lines of one log, from offset to its end. Yields
+# (rows, lines rejected, offset after them) per block.
+def sqlite_rows(file_path, kind, offset, log_format):
+    parse_line = access_log_parser(log_format, SQLITE_ACCESS_FIELDS) if kind == 'access' else parse_error_log_line
+    last_timestamp = last_time = None
+    for lines, offset in iter_log_blocks(file_path, offset):
+        rows = []
+        rejected = 0
+        for line in lines:
+            entry = parse_line(line)
+            if not entry:
+                rejected += 1
+                continue
+            # Lines of the same second share their parsed timestamp
+            if entry['timestamp'] is not last_timestamp:
+                last_timestamp = entry['timestamp']
+                last_time = sqlite_time(last_timestamp)
+            if kind == 'access':
+                rows.append((*last_time, entry['ip'], entry['method'], entry['request'], entry['status'],
+                             entry['bytes_sent'], entry['referer'], entry['user_agent'], entry['response_time']))
+            else:
+                rows.append((last_time[0], entry['level'], entry['message'], entry['module'], entry['pid'],
+                             entry['client'], entry['code']))
+        yield rows, rejected, offset
+
+# Append the new lines of one log in a single transaction that also moves
+# its offset, so an interrupted export never inserts a line twice
+def export_log_file(connection, file_path, kind, identity, head, record, log_format):
+    offset = record['offset'] if record else 0
+    start = offset
+    count = rejected = 0
+    with connection:
+        batch = []
+        for rows, block_rejected, offset in sqlite_rows(file_path, kind, offset, log_format):
+            batch.extend(rows)
+            rejected += block_rejected
+            if len(batch) >= SQLITE_BATCH_SIZE:
+                connection.executemany(SQLITE_INSERTS[kind], batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            connection.executemany(SQLITE_INSERTS[kind], batch)
+            count += len(batch)
+        if record:
+            connection.execute('DELETE FROM log_files WHERE rowid = ?', (record['rowid'],))
+        if head:
+            connection.execute('INSERT INTO log_files VALUES (?, ?, ?, ?, ?, ?)',
+                               (kind, file_path, json.dumps(identity), offset, fingerprint(head), len(head)))
+    return count, rejected, offset - start
+
+# Export stage: append to a SQLite database the lines each log gained since
+# the previous export, tracking files across rotation like --state does.
+# Indexes on time, status, IP and URL are built once the first load is in.
+def export_logs_to_sqlite(dir_path, db_path, log_format, metrics=None):
+    connection = sqlite3.connect(db_path)
+    try:
+        connection.execute('PRAGMA journal_mode = WAL')
+        connection.execute('PRAGMA synchronous = NORMAL')
+        connection.executescript(SQLITE_TABLES)
+        columns = {row[1] for row in connection.execute('PRAGMA table_info(errors)')}
+        with connection:
+            for column, column_type in SQLITE_ERROR_COLUMNS:
+                if column not in columns:
+                    connection.execute(f'ALTER TABLE errors ADD COLUMN {column} {column_type}')
+        for kind, prefix in (('access', 'access_log'), ('error', 'error_log')):
+            records = [{'rowid': rowid, 'path': path, 'identity': json.loads(identity), 'offset': offset,
+                        'fingerprint': digest, 'fingerprint_len': length}
+                       for rowid, path, identity, offset, digest, length in connection.execute(
+                           'SELECT rowid, path, identity, offset, fingerprint, fingerprint_len FROM log_files '
+                           'WHERE kind = ?', (kind,))]
+            try:
+                plan = plan_log_updates(find_log_files(dir_path, prefix), records)
+            except IncrementalStateError as e:
+                print(f"No se puede anexar a {db_path} ({e}); bórrela para exportar todo de nuevo.")
+                return
+            # Logs that are gone are no longer tracked
+            matched = {record['rowid'] for file_path, identity, head, record in plan if record}
+            with connection:
+                connection.executemany('DELETE FROM log_files WHERE rowid = ?',
+                                       [(record['rowid'],) for record in records if record['rowid'] not in matched])
+            for file_path, identity, head, record in plan:
+                if head is None:
+                    continue
+                try:
+                    (count, rejected, read), *usage = run_measured(
+                        export_log_file, connection, file_path, kind, identity, head, record, log_format)
+                except IncrementalStateError as e:
+                    print(f"No se exportó {file_path} ({e}).")
+                    continue
+                if metrics:
+                    metrics.add_file(kind, file_path, count, rejected, read, *usage)
+                print(f"Exportadas {count} entradas nuevas de {file_path} a {db_path}")
+        connection.executescript(SQLITE_INDEXES)
+    finally:
+        connection.close()
+
+# Feed the rows of an exported database to the aggregator, in insertion
+# order, as if the logs were parsed again
+def aggregate_sqlite(db_path, aggregator):
+    connection = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    timezones = {}
+    # The time range becomes a condition on the indexed time column
+    where = ''
+    bounds = []
+    if aggregator.time_range is not None:
+        since, until = aggregator.time_range
+        conditions = []
+        if since is not None:
+            conditions.append('time >= ?')
+            bounds.append(sqlite_time(since)[0])
+        if until is not None:
+            conditions.append('time < ?')
+            bounds.append(sqlite_time(until)[0])
+        where = ' WHERE ' + ' AND '.join(conditions)
+    try:
+        last_key = timestamp = None
+        for time_text, utc_offset, ip, method, url, status, bytes_sent, user_agent, response_time in connection.execute(
+                'SELECT time, utc_offset, ip, method, url, status, bytes, user_agent, response_time FROM access'
+                f'{where} ORDER BY rowid', bounds):
+            if (time_text, utc_offset) != last_key:
+                last_key = (time_text, utc_offset)
+                timestamp = datetime.fromisoformat(time_text)
+                if utc_offset is not None:
+                    tz = timezones.get(utc_offset)
+                    if tz is None:
+                        tz = timezones[utc_offset] = timezone(timedelta(seconds=utc_offset))
+                    timestamp = timestamp.replace(tzinfo=tz)
+            aggregator.add_access({
+                'ip': ip, 'timestamp': timestamp, 'method': method, 'request': url, 'status': status,
+                'bytes_sent': bytes_sent, 'user_agent': user_agent, 'response_time': response_time,
+                'month': time_text[:7],
+            })
+        # Databases exported by older versions lack the 2.4 columns
+        present = {row[1] for row in connection.execute('PRAGMA table_info(errors)')}
+        error_columns = ', '.join(column if column in present else 'NULL' for column, column_type in SQLITE_ERROR_COLUMNS)
+        for time_text, level, message, module, pid, client, code in connection.execute(
+                f'SELECT time, level, message, {error_columns} FROM errors{where} ORDER BY rowid', bounds):
+            aggregator.add_error({
+                'timestamp': datetime.fromisoformat(time_text), 'level': level, 'message': message,
+                'month': time_text[:7], 'module': module or '-', 'pid': pid, 'client': client or '-', 'code': code or '-',
+            })
+    finally:
+        connection.close()
+    return aggregator
+
+# `query` subcommand: run one SQL statement on an exported database
+def run_query(argv):
+    parser = argparse.ArgumentParser(prog='httpd-fancyreport.py query',
+                                     description="Consulta la base SQLite generada con --sqlite.")
+    parser.add_argument('database', help="Base SQLite generada con --sqlite")
+    parser.add_argument('sql', nargs='?', help="Consulta SQL (si se omite, muestra las tablas y sus columnas)")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.database):
+        print(f"No existe la base {args.database}.")
+        exit(1)
+    # Read-only, so an ad hoc query cannot change the exported data
+    connection = sqlite3.connect(f'file:{args.database}?mode=ro', uri=True)
+    try:
+        if args.sql is None:
+            for (name,) in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name"):
+                columns = [column[1] for column in connection.execute(f'PRAGMA table_info({name})')]
+                count = connection.execute(f'SELECT COUNT(*) FROM {name}').fetchone()[0]
+                print(f"{name} ({count} filas): {', '.join(columns)}")
+            return
+        cursor = connection.execute(args.sql)
+        if cursor.description:
+            print('\t'.join(column[0] for column in cursor.description))
+        for row in cursor:
+            print('\t'.join('' if value is None else str(value) for value in row))
+    except sqlite3.Error as e:
+        print(f"Error de SQLite: {e}")
+        exit(1)
+    finally:
+        connection.close()
 
 # Generate summary statistics for access logs
-def generate_access_summary(access_data):
+def generate_access_summary(aggregator):
     summary = {}
-    total_requests = len(access_data)
-    summary['total_requests'] = total_requests
+    summary['total_requests'] = aggregator.total_requests
 
     # Unique visitors
-    unique_ips = set(entry['ip'] for entry in access_data)
-    summary['unique_visitors'] = len(unique_ips)
+    summary['unique_visitors'] = aggregator.unique_visitors()
 
     # Top requested URLs
-    url_counter = Counter(entry['request'] for entry in access_data)
-    summary['top_urls'] = url_counter.most_common(10)
+    summary['top_urls'] = aggregator.url_counter.most_common(10)
 
     # Status code distribution
-    status_counter = Counter(entry['status'] for entry in access_data)
-    summary['status_distribution'] = status_counter
+    summary['status_distribution'] = aggregator.status_counter
 
     # Top user agents
-    user_agent_counter = Counter(entry['user_agent'] for entry in access_data)
-    summary['top_user_agents'] = user_agent_counter.most_common(5)
+    summary['top_user_agents'] = aggregator.user_agent_counter.most_common(5)
 
     # Top IP addresses
-    ip_counter = Counter(entry['ip'] for entry in access_data)
-    summary['top_ips'] = ip_counter.most_common(5)
+    summary['top_ips'] = aggregator.ip_counter.most_common(5)
+
+    # Response time and size percentiles per status class and top URL
+    summary['percentiles'] = response_percentiles(aggregator, [url for url, count in summary['top_urls']])
+
+    # Error bounds of the estimates in approximate mode
+    summary['notes'] = []
+    if summary['percentiles']['sampled']:
+        summary['notes'].append(
+            f"Los percentiles de las URLs marcadas con * cubren solo sus peticiones más recientes: su histograma se "
+            f"descartó mientras no estaba entre las {URL_HISTOGRAM_CAPACITY} URLs más solicitadas.")
+    if aggregator.approximate:
+        max_error = max(counter.floor for counter in (aggregator.url_counter, aggregator.ip_counter, aggregator.user_agent_counter))
+        summary['notes'].append(
+            f"Valores aproximados: los visitantes únicos se estiman con HyperLogLog (error típico ±{aggregator.visitors.relative_error():.2%}); "
+            f"los conteos de URLs, IPs y agentes de usuario nunca son menores que los reales y los superan como máximo en {max_error} "
+            f"(Space-Saving con {TOPK_CAPACITY} contadores).")
 
     return summary
 
+# Percentile rows (group, stats) of the latency and size histograms, by
+# status class then by URL. Latency is empty when the logs have no %D/%T.
+# A URL whose histogram was pruned and restarted covers fewer requests than
+# its count: it is marked with '*' and listed in 'sampled'.
+def response_percentiles(aggregator, urls):
+    classes = aggregator.class_distributions()
+    groups = [(f'Estado {key}', classes[key]) for key in sorted(classes)]
+    sampled = []
+    # Sketch counts may exceed the real ones by up to their floor
+    floor = getattr(aggregator.url_counter, 'floor', 0)
+    for url in urls:
+        distribution = aggregator.url_distributions.get(url)
+        if distribution is None:
+            continue
+        if sum(distribution.size.values()) < aggregator.url_counter[url] - floor:
+            sampled.append(url)
+            groups.append((url + ' *', distribution))
+        else:
+            groups.append((url, distribution))
+    return {
+        'latency': [(name, distribution.latency.percentiles()) for name, distribution in groups if distribution.latency],
+        'size': [(name, distribution.size.percentiles()) for name, distribution in groups if distribution.size],
+        'sampled': sampled,
+    }
+
+def format_duration(microseconds):
+    if microseconds < 1000:
+        return f'{microseconds} µs'
+    if microseconds < 1000000:
+        return f'{microseconds / 1000:.1f} ms'
+    return f'{microseconds / 1000000:.2f} s'
+
+def format_size(size):
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024:
+            return f'{size} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.1f} GiB'
+
+# Grouped bar chart spec of p50/p90/p99 per group; values are scaled by unit
+def percentile_chart_spec(rows, title, ylabel, unit=1):
+    return {
+        'kind': 'grouped_bar', 'figsize': (12, 6), 'x': [name for name, stats in rows],
+        'series': [(name, [stats[name] / unit for group, stats in rows]) for name, quantile in PERCENTILES],
+        'xlabel': 'Grupo', 'ylabel': ylabel, 'title': title,
+    }
+
 # Generate summary statistics for error logs
-def generate_error_summary(error_data):
+def generate_error_summary(aggregator):
     summary = {}
-    total_errors = len(error_data)
-    summary['total_errors'] = total_errors
+    summary['total_errors'] = aggregator.total_errors
 
     # Error levels
-    level_counter = Counter(entry['level'] for entry in error_data)
-    summary['level_distribution'] = level_counter
+    summary['level_distribution'] = aggregator.level_counter
 
     # Top error messages
-    message_counter = Counter(entry['message'] for entry in error_data)
-    summary['top_error_messages'] = message_counter.most_common(5)
+    summary['top_error_messages'] = aggregator.message_counter.most_common(5)
 
+    summary['notes'] = []
+    if aggregator.approximate:
+        summary['notes'].append(
+            f"Valores aproximados: los conteos de mensajes de error nunca son menores que los reales y los superan como máximo en "
+            f"{aggregator.message_counter.floor} "
+            f"(Space-Saving con {TOPK_CAPACITY} contadores).")
+
+    return summary
+
+# Incidents of the detector and notes on how they were found
+def generate_incident_summary(aggregator):
+    detector = aggregator.detector
+    summary = {}
+    summary['incidents'] = detector.report()
+    summary['notes'] = [
+        f"Se marca un incidente cuando en {detector.window} minutos una IP hace {detector.request_rate} peticiones, "
+        f"una IP o una URL recibe {detector.error_rate} respuestas 4xx/5xx, o error_log registra {detector.error_rate} "
+        f"errores de un nivel grave ({', '.join(sorted(INCIDENT_ERROR_LEVELS))}). El pico es el máximo en la ventana."]
+    if detector.omitted():
+        summary['notes'].append(f"Se omitieron {detector.omitted()} incidentes con picos menores.")
     return summary
 
+# Table of incidents shared by the index and the monthly reports
+def format_incident_table(incidents):
+    if not incidents:
+        return "<p>No se detectaron incidentes.</p>\n"
+    rows = ''.join(f"<tr><td>{INCIDENT_KINDS[incident.kind]}</td><td>{incident.key}</td>"
+                   f"<td>{incident.start.strftime('%Y-%m-%d %H:%M:%S')}</td><td>{incident.end.strftime('%Y-%m-%d %H:%M:%S')}</td>"
+                   f"<td>{incident.peak}</td></tr>\n" for incident in incidents)
+    return f"""<table>
+                <tr><th>Tipo</th><th>IP, URL o nivel</th><th>Inicio</th><th>Fin</th><th>Pico</th></tr>
+{rows}            </table>
+"""
+
 # Generate charts for access logs
-def generate_access_charts(access_data, output_folder):
+def generate_access_charts(aggregator, charts):
     chart_paths = {}
 
     # Requests over time
-    timestamps = [entry['timestamp'] for entry in access_data]
-    if not timestamps:
+    if not aggregator.total_requests:
         return chart_paths
-    timestamps.sort()
-    first_date = timestamps[0].date()
-    last_date = timestamps[-1].date()
+    first_date = aggregator.first_timestamp.date()
+    last_date = aggregator.last_timestamp.date()
     date_range = (last_date - first_date).days + 1
-    date_counts = Counter(ts.date() for ts in timestamps)
+    date_counts = {rollup_datetime(minute).date(): count
+                   for minute, count in aggregator.rollup.counts('requests', 'day').items()}
     dates = [first_date + timedelta(days=i) for i in range(date_range)]
     counts = [date_counts.get(date, 0) for date in dates]
-
-    plt.figure(figsize=(14, 6))
-    plt.plot(dates, counts, marker='o', linestyle='-', color='blue')
-    plt.xlabel('Fecha')
-    plt.ylabel('Número de Peticiones')
-    plt.title('Peticiones HTTP en el Tiempo')
-    plt.xticks(rotation=45, ha="right")
-    plt.tight_layout()
-    timeline_chart_path = os.path.join(output_folder, 'access_timeline.png')
-    plt.savefig(timeline_chart_path)
-    plt.close()
-    chart_paths['Peticiones HTTP en el Tiempo'] = timeline_chart_path
+    chart_paths['Peticiones HTTP en el Tiempo'] = charts.add('access_timeline', {
+        'kind': 'line', 'figsize': (14, 6), 'x': dates, 'y': counts, 'color': 'blue',
+        'xlabel': 'Fecha', 'ylabel': 'Número de Peticiones', 'title': 'Peticiones HTTP en el Tiempo',
+    })
 
     # Status code distribution pie chart
-    status_counter = Counter(entry['status'] for entry in access_data)
-    labels = [str(status) for status in status_counter.keys()]
-    sizes = status_counter.values()
-    plt.figure(figsize=(8, 8))
-    plt.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=140)
-    plt.title('Distribución de Códigos de Estado HTTP')
-    plt.axis('equal')
-    status_pie_chart_path = os.path.join(output_folder, 'status_pie_chart.png')
-    plt.savefig(status_pie_chart_path)
-    plt.close()
-    chart_paths['Distribución de Códigos de Estado HTTP'] = status_pie_chart_path
+    status_counter = aggregator.status_counter
+    chart_paths['Distribución de Códigos de Estado HTTP'] = charts.add('status_pie_chart', {
+        'kind': 'pie', 'figsize': (8, 8), 'x': [str(status) for status in status_counter.keys()],
+        'y': list(status_counter.values()), 'title': 'Distribución de Códigos de Estado HTTP',
+    })
 
     # Top requested URLs bar chart
-    url_counter = Counter(entry['request'] for entry in access_data)
-    top_urls = url_counter.most_common(10)
+    top_urls = aggregator.url_counter.most_common(10)
     if top_urls:
         urls = [url for url, count in top_urls]
         counts = [count for url, count in top_urls]
-        plt.figure(figsize=(12, 6))
-        plt.barh(urls[::-1], counts[::-1], color='green')
-        plt.xlabel('Frecuencia')
-        plt.ylabel('URL Solicitada')
-        plt.title('Top 10 URLs Más Solicitadas')
-        plt.tight_layout()
-        urls_chart_path = os.path.join(output_folder, 'top_urls_chart.png')
-        plt.savefig(urls_chart_path)
-        plt.close()
-        chart_paths['Top 10 URLs Más Solicitadas'] = urls_chart_path
+        chart_paths['Top 10 URLs Más Solicitadas'] = charts.add('top_urls_chart', {
+            'kind': 'barh', 'figsize': (12, 6), 'x': urls[::-1], 'y': counts[::-1], 'color': 'green',
+            'xlabel': 'Frecuencia', 'ylabel': 'URL Solicitada', 'title': 'Top 10 URLs Más Solicitadas',
+        })
 
     # Top IP addresses bar chart
-    ip_counter = Counter(entry['ip'] for entry in access_data)
-    top_ips = ip_counter.most_common(10)
+    top_ips = aggregator.ip_counter.most_common(10)
     if top_ips:
         ips = [ip for ip, count in top_ips]
         counts = [count for ip, count in top_ips]
-        plt.figure(figsize=(12, 6))
-        plt.barh(ips[::-1], counts[::-1], color='orange')
-        plt.xlabel('Frecuencia')
-        plt.ylabel('Dirección IP')
-        plt.title('Top 10 Direcciones IP')
-        plt.tight_layout()
-        ips_chart_path = os.path.join(output_folder, 'top_ips_chart.png')
-        plt.savefig(ips_chart_path)
-        plt.close()
-        chart_paths['Top 10 Direcciones IP'] = ips_chart_path
+        chart_paths['Top 10 Direcciones IP'] = charts.add('top_ips_chart', {
+            'kind': 'barh', 'figsize': (12, 6), 'x': ips[::-1], 'y': counts[::-1], 'color': 'orange',
+            'xlabel': 'Frecuencia', 'ylabel': 'Dirección IP', 'title': 'Top 10 Direcciones IP',
+        })
+
+    # Response time and size percentiles per status class and per month
+    classes = sorted(aggregator.class_distributions().items())
+    months = sorted(aggregator.months.items())
+    latency_rows = [(key, distribution.latency.percentiles()) for key, distribution in classes if distribution.latency]
+    if latency_rows:
+        chart_paths['Percentiles de Tiempo de Respuesta por Clase de Estado'] = charts.add('latency_by_status_chart',
+            percentile_chart_spec(latency_rows, 'Percentiles de Tiempo de Respuesta por Clase de Estado', 'Milisegundos', 1000))
+        month_rows = [(month, bucket.distribution.latency.percentiles()) for month, bucket in months
+                      if bucket.distribution.latency]
+        chart_paths['Percentiles de Tiempo de Respuesta por Mes'] = charts.add('latency_by_month_chart',
+            percentile_chart_spec(month_rows, 'Percentiles de Tiempo de Respuesta por Mes', 'Milisegundos', 1000))
+    size_rows = [(key, distribution.size.percentiles()) for key, distribution in classes if distribution.size]
+    if size_rows:
+        chart_paths['Percentiles de Tamaño de Respuesta por Clase de Estado'] = charts.add('size_by_status_chart',
+            percentile_chart_spec(size_rows, 'Percentiles de Tamaño de Respuesta por Clase de Estado', 'KiB', 1024))
+        month_rows = [(month, bucket.distribution.size.percentiles()) for month, bucket in months
+                      if bucket.distribution.size]
+        chart_paths['Percentiles de Tamaño de Respuesta por Mes'] = charts.add('size_by_month_chart',
+            percentile_chart_spec(month_rows, 'Percentiles de Tamaño de Respuesta por Mes', 'KiB', 1024))
 
     return chart_paths
 
 # Generate charts for error logs
-def generate_error_charts(error_data, output_folder):
+def generate_error_charts(aggregator, charts):
     chart_paths = {}
 
     # Error levels bar chart
-    level_counter = Counter(entry['level'] for entry in error_data)
+    level_counter = aggregator.level_counter
     if level_counter:
-        levels = list(level_counter.keys())
-        counts = list(level_counter.values())
-        plt.figure(figsize=(8, 6))
-        plt.bar(levels, counts, color='red')
-        plt.xlabel('Nivel de Error')
-        plt.ylabel('Cantidad')
-        plt.title('Distribución de Niveles de Error')
-        plt.tight_layout()
-        levels_chart_path = os.path.join(output_folder, 'error_levels_chart.png')
-        plt.savefig(levels_chart_path)
-        plt.close()
-        chart_paths['Distribución de Niveles de Error'] = levels_chart_path
+        chart_paths['Distribución de Niveles de Error'] = charts.add('error_levels_chart', {
+            'kind': 'bar', 'figsize': (8, 6), 'x': list(level_counter.keys()), 'y': list(level_counter.values()),
+            'color': 'red', 'xlabel': 'Nivel de Error', 'ylabel': 'Cantidad', 'title': 'Distribución de Niveles de Error',
+        })
 
     return chart_paths
 
+# Draw one chart described by a plain-data spec with the Agg object API.
+# No pyplot global state is involved, so charts can render in any process.
+def render_chart(spec, chart_path):
+    figure = Figure(figsize=spec['figsize'])
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    kind = spec['kind']
+    if kind == 'line':
+        ax.plot(spec['x'], spec['y'], marker='o', linestyle='-', color=spec['color'])
+    elif kind == 'grouped_bar':
+        width = 0.8 / len(spec['series'])
+        positions = range(len(spec['x']))
+        for i, (label, values) in enumerate(spec['series']):
+            ax.bar([position + i * width for position in positions], values, width, label=label)
+        ax.set_xticks([position + width * (len(spec['series']) - 1) / 2 for position in positions])
+        ax.set_xticklabels(spec['x'])
+        ax.legend()
+    elif kind == 'pie':
+        ax.pie(spec['y'], labels=spec['x'], autopct='%1.1f%%', startangle=140)
+    elif kind == 'barh':
+        ax.barh(spec['x'], spec['y'], color=spec['color'])
+    else:
+        ax.bar(spec['x'], spec['y'], color=spec['color'])
+    if 'xlabel' in spec:
+        ax.set_xlabel(spec['xlabel'])
+        ax.set_ylabel(spec['ylabel'])
+    ax.set_title(spec['title'])
+    if kind == 'line':
+        for label in ax.get_xticklabels():
+            label.set_rotation(45)
+            label.set_horizontalalignment('right')
+    if kind == 'pie':
+        ax.axis('equal')
+    else:
+        figure.tight_layout()
+    figure.savefig(chart_path)
+
+# Chart rendering stage. Report generators register chart specs and get the
+# file path back right away; render() then draws every chart, in a process
+# pool with jobs > 1. With a cache, a chart whose spec hashes to an already
+# rendered file is copied instead of redrawn. quiet leaves out the count of
+# generated charts, for the --follow refreshes.
+class ChartRenderer:
+    def __init__(self, output_folder, chart_format='png', cache=None):
+        self.output_folder = output_folder
+        self.chart_format = chart_format
+        self.cache = cache
+        self.pending = []
+
+    def add(self, name, spec):
+        chart_path = os.path.join(self.output_folder, f'{name}.{self.chart_format}')
+        self.pending.append((spec, chart_path))
+        return chart_path
+
+    def render(self, jobs=1, quiet=False):
+        to_render = []
+        reused = 0
+        for spec, chart_path in self.pending:
+            entry = self.cache.chart_entry(spec, self.chart_format) if self.cache else None
+            if entry and os.path.exists(entry):
+                os.utime(entry)
+                shutil.copyfile(entry, chart_path)
+                reused += 1
+            else:
+                to_render.append((spec, chart_path, entry))
+        self.pending = []
+
+        if jobs > 1 and len(to_render) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                for future in [executor.submit(render_chart, spec, chart_path) for spec, chart_path, entry in to_render]:
+                    future.result()
+        else:
+            for spec, chart_path, entry in to_render:
+                render_chart(spec, chart_path)
+        for spec, chart_path, entry in to_render:
+            if entry:
+                tmp_path = entry + '.tmp'
+                shutil.copyfile(chart_path, tmp_path)
+                os.replace(tmp_path, entry)
+        if not quiet:
+            print(f"Gráficos: {len(to_render)} generados, {reused} reutilizados de la caché")
+
 # Generate the index HTML report
-def generate_index_html(access_summary, error_summary, chart_paths, output_folder, months):
+def generate_index_html(access_summary, error_summary, chart_paths, output_folder, months, pdf=True, incident_summary=None):
     # Common CSS styles for both web and PDF versions
     common_css = """
     body { font-family: Arial, sans-serif; margin: 20px; }
@@ -296,6 +3029,9 @@ def generate_index_html(access_summary, error_summary, chart_paths, output_folde
     .summary h2 { margin-top: 0; }
     ul { list-style-type: none; padding: 0; }
     li { margin: 5px 0; }
+    table { border-collapse: collapse; }
+    th, td { border: 1px solid #ddd; padding: 4px 8px; text-align: right; }
+    th:first-child, td:first-child { text-align: left; }
     a { text-decoration: none; color: #1a0dab; }
     a:hover { text-decoration: underline; }
     img { max-width: 100%; height: auto; }
@@ -356,9 +3092,28 @@ def generate_index_html(access_summary, error_summary, chart_paths, output_folde
     for agent, count in access_summary['top_user_agents']:
         html_content += f"<li>{agent}: {count} veces</li>\n"
 
-    html_content += f"""
+    html_content += """
             </ul>
-        </div>
+"""
+    for title, rows, format_value in (('Percentiles de Tiempo de Respuesta', access_summary['percentiles']['latency'], format_duration),
+                                      ('Percentiles de Tamaño de Respuesta', access_summary['percentiles']['size'], format_size)):
+        if not rows:
+            continue
+        html_content += f"""
+            <p><strong>{title}:</strong></p>
+            <table>
+                <tr><th>Grupo</th><th>Peticiones medidas</th><th>p50</th><th>p90</th><th>p99</th><th>Máx.</th></tr>
+"""
+        for name, stats in rows:
+            html_content += (f"<tr><td>{name}</td><td>{stats['count']}</td>"
+                             + ''.join(f"<td>{format_value(stats[key])}</td>" for key in ('p50', 'p90', 'p99', 'max'))
+                             + "</tr>\n")
+        html_content += """            </table>
+"""
+    for note in access_summary['notes']:
+        html_content += f"<p><em>{note}</em></p>\n"
+
+    html_content += f"""        </div>
 
         <div class="summary">
             <h2>Estadísticas de Errores</h2>
@@ -381,7 +3136,21 @@ def generate_index_html(access_summary, error_summary, chart_paths, output_folde
 
     html_content += """
             </ul>
-        </div>
+"""
+    for note in error_summary['notes']:
+        html_content += f"<p><em>{note}</em></p>\n"
+
+    html_content += """        </div>
+    """
+
+    if incident_summary is not None:
+        html_content += """
+        <div class="summary">
+            <h2>Incidentes</h2>
+""" + format_incident_table(incident_summary['incidents'])
+        for note in incident_summary['notes']:
+            html_content += f"<p><em>{note}</em></p>\n"
+        html_content += """        </div>
     """
 
     # Add charts to the index page
@@ -413,6 +3182,8 @@ def generate_index_html(access_summary, error_summary, chart_paths, output_folde
         f.write(html_content)
 
     print(f"Reporte HTML principal generado en {html_path}")
+    if not pdf:
+        return None
 
     # Prepare HTML for PDF conversion (add PDF-specific CSS)
     html_content_for_pdf = f"""
@@ -434,19 +3205,37 @@ def generate_index_html(access_summary, error_summary, chart_paths, output_folde
 
     return html_pdf_path  # Ensure html_pdf_path is defined before returning
 
-# Generate monthly reports
-def generate_monthly_reports(access_data, error_data, output_folder):
-    months = sorted(set(entry['month'] for entry in access_data + error_data))
-    for month in months:
-        # Filter data for the month
-        access_entries = [entry for entry in access_data if entry['month'] == month]
-        error_entries = [entry for entry in error_data if entry['month'] == month]
+# Writes the web and PDF variants of a report side by side. Only the <head>
+# differs between them, so every body fragment goes straight to both files
+# and neither document is ever held in memory.
+class ReportWriter:
+    def __init__(self, html_path, html_head, html_pdf_path=None, pdf_head=None):
+        self.html_file = open(html_path, 'w', encoding='utf-8')
+        self.html_file.write(html_head)
+        self.pdf_file = None
+        if html_pdf_path:
+            self.pdf_file = open(html_pdf_path, 'w', encoding='utf-8')
+            self.pdf_file.write(pdf_head)
 
-        # Generate charts for the month
-        chart_paths = generate_monthly_charts(access_entries, error_entries, output_folder, month)
+    def write(self, fragment, html=True, pdf=True):
+        if html:
+            self.html_file.write(fragment)
+        if pdf and self.pdf_file:
+            self.pdf_file.write(fragment)
+
+    def close(self):
+        self.html_file.close()
+        if self.pdf_file:
+            self.pdf_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
-        # Common CSS styles
-        common_css = """
+# Common CSS styles for the monthly reports
+MONTHLY_COMMON_CSS = """
         body { font-family: Arial, sans-serif; margin: 20px; }
         table { border-collapse: collapse; width: 100%; margin-bottom: 50px; table-layout: fixed; word-wrap: break-word; }
         th, td { padding: 8px 12px; border: 1px solid #ddd; text-align: left; vertical-align: top; }
@@ -457,8 +3246,8 @@ def generate_monthly_reports(access_data, error_data, output_folder):
         .summary h2 { margin-top: 0; }
         """
 
-        # Additional CSS for PDF version
-        pdf_css = """
+# Additional CSS for the PDF version of the monthly reports
+MONTHLY_PDF_CSS = """
         @page {
             size: A4;
             margin: 20mm;
@@ -471,29 +3260,7 @@ def generate_monthly_reports(access_data, error_data, output_folder):
         }
         """
 
-        html_content = f"""
-        <html>
-        <head>
-            <title>Reporte de {month}</title>
-            <style>
-                {common_css}
-            </style>
-        </head>
-        <body>
-            <h1>Reporte de {month}</h1>
-        """
-
-        # Include charts
-        for chart_title, chart_filename in chart_paths.items():
-            html_content += f"""
-            <div class="chart">
-                <h2>{chart_title}</h2>
-                <img src="{os.path.basename(chart_filename)}" alt="{chart_title}">
-            </div>
-            """
-
-        # Access log details
-        html_content += """
+ACCESS_TABLE_HEADER = """
             <h2>Detalles de Acceso</h2>
             <table>
                 <thead>
@@ -509,162 +3276,933 @@ def generate_monthly_reports(access_data, error_data, output_folder):
                 <tbody>
         """
 
-        for entry in access_entries:
-            html_content += f"""
-                <tr>
-                    <td>{entry['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}</td>
-                    <td>{entry['ip']}</td>
-                    <td>{entry['method']}</td>
-                    <td>{entry['request']}</td>
-                    <td>{entry['status']}</td>
-                    <td>{entry['user_agent']}</td>
-                </tr>
-            """
-
-        html_content += """
-                </tbody>
-            </table>
-        """
-
-        # Error log details
-        html_content += """
+ERROR_TABLE_HEADER = """
             <h2>Detalles de Errores</h2>
             <table>
                 <thead>
                     <tr>
                         <th>Fecha y Hora</th>
                         <th>Nivel</th>
+                        <th>Módulo</th>
+                        <th>Cliente</th>
                         <th>Mensaje</th>
                     </tr>
                 </thead>
                 <tbody>
         """
 
-        for entry in error_entries:
-            html_content += f"""
+TABLE_FOOTER = """
+                </tbody>
+            </table>
+        """
+
+def format_access_row(record):
+    return f"""
                 <tr>
-                    <td>{entry['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}</td>
-                    <td>{entry['level']}</td>
-                    <td>{entry['message']}</td>
+                    <td>{record.timestamp.strftime('%Y-%m-%d %H:%M:%S')}</td>
+                    <td>{record.ip}</td>
+                    <td>{record.method}</td>
+                    <td>{record.request}</td>
+                    <td>{record.status}</td>
+                    <td>{record.user_agent}</td>
                 </tr>
             """
 
-        html_content += """
-                </tbody>
-            </table>
-            <p><a href="index.html">Volver al índice</a></p>
+def format_error_row(record):
+    return f"""
+                <tr>
+                    <td>{record.timestamp.strftime('%Y-%m-%d %H:%M:%S')}</td>
+                    <td>{record.level}</td>
+                    <td>{record.module}</td>
+                    <td>{record.client}</td>
+                    <td>{record.message}</td>
+                </tr>
+            """
+
+# Detail tables of the monthly reports: title, page file slug, header and row format
+DETAIL_TABLES = {
+    'access': ('Detalles de Acceso', 'accesos', ACCESS_TABLE_HEADER, format_access_row),
+    'error': ('Detalles de Errores', 'errores', ERROR_TABLE_HEADER, format_error_row),
+}
+
+# Stream one detail table of a monthly report. Rows are written to the
+# files as they are formatted; with page_size the web version links to
+# separate page files instead, while the PDF version keeps the whole table.
+def write_detail_table(writer, output_folder, month, kind, records, shown, total, page_size=None, pdf=True):
+    title, slug, header, format_row = DETAIL_TABLES[kind]
+    pages = -(-shown // page_size) if page_size else 0
+    writer.write(header, html=not pages, pdf=pdf)
+    if pages:
+        links = ' '.join(f'<a href="{detail_page_name(month, slug, page)}">{page}</a>' for page in range(1, pages + 1))
+        writer.write(f"""
+            <h2>{title}</h2>
+            <p>{shown} entradas en {pages} páginas: {links}</p>
+        """, pdf=False)
+
+    page_file = None
+    for row, record in enumerate(records):
+        fragment = format_row(record)
+        writer.write(fragment, html=not pages, pdf=pdf)
+        if pages:
+            if row % page_size == 0:
+                if page_file:
+                    close_detail_page(page_file, month, slug, row // page_size, pages)
+                page_file = open_detail_page(output_folder, month, title, slug, header, row // page_size + 1, pages)
+            page_file.write(fragment)
+    if page_file:
+        close_detail_page(page_file, month, slug, pages, pages)
+
+    writer.write(TABLE_FOOTER, html=not pages, pdf=pdf)
+    if shown < total:
+        writer.write(f"""
+            <p>Se muestran las primeras {shown} de {total} entradas.</p>
+        """, pdf=pdf)
+
+def detail_page_name(month, slug, page):
+    return f'reporte_{month}_{slug}_{page}.html'
+
+def detail_page_navigation(month, slug, page, pages):
+    links = []
+    if page > 1:
+        links.append(f'<a href="{detail_page_name(month, slug, page - 1)}">&laquo; Anterior</a>')
+    links.append(f'Página {page} de {pages}')
+    if page < pages:
+        links.append(f'<a href="{detail_page_name(month, slug, page + 1)}">Siguiente &raquo;</a>')
+    links.append(f'<a href="reporte_{month}.html">Volver al reporte de {month}</a>')
+    return f"""
+            <p>{' | '.join(links)}</p>
+        """
+
+def open_detail_page(output_folder, month, title, slug, header, page, pages):
+    page_file = open(os.path.join(output_folder, detail_page_name(month, slug, page)), 'w', encoding='utf-8')
+    page_file.write(f"""
+        <html>
+        <head>
+            <title>Reporte de {month} - {title} ({page}/{pages})</title>
+            <style>
+                {MONTHLY_COMMON_CSS}
+            </style>
+        </head>
+        <body>
+            <h1>Reporte de {month}</h1>
+        """)
+    page_file.write(detail_page_navigation(month, slug, page, pages))
+    page_file.write(header)
+    return page_file
+
+def close_detail_page(page_file, month, slug, page, pages):
+    page_file.write(TABLE_FOOTER)
+    page_file.write(detail_page_navigation(month, slug, page, pages))
+    page_file.write("""
         </body>
         </html>
-        """
+        """)
+    page_file.close()
 
-        # Save the web version of the monthly report
-        html_path = os.path.join(output_folder, f'reporte_{month}.html')
-        with open(html_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+# Generate monthly reports. pdf_mode 'full' writes the PDF version with the
+# detail tables, 'summary' without them and 'none' skips it; the PDFs
+# themselves are rendered afterwards by generate_pdfs.
+def generate_monthly_reports(aggregator, output_folder, charts, page_size=None, pdf_mode='full'):
+    months = sorted(aggregator.months)
+    for month in months:
+        bucket = aggregator.months[month]
+
+        # Generate charts for the month
+        chart_paths = generate_monthly_charts(bucket, charts, month)
+
+        html_head = f"""
+        <html>
+        <head>
+            <title>Reporte de {month}</title>
+            <style>
+                {MONTHLY_COMMON_CSS}
+            </style>
+        </head>
+        <body>"""
 
-        # Prepare HTML for PDF conversion
-        html_content_for_pdf = f"""
+        pdf_head = f"""
         <html>
         <head>
             <title>Reporte de {month}</title>
             <style>
-                {common_css}
-                {pdf_css}
+                {MONTHLY_COMMON_CSS}
+                {MONTHLY_PDF_CSS}
             </style>
         </head>
-        """ + html_content.split('<body>')[1]
+        """
+
+        # Write the web and PDF versions of the monthly report
+        html_path = os.path.join(output_folder, f'reporte_{month}.html')
+        html_pdf_path = os.path.join(output_folder, f'reporte_{month}_pdf.html') if pdf_mode != 'none' else None
+        pdf_details = pdf_mode == 'full'
+        with ReportWriter(html_path, html_head, html_pdf_path, pdf_head) as writer:
+            writer.write(f"""
+            <h1>Reporte de {month}</h1>
+        """)
+
+            # Include charts
+            for chart_title, chart_filename in chart_paths.items():
+                writer.write(f"""
+            <div class="chart">
+                <h2>{chart_title}</h2>
+                <img src="{os.path.basename(chart_filename)}" alt="{chart_title}">
+            </div>
+            """)
 
-        # Save the PDF version of the monthly report
-        html_pdf_path = os.path.join(output_folder, f'reporte_{month}_pdf.html')
-        with open(html_pdf_path, 'w', encoding='utf-8') as f:
-            f.write(html_content_for_pdf)
+            writer.write("""
+            <div class="summary">
+                <h2>Incidentes</h2>
+            """ + format_incident_table(aggregator.detector.report(month)) + """            </div>
+            """)
 
-        # Generate PDF for the monthly report
-        pdf_path = os.path.join(output_folder, f'reporte_{month}.pdf')
-        HTML(html_pdf_path, base_url=output_folder).write_pdf(pdf_path)
-        print(f"Reporte mensual PDF generado en {pdf_path}")
+            # Access and error log details
+            access_records = aggregator.access_records
+            write_detail_table(writer, output_folder, month, 'access', access_records.month_records(month),
+                               access_records.month_count(month), bucket.requests, page_size, pdf_details)
+            error_records = aggregator.error_records
+            write_detail_table(writer, output_folder, month, 'error', error_records.month_records(month),
+                               error_records.month_count(month), sum(bucket.level_counter.values()), page_size, pdf_details)
+
+            writer.write("""    <p><a href="index.html">Volver al índice</a></p>
+        </body>
+        </html>
+        """)
 
     return months  # Ensure months is defined before returning
 
 # Generate monthly charts
-def generate_monthly_charts(access_entries, error_entries, output_folder, month):
+def generate_monthly_charts(bucket, charts, month):
     chart_paths = {}
 
     # Top requested URLs in the month
-    url_counter = Counter(entry['request'] for entry in access_entries)
-    top_urls = url_counter.most_common(10)
+    top_urls = bucket.url_counter.most_common(10)
     if top_urls:
         urls = [url for url, count in top_urls]
         counts = [count for url, count in top_urls]
-        plt.figure(figsize=(12, 6))
-        plt.barh(urls[::-1], counts[::-1], color='green')
-        plt.xlabel('Frecuencia')
-        plt.ylabel('URL Solicitada')
-        plt.title(f'Top 10 URLs Más Solicitadas en {month}')
-        plt.tight_layout()
-        urls_chart_path = os.path.join(output_folder, f'top_urls_{month}.png')
-        plt.savefig(urls_chart_path)
-        plt.close()
-        chart_paths[f'Top URLs en {month}'] = urls_chart_path
+        chart_paths[f'Top URLs en {month}'] = charts.add(f'top_urls_{month}', {
+            'kind': 'barh', 'figsize': (12, 6), 'x': urls[::-1], 'y': counts[::-1], 'color': 'green',
+            'xlabel': 'Frecuencia', 'ylabel': 'URL Solicitada', 'title': f'Top 10 URLs Más Solicitadas en {month}',
+        })
+
+    # Response time and size percentiles in the month
+    latency = bucket.distribution.latency
+    if latency:
+        stats = latency.percentiles()
+        chart_paths[f'Tiempo de Respuesta en {month}'] = charts.add(f'latency_{month}', {
+            'kind': 'bar', 'figsize': (8, 6), 'x': ['p50', 'p90', 'p99', 'máx'],
+            'y': [stats[name] / 1000 for name in ('p50', 'p90', 'p99', 'max')], 'color': 'purple',
+            'xlabel': 'Percentil', 'ylabel': 'Milisegundos', 'title': f'Percentiles de Tiempo de Respuesta en {month}',
+        })
+    sizes = bucket.distribution.size
+    if sizes:
+        stats = sizes.percentiles()
+        chart_paths[f'Tamaño de Respuesta en {month}'] = charts.add(f'sizes_{month}', {
+            'kind': 'bar', 'figsize': (8, 6), 'x': ['p50', 'p90', 'p99', 'máx'],
+            'y': [stats[name] / 1024 for name in ('p50', 'p90', 'p99', 'max')], 'color': 'teal',
+            'xlabel': 'Percentil', 'ylabel': 'KiB', 'title': f'Percentiles de Tamaño de Respuesta en {month}',
+        })
 
     # Error levels in the month
-    level_counter = Counter(entry['level'] for entry in error_entries)
+    level_counter = bucket.level_counter
     if level_counter:
-        levels = list(level_counter.keys())
-        counts = list(level_counter.values())
-        plt.figure(figsize=(8, 6))
-        plt.bar(levels, counts, color='red')
-        plt.xlabel('Nivel de Error')
-        plt.ylabel('Cantidad')
-        plt.title(f'Distribución de Niveles de Error en {month}')
-        plt.tight_layout()
-        levels_chart_path = os.path.join(output_folder, f'error_levels_{month}.png')
-        plt.savefig(levels_chart_path)
-        plt.close()
-        chart_paths[f'Niveles de Error en {month}'] = levels_chart_path
+        chart_paths[f'Niveles de Error en {month}'] = charts.add(f'error_levels_{month}', {
+            'kind': 'bar', 'figsize': (8, 6), 'x': list(level_counter.keys()), 'y': list(level_counter.values()),
+            'color': 'red', 'xlabel': 'Nivel de Error', 'ylabel': 'Cantidad', 'title': f'Distribución de Niveles de Error en {month}',
+        })
 
     return chart_paths
 
-# Generate PDF using WeasyPrint
-def generate_pdf(html_pdf_path, output_folder):
-    pdf_path = os.path.join(output_folder, 'reporte_completo.pdf')
+# Render one HTML file to PDF using WeasyPrint (runs in worker processes)
+def render_pdf(html_pdf_path, pdf_path, output_folder):
+    start = time.perf_counter()
     HTML(html_pdf_path, base_url=output_folder).write_pdf(pdf_path)
-    print(f"Reporte PDF generado en {pdf_path}")
+    return time.perf_counter() - start
+
+# Generate the monthly PDFs and the complete report PDF. With jobs > 1 they
+# are rendered in a process pool, biggest documents first.
+def generate_pdfs(output_folder, months, html_pdf_path, jobs=1):
+    documents = []
+    for month in months:
+        documents.append((os.path.join(output_folder, f'reporte_{month}_pdf.html'),
+                          os.path.join(output_folder, f'reporte_{month}.pdf'), "Reporte mensual PDF"))
+    documents.append((html_pdf_path, os.path.join(output_folder, 'reporte_completo.pdf'), "Reporte PDF"))
+
+    start = time.perf_counter()
+    if jobs > 1 and len(documents) > 1:
+        documents.sort(key=lambda document: os.path.getsize(document[0]), reverse=True)
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {executor.submit(render_pdf, source, target, output_folder): (target, label)
+                       for source, target, label in documents}
+            for future in as_completed(futures):
+                target, label = futures[future]
+                print(f"{label} generado en {target} ({future.result():.1f} s)")
+    else:
+        for source, target, label in documents:
+            seconds = render_pdf(source, target, output_folder)
+            print(f"{label} generado en {target} ({seconds:.1f} s)")
+    print(f"{len(documents)} PDF generados en {time.perf_counter() - start:.1f} s")
+
+# Rolling windows kept by --follow, as (title, seconds)
+FOLLOW_WINDOWS = (('Últimos 5 minutos', 5 * 60), ('Última hora', 60 * 60), ('Últimas 24 horas', 24 * 60 * 60))
+# Seconds between checks for new lines, rotation or truncation of followed logs
+FOLLOW_POLL_INTERVAL = 1.0
+FOLLOW_CSS = """
+    body { font-family: Arial, sans-serif; margin: 20px; }
+    .windows { display: flex; flex-wrap: wrap; gap: 40px; }
+    .chart { margin-bottom: 50px; }
+    ul { list-style-type: none; padding: 0; }
+    li { margin: 5px 0; }
+    img { max-width: 100%; height: auto; }
+    """
+
+# Per-minute partial aggregates of the entries seen while following the logs.
+# Rolling windows are merged from them on demand; minutes older than the
+# longest window are dropped, so memory does not grow with uptime.
+class RollingWindows:
+    def __init__(self, template):
+        self.template = template
+        self.span = max(seconds for title, seconds in FOLLOW_WINDOWS)
+        self.minutes = {}
+
+    # Empty aggregate with the report settings that keeps no detail rows. The
+    # live page lists no incidents, so the windows skip their detection.
+    def new_aggregator(self):
+        aggregator = self.template.new_partial()
+        aggregator.detail_limit = 0
+        aggregator.detector = IncidentDetector(self.template.detector.window, 0, 0)
+        return aggregator
+
+    def add(self, kind, entry):
+        minute = int(entry['timestamp'].timestamp() // 60)
+        if minute * 60 < time.time() - self.span:
+            return
+        bucket = self.minutes.get(minute)
+        if bucket is None:
+            bucket = self.minutes[minute] = self.new_aggregator()
+        if kind == 'access':
+            bucket.add_access(entry)
+        else:
+            bucket.add_error(entry)
+
+    def expire(self, now):
+        first = int((now - self.span) // 60)
+        for minute in [minute for minute in self.minutes if minute < first]:
+            del self.minutes[minute]
+
+    # Aggregate of the last `seconds`, merged oldest minute first
+    def window(self, seconds, now):
+        first = int((now - seconds) // 60)
+        aggregator = self.new_aggregator()
+        for minute in sorted(self.minutes):
+            if minute >= first:
+                aggregator.merge(self.minutes[minute])
+        return aggregator
+
+    def requests_per_minute(self, seconds, now):
+        last = int(now // 60)
+        return [(minute, self.minutes[minute].total_requests if minute in self.minutes else 0)
+                for minute in range(last - seconds // 60 + 1, last + 1)]
+
+# Follow one log from its current end, like tail -F: complete new lines go
+# to the windows. When the path gets a new inode (rotation) or shrinks
+# (copytruncate), the old file is read to its end and the new one from the
+# start. History is never read.
+async def follow_log_file(file_path, kind, windows, parse_line):
+    f = None
+    at_end = True
+    pending = b''
+    while True:
+        if f is None:
+            try:
+                f = open(file_path, 'rb')
+            except FileNotFoundError:
+                at_end = False
+                await asyncio.sleep(FOLLOW_POLL_INTERVAL)
+                continue
+            if at_end:
+                f.seek(0, os.SEEK_END)
+            pending = b''
+        data = f.read(TAIL_BLOCK_SIZE)
+        if data:
+            data = pending + data
+            cut = data.rfind(b'\n') + 1
+            pending = data[cut:]
+            if cut:
+                for line in decode_log_lines(data[:cut]):
+                    entry = parse_line(line)
+                    if entry:
+                        windows.add(kind, entry)
+            await asyncio.sleep(0)
+            continue
+        try:
+            st = os.stat(file_path)
+        except FileNotFoundError:
+            st = None
+        if st is not None and (st.st_ino != os.fstat(f.fileno()).st_ino or st.st_size < f.tell()):
+            print(f"Rotación detectada: se continúa con el nuevo {file_path}")
+            f.close()
+            f = None
+            at_end = False
+            continue
+        await asyncio.sleep(FOLLOW_POLL_INTERVAL)
+
+# Rewrite the live report every interval seconds. Windows are merged in the
+# event loop; charts and HTML are written in a thread with that snapshot.
+async def refresh_follow_report(windows, output_folder, interval, chart_format):
+    loop = asyncio.get_running_loop()
+    while True:
+        now = time.time()
+        windows.expire(now)
+        snapshot = [(title, windows.window(seconds, now)) for title, seconds in FOLLOW_WINDOWS]
+        per_minute = windows.requests_per_minute(60 * 60, now)
+        await loop.run_in_executor(None, write_follow_report, snapshot, per_minute, output_folder, interval, chart_format)
+        await asyncio.sleep(interval)
+
+# Lightweight live index.html built from the existing summaries and charts.
+# The windows move every interval, so their charts are never cached.
+def write_follow_report(snapshot, per_minute, output_folder, interval, chart_format='png'):
+    charts = ChartRenderer(output_folder, chart_format)
+    chart_paths = {}
+    chart_paths['Peticiones por Minuto en la Última Hora'] = charts.add('follow_requests_per_minute', {
+        'kind': 'line', 'figsize': (14, 6), 'x': [datetime.fromtimestamp(minute * 60) for minute, count in per_minute],
+        'y': [count for minute, count in per_minute], 'color': 'blue',
+        'xlabel': 'Hora', 'ylabel': 'Número de Peticiones', 'title': 'Peticiones por Minuto en la Última Hora',
+    })
+    last_day = snapshot[-1][1]
+    chart_paths.update(generate_access_charts(last_day, charts))
+    chart_paths.update(generate_error_charts(last_day, charts))
+    charts.render(quiet=True)
+
+    html_content = f"""
+    <html>
+    <head>
+        <meta http-equiv="refresh" content="{interval}">
+        <title>Reporte de Logs de Apache en Vivo</title>
+        <style>
+            {FOLLOW_CSS}
+        </style>
+    </head>
+    <body>
+        <h1>Reporte de Logs de Apache en Vivo</h1>
+        <p>Actualizado: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
+        <div class="windows">
+    """
+    for title, aggregator in snapshot:
+        access_summary = generate_access_summary(aggregator)
+        error_summary = generate_error_summary(aggregator)
+        html_content += f"""
+        <div class="summary">
+            <h2>{title}</h2>
+            <p><strong>Peticiones:</strong> {access_summary['total_requests']}</p>
+            <p><strong>Visitantes Únicos:</strong> {access_summary['unique_visitors']}</p>
+            <p><strong>Errores:</strong> {error_summary['total_errors']}</p>
+            <p><strong>Códigos de Estado:</strong></p>
+            <ul>
+        """
+        for status, count in sorted(access_summary['status_distribution'].items()):
+            html_content += f"<li>{status}: {count}</li>\n"
+        html_content += """
+            </ul>
+            <p><strong>URLs Más Solicitadas:</strong></p>
+            <ul>
+        """
+        for url, count in access_summary['top_urls'][:5]:
+            html_content += f"<li>{url}: {count} peticiones</li>\n"
+        html_content += """
+            </ul>
+            <p><strong>Niveles de Error:</strong></p>
+            <ul>
+        """
+        for level, count in error_summary['level_distribution'].items():
+            html_content += f"<li>{level}: {count} errores</li>\n"
+        html_content += """
+            </ul>
+        </div>
+        """
+    html_content += """
+        </div>
+    """
+    for chart_title, chart_filename in chart_paths.items():
+        html_content += f"""
+        <div class="chart">
+            <h2>{chart_title}</h2>
+            <img src="{os.path.basename(chart_filename)}?{int(time.time())}" alt="{chart_title}">
+        </div>
+        """
+    html_content += """
+    </body>
+    </html>
+    """
+    # Replace the page atomically so a browser never loads half of it
+    index_path = os.path.join(output_folder, 'index.html')
+    with open(index_path + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(html_content)
+    os.replace(index_path + '.tmp', index_path)
+
+async def follow_all(dir_path, windows, output_folder, interval, chart_format):
+    await asyncio.gather(
+        follow_log_file(os.path.join(dir_path, 'access_log'), 'access', windows, access_log_parser(windows.template.log_format)),
+        follow_log_file(os.path.join(dir_path, 'error_log'), 'error', windows, parse_error_log_line),
+        refresh_follow_report(windows, output_folder, interval, chart_format),
+    )
+
+# --follow: tail the current logs until interrupted, keeping only the
+# rolling windows in memory
+def follow_logs(dir_path, template, output_folder, interval, chart_format='png'):
+    windows = RollingWindows(template)
+    print(f"Siguiendo {os.path.join(dir_path, 'access_log')} y {os.path.join(dir_path, 'error_log')}; "
+          f"{os.path.join(output_folder, 'index.html')} se actualiza cada {interval} s (Ctrl+C para terminar).")
+    try:
+        asyncio.run(follow_all(dir_path, windows, output_folder, interval, chart_format))
+    except KeyboardInterrupt:
+        print("Seguimiento detenido.")
+
+def query_rollup(args):
+    if not args.rollup:
+        print("--rollup-query necesita --rollup ARCHIVO.")
+        exit(1)
+    try:
+        start, end = (datetime.fromisoformat(value) for value in args.rollup_query)
+    except ValueError as e:
+        print(f"Fecha inválida ({e}).")
+        exit(1)
+    rollup = load_rollup(args.rollup)
+    if rollup is None:
+        exit(1)
+    print_rollup_series(rollup, start, end, args.resolution)
+
+# Layout version of the partial summaries; bump when their data changes
+SUMMARY_VERSION = 1
+SUMMARY_FORMAT = 'httpd-fancyreport-summary'
+
+# Partial summaries are gzip-compressed JSON of plain values only (numbers,
+# strings, lists), so loading one never runs code and does not depend on the
+# classes of the script. The functions below convert each part of the
+# aggregate to and from that data.
+
+def counter_data(counter):
+    data = {'items': [[key, count] for key, count in counter.items()]}
+    if isinstance(counter, SpaceSaving):
+        data['capacity'] = counter.capacity
+        data['floor'] = counter.floor
+    return data
+
+# Counter, or SpaceSaving sketch when the data has a capacity. Items are
+# restored in their saved order, which is the first-seen order.
+def counter_from_data(data):
+    if 'capacity' in data:
+        counter = SpaceSaving(int(data['capacity']))
+        counter.floor = int(data['floor'])
+        dict.update(counter, ((key, int(count)) for key, count in data['items']))
+        return counter
+    return Counter({key: int(count) for key, count in data['items']})
+
+def distribution_data(distribution):
+    return {'latency': sorted(distribution.latency.items()), 'size': sorted(distribution.size.items())}
+
+def distribution_from_data(data):
+    distribution = ResponseDistribution()
+    distribution.latency.update({int(bucket): int(count) for bucket, count in data['latency']})
+    distribution.size.update({int(bucket): int(count) for bucket, count in data['size']})
+    return distribution
+
+def rollup_data(rollup):
+    return {
+        'minutes': rollup.minutes.tolist(),
+        'columns': {name: column.tolist() for name, column in rollup.columns.items()},
+        'levels': {level: column.tolist() for level, column in rollup.levels.items()},
+    }
+
+def rollup_from_data(data):
+    rollup = MinuteRollup()
+    rollup.minutes = array('q', data['minutes'])
+    rollup.rows = {minute: row for row, minute in enumerate(rollup.minutes)}
+    for name in ROLLUP_COLUMNS:
+        rollup.columns[name] = array('q', data['columns'][name])
+    rollup.levels = {level: array('q', column) for level, column in data['levels'].items()}
+    if any(len(column) != len(rollup.minutes) for column in (*rollup.columns.values(), *rollup.levels.values())):
+        raise ValueError("columnas de totales por minuto de distinto largo")
+    return rollup
+
+def records_data(records):
+    return {
+        'epoch': records.epoch.tolist(),
+        'utc_offset': records.utc_offset.tolist(),
+        'month_rows': {month: rows.tolist() for month, rows in records.month_rows.items()},
+        'strings': {name: {'values': getattr(records, name).values, 'codes': getattr(records, name).codes.tolist()}
+                    for name in records.string_columns},
+        'ints': {name: getattr(records, name).tolist() for name, typecode in records.int_columns},
+    }
+
+def records_from_data(store_class, data):
+    records = store_class()
+    records.epoch = array('q', data['epoch'])
+    records.utc_offset = array('i', data['utc_offset'])
+    records.month_rows = {month: array('I', rows) for month, rows in data['month_rows'].items()}
+    for name in records.string_columns:
+        column = getattr(records, name)
+        column.__setstate__((list(map(str, data['strings'][name]['values'])), array('I', data['strings'][name]['codes'])))
+        if len(column) != len(records.epoch) or any(code >= len(column.values) for code in column.codes):
+            raise ValueError(f"columna {name} inválida")
+    for name, typecode in records.int_columns:
+        setattr(records, name, array(typecode, data['ints'][name]))
+        if len(getattr(records, name)) != len(records.epoch):
+            raise ValueError(f"columna {name} inválida")
+    if any(row >= len(records.epoch) for rows in records.month_rows.values() for row in rows):
+        raise ValueError("filas mensuales inválidas")
+    return records
+
+def timestamp_data(timestamp):
+    return None if timestamp is None else timestamp.isoformat()
+
+def timestamp_from_data(text):
+    return None if text is None else datetime.fromisoformat(text)
+
+def incidents_data(detector):
+    return {
+        'dropped': detector.dropped,
+        'items': [[incident.kind, incident.key, timestamp_data(incident.start), timestamp_data(incident.end),
+                   incident.first_minute, incident.last_minute, incident.peak] for incident in detector.incidents],
+    }
+
+def detector_from_data(settings, data):
+    detector = IncidentDetector(*settings)
+    detector.dropped = int(data['dropped'])
+    for kind, key, start, end, first_minute, last_minute, peak in data['items']:
+        if kind not in INCIDENT_KINDS:
+            raise ValueError(f"tipo de incidente desconocido: {kind}")
+        incident = Incident(kind, key, timestamp_from_data(start), int(first_minute))
+        incident.extend(timestamp_from_data(end), int(last_minute), int(peak))
+        detector.incidents.append(incident)
+        detector.open[kind, key] = incident
+    return detector
+
+# Settings a summary was made with. Summaries merge only if all of them
+# match: they change what is counted and how.
+def summary_settings(aggregator):
+    return {
+        'approximate': aggregator.approximate,
+        'log_format': aggregator.log_format,
+        'url_rules': [list(rules) for rules in aggregator.url_normalizer.rules()] if aggregator.url_normalizer else None,
+        'incidents': list(aggregator.detector.settings()),
+        'histogram_sub_bucket_bits': HISTOGRAM_SUB_BUCKET_BITS,
+        'hll_precision': aggregator.visitors.precision if aggregator.visitors is not None else None,
+    }
+
+# Descriptions of the summary settings, for merge errors
+SUMMARY_SETTING_NAMES = {
+    'approximate': '--approximate',
+    'log_format': '--log-format',
+    'url_rules': 'la agrupación de URL (--normalize-urls, --route, --keep-query-param)',
+    'incidents': 'los umbrales de incidentes',
+    'histogram_sub_bucket_bits': 'la resolución de los histogramas',
+    'hll_precision': 'la precisión de HyperLogLog',
+}
+
+def aggregator_data(aggregator):
+    return {
+        'total_requests': aggregator.total_requests,
+        'visitors': None if aggregator.visitors is None else base64.b64encode(aggregator.visitors.registers).decode('ascii'),
+        'ip_counter': counter_data(aggregator.ip_counter),
+        'url_counter': counter_data(aggregator.url_counter),
+        'status_counter': counter_data(aggregator.status_counter),
+        'user_agent_counter': counter_data(aggregator.user_agent_counter),
+        'rollup': rollup_data(aggregator.rollup),
+        'incidents': incidents_data(aggregator.detector),
+        'status_distributions': [[status, distribution_data(distribution)]
+                                 for status, distribution in aggregator.status_distributions.items()],
+        'url_distributions': [[url, distribution_data(distribution)]
+                              for url, distribution in aggregator.url_distributions.items()],
+        'first_timestamp': timestamp_data(aggregator.first_timestamp),
+        'last_timestamp': timestamp_data(aggregator.last_timestamp),
+        'total_errors': aggregator.total_errors,
+        'level_counter': counter_data(aggregator.level_counter),
+        'message_counter': counter_data(aggregator.message_counter),
+        'months': {month: {'requests': bucket.requests, 'url_counter': counter_data(bucket.url_counter),
+                           'level_counter': counter_data(bucket.level_counter),
+                           'distribution': distribution_data(bucket.distribution)}
+                   for month, bucket in aggregator.months.items()},
+        'rejected_lines': counter_data(aggregator.rejected_lines),
+        'access_records': records_data(aggregator.access_records),
+        'error_records': records_data(aggregator.error_records),
+    }
+
+def aggregator_from_data(settings, data):
+    if settings['histogram_sub_bucket_bits'] != HISTOGRAM_SUB_BUCKET_BITS:
+        raise ValueError("histogramas con otra resolución")
+    if settings['hll_precision'] is not None and not 4 <= settings['hll_precision'] <= 18:
+        raise ValueError("precisión de HyperLogLog fuera de rango")
+    if settings['incidents'][0] < 1:
+        raise ValueError("ventana de incidentes inválida")
+    url_rules = settings['url_rules']
+    aggregator = ReportAggregator(
+        approximate=bool(settings['approximate']), log_format=str(settings['log_format']),
+        url_normalizer=UrlNormalizer(*url_rules) if url_rules else None,
+        detector=detector_from_data(settings['incidents'], data['incidents']))
+    if data['visitors'] is not None:
+        aggregator.visitors = HyperLogLog(int(settings['hll_precision']))
+        registers = base64.b64decode(data['visitors'])
+        if len(registers) != len(aggregator.visitors.registers):
+            raise ValueError("registros de HyperLogLog de otro tamaño")
+        aggregator.visitors.registers = bytearray(registers)
+    aggregator.total_requests = int(data['total_requests'])
+    aggregator.total_errors = int(data['total_errors'])
+    for name in ('ip_counter', 'url_counter', 'status_counter', 'user_agent_counter', 'level_counter',
+                 'message_counter', 'rejected_lines'):
+        setattr(aggregator, name, counter_from_data(data[name]))
+    aggregator.rollup = rollup_from_data(data['rollup'])
+    aggregator.status_distributions = {int(status): distribution_from_data(distribution)
+                                       for status, distribution in data['status_distributions']}
+    aggregator.url_distributions = {url: distribution_from_data(distribution)
+                                    for url, distribution in data['url_distributions']}
+    aggregator.first_timestamp = timestamp_from_data(data['first_timestamp'])
+    aggregator.last_timestamp = timestamp_from_data(data['last_timestamp'])
+    for month, bucket_data in data['months'].items():
+        bucket = aggregator.month_bucket(month)
+        bucket.requests = int(bucket_data['requests'])
+        bucket.url_counter = counter_from_data(bucket_data['url_counter'])
+        bucket.level_counter = counter_from_data(bucket_data['level_counter'])
+        bucket.distribution = distribution_from_data(bucket_data['distribution'])
+    aggregator.access_records = records_from_data(AccessRecordStore, data['access_records'])
+    aggregator.error_records = records_from_data(ErrorRecordStore, data['error_records'])
+    return aggregator
+
+# Partial summary of one node: its whole aggregate (counters, sketches,
+# time rollup, monthly buckets, histograms, incidents and the capped detail
+# rows), with the settings it was made with
+def save_summary(summary_path, aggregator, log_dir):
+    summary = {
+        'format': SUMMARY_FORMAT,
+        'version': SUMMARY_VERSION,
+        'host': socket.gethostname(),
+        'log_dir': log_dir,
+        'created': datetime.now().astimezone().isoformat(timespec='seconds'),
+        'settings': summary_settings(aggregator),
+        'aggregate': aggregator_data(aggregator),
+    }
+    tmp_path = summary_path + '.tmp'
+    with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+        json.dump(summary, f, separators=(',', ':'))
+    os.replace(tmp_path, summary_path)
+
+# Read a summary and rebuild its aggregate (summary['aggregator']), or None
+def load_summary(summary_path):
+    try:
+        with gzip.open(summary_path, 'rt', encoding='utf-8') as f:
+            summary = json.load(f)
+    except (OSError, EOFError, UnicodeDecodeError, ValueError) as e:
+        print(f"No se pudo leer el resumen {summary_path}: {e}")
+        return None
+    if not isinstance(summary, dict) or summary.get('format') != SUMMARY_FORMAT:
+        print(f"{summary_path} no es un resumen de httpd-fancyreport.")
+        return None
+    if summary.get('version') != SUMMARY_VERSION:
+        print(f"El resumen {summary_path} tiene la versión {summary.get('version')} y se esperaba la {SUMMARY_VERSION}; "
+              "vuelva a generarlo con esta versión del script.")
+        return None
+    try:
+        summary['aggregator'] = aggregator_from_data(summary['settings'], summary['aggregate'])
+    except (KeyError, TypeError, ValueError, OverflowError, AttributeError, re.error) as e:
+        print(f"El resumen {summary_path} está dañado: {e!r}")
+        return None
+    return summary
+
+# summarize mode: parse this node's logs into a partial summary file. Detail
+# rows are left out unless --detail-rows asks for some per month.
+def summarize_logs(args, metrics):
+    log_dir = resolve_log_input(args, unattended=True)
+    cache = None if args.no_cache else ParseCache(args.cache_dir, args.cache_size * 1024 * 1024)
+    aggregator = parse_logs_for_report(args, log_dir, args.detail_rows, cache, metrics)
+    if cache:
+        cache.finish()
+    aggregator.rollup = aggregator.rollup.coarsened(args.resolution)
+    with metrics.stage('summary'):
+        save_summary(args.output, aggregator, log_dir)
+    print(f"Resumen de {aggregator.total_requests} peticiones y {aggregator.total_errors} errores guardado en "
+          f"{args.output} ({os.path.getsize(args.output) / 1024:.1f} KiB)")
+
+# merge mode: combine the summaries of several nodes, in the order given,
+# and write the report as if all their logs had been parsed together
+def merge_summaries(args, metrics):
+    if args.pdf != 'none' and HTML is None:
+        print("WeasyPrint no está disponible. Instálelo o use --pdf none para generar solo HTML.")
+        exit(1)
+    aggregator = None
+    hosts = Counter()
+    with metrics.stage('merge'):
+        for summary_path in args.summaries:
+            summary = load_summary(summary_path)
+            if summary is None:
+                exit(1)
+            partial = summary['aggregator']
+            if aggregator is None:
+                settings = summary['settings']
+                aggregator = ReportAggregator(args.detail_rows or None, partial.approximate, partial.log_format,
+                                              url_normalizer=partial.url_normalizer,
+                                              detector=partial.detector.new_partial())
+            differing = [name for name in SUMMARY_SETTING_NAMES if summary['settings'].get(name) != settings.get(name)]
+            if differing:
+                print(f"{summary_path} se generó con otro valor de {', '.join(SUMMARY_SETTING_NAMES[name] for name in differing)} "
+                      "que los anteriores; todos los resúmenes deben usar la misma configuración.")
+                exit(1)
+            hosts[summary['host']] += 1
+            if hosts[summary['host']] == 2:
+                print(f"Aviso: hay más de un resumen de {summary['host']}; sus entradas se suman como si fueran distintas.")
+            print(f"Resumen de {summary['host']} ({summary['log_dir']}, {summary['created']}): "
+                  f"{partial.total_requests} peticiones, {partial.total_errors} errores")
+            aggregator.merge(partial)
+    output_folder = create_output_folder()
+    cache = None if args.no_cache else ParseCache(args.cache_dir, args.cache_size * 1024 * 1024)
+    if args.rollup:
+        save_rollup(args.rollup, aggregator.rollup)
+        print(f"Totales por minuto guardados en {args.rollup}")
+    write_report(aggregator, args, output_folder, cache, metrics)
 
 # Main function
 def main():
-    log_dir = prompt_for_log_directory()
+    if sys.argv[1:2] == ['query']:
+        run_query(sys.argv[2:])
+        return
+    mode = sys.argv[1] if sys.argv[1:2] in (['summarize'], ['merge']) else 'report'
+    args = parse_arguments(sys.argv[2:] if mode != 'report' else None, mode)
+    metrics = RunMetrics()
+    try:
+        if mode == 'summarize':
+            summarize_logs(args, metrics)
+        elif mode == 'merge':
+            merge_summaries(args, metrics)
+        else:
+            generate_report(args, metrics)
+    finally:
+        if args.metrics:
+            metrics.write(args.metrics)
+            print(f"Métricas guardadas en {args.metrics}")
+
+def generate_report(args, metrics):
+    if args.rollup_query:
+        query_rollup(args)
+        return
+    if args.pdf != 'none' and HTML is None and not args.follow:
+        print("WeasyPrint no está disponible. Instálelo o use --pdf none para generar solo HTML.")
+        exit(1)
+    if args.follow and (args.since or args.until):
+        print("--since y --until no se pueden combinar con --follow.")
+        exit(1)
+    # --follow runs unattended, so it never prompts for the directory
+    log_dir = resolve_log_input(args, args.follow)
     output_folder = create_output_folder()
+    if args.follow:
+        template = ReportAggregator(None, args.approximate, args.log_format,
+                                    url_normalizer=url_normalizer_from_args(args), detector=detector_from_args(args))
+        follow_logs(log_dir, template, output_folder, args.interval, args.chart_format)
+        return
+    cache = None if args.no_cache else ParseCache(args.cache_dir, args.cache_size * 1024 * 1024)
+    aggregator = parse_logs_for_report(args, log_dir, args.detail_rows or None, cache, metrics)
+    write_report(aggregator, args, output_folder, cache, metrics)
+
+# Check the log format and the database to read, and return the log
+# directory (None when only the database is read). Unattended modes use the
+# default directory instead of prompting.
+def resolve_log_input(args, unattended=False):
+    if args.incident_window < 1 or args.incident_rate < 0 or args.incident_error_rate < 0:
+        print("--incident-window debe ser al menos 1 y los umbrales de incidentes no pueden ser negativos.")
+        exit(1)
+    if args.since and args.until and args.since >= args.until:
+        print("--since debe ser anterior a --until.")
+        exit(1)
+    if (args.since or args.until) and args.state:
+        print("--since y --until no se pueden combinar con --state, que acumula todo lo leído.")
+        exit(1)
+    if args.from_sqlite and not os.path.exists(args.from_sqlite) and args.from_sqlite != args.sqlite:
+        print(f"No existe la base {args.from_sqlite}.")
+        exit(1)
+    try:
+        parser = access_log_parser(args.log_format)
+    except (ValueError, re.error) as e:
+        print(f"Formato de log inválido ({e}).")
+        exit(1)
+    if 'bytes_sent' not in parser.fields:
+        print("Aviso: el formato de log no incluye %b, %B ni %O; los bytes enviados y los percentiles de tamaño serán 0.")
+    if args.from_sqlite and not args.sqlite:
+        return None
+    return prompt_for_log_directory(args.log_dir or ('/var/log/httpd/' if unattended else None))
+
+# Parsing stages shared by the report and summarize modes: SQLite export,
+# then the logs (or the database, or only their new lines with --state)
+def parse_logs_for_report(args, log_dir, detail_limit, cache, metrics):
+    jobs = args.jobs or os.cpu_count()
+    chunk_size = args.chunk_size * 1024 * 1024
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler and jobs > 1:
+        print("Con --jobs mayor que 1 el perfil solo cubre el proceso principal, no el análisis en los procesos hijos.")
+    if profiler:
+        profiler.enable()
+    if args.sqlite:
+        with metrics.stage('sqlite'):
+            export_logs_to_sqlite(log_dir, args.sqlite, args.log_format, metrics)
+    time_range = (args.since, args.until) if args.since or args.until else None
+    aggregator = ReportAggregator(detail_limit, args.approximate, args.log_format, time_range,
+                                  url_normalizer_from_args(args), detector_from_args(args))
+    if args.from_sqlite:
+        with metrics.stage('parse'):
+            aggregate_sqlite(args.from_sqlite, aggregator)
+    elif args.state:
+        # Parse only what was appended to the logs since the previous run
+        with metrics.stage('parse'):
+            aggregator = parse_logs_incrementally(log_dir, args.state, aggregator, jobs, chunk_size, metrics)
+    else:
+        with metrics.stage('parse_access'):
+            parse_access_logs(log_dir, aggregator, jobs, chunk_size, cache, metrics)
+        with metrics.stage('parse_error'):
+            parse_error_logs(log_dir, aggregator, jobs, chunk_size, cache, metrics)
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        print(f"Perfil del análisis guardado en {args.profile}")
+    if args.rollup:
+        save_rollup(args.rollup, aggregator.rollup)
+        print(f"Totales por minuto guardados en {args.rollup}")
+    return aggregator
 
-    # Parse access logs
-    access_data = parse_access_logs(log_dir)
-    if not access_data:
+# Summaries, charts, monthly reports, index and PDFs of an aggregate
+def write_report(aggregator, args, output_folder, cache, metrics):
+    jobs = args.jobs or os.cpu_count()
+    if not aggregator.total_requests:
         print("No se encontraron registros de acceso.")
         return
-
-    # Parse error logs
-    error_data = parse_error_logs(log_dir)
-    if not error_data:
+    if not aggregator.total_errors:
         print("No se encontraron registros de errores.")
         return
 
     # Generate summaries
-    access_summary = generate_access_summary(access_data)
-    error_summary = generate_error_summary(error_data)
+    with metrics.stage('summaries'):
+        access_summary = generate_access_summary(aggregator)
+        error_summary = generate_error_summary(aggregator)
+        incident_summary = generate_incident_summary(aggregator)
 
     # Generate charts
-    access_chart_paths = generate_access_charts(access_data, output_folder)
-    error_chart_paths = generate_error_charts(error_data, output_folder)
+    charts = ChartRenderer(output_folder, args.chart_format, cache)
+    access_chart_paths = generate_access_charts(aggregator, charts)
+    error_chart_paths = generate_error_charts(aggregator, charts)
     chart_paths = {**access_chart_paths, **error_chart_paths}
 
     # Generate monthly reports
-    months = generate_monthly_reports(access_data, error_data, output_folder)
+    with metrics.stage('monthly_reports'):
+        months = generate_monthly_reports(aggregator, output_folder, charts, args.detail_page_size or None, args.pdf)
+    with metrics.stage('charts'):
+        charts.render(jobs)
+    if cache:
+        cache.finish()
 
     # Generate index HTML
-    html_pdf_path = generate_index_html(access_summary, error_summary, chart_paths, output_folder, months)
+    with metrics.stage('index'):
+        html_pdf_path = generate_index_html(access_summary, error_summary, chart_paths, output_folder, months, args.pdf != 'none',
+                                            incident_summary)
 
-    # Generate PDF
-    generate_pdf(html_pdf_path, output_folder)
+    # Generate PDFs
+    if args.pdf != 'none':
+        with metrics.stage('pdf'):
+            generate_pdfs(output_folder, months, html_pdf_path, jobs)
 
 if __name__ == '__main__':
     main()
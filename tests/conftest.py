@@ -0,0 +1,107 @@
+import os
+import sys
+import gzip
+import importlib.util
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+# The script is not an importable module name, so load it from its path
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'httpd-fancyreport.py')
+
+def load_script():
+    spec = importlib.util.spec_from_file_location('httpd_fancyreport', SCRIPT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    # Registered so its classes can be pickled (also by --jobs workers)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture(scope='session')
+def report():
+    return load_script()
+
+# Order-independent view of what an aggregator counted, to compare runs that
+# see the same lines in a different order
+@pytest.fixture(scope='session')
+def totals():
+    def aggregate_totals(aggregator):
+        return {
+            'requests': aggregator.total_requests,
+            'errors': aggregator.total_errors,
+            'ips': dict(aggregator.ip_counter),
+            'urls': dict(aggregator.url_counter),
+            'statuses': dict(aggregator.status_counter),
+            'user_agents': dict(aggregator.user_agent_counter),
+            'levels': dict(aggregator.level_counter),
+            'messages': dict(aggregator.message_counter),
+            'months': {month: bucket.requests for month, bucket in aggregator.months.items()},
+            'span': (aggregator.first_timestamp, aggregator.last_timestamp),
+            'rollup': aggregator.rollup.series(),
+            'access_rows': sorted((record.timestamp, record.ip, record.request, record.status)
+                                  for record in aggregator.access_records),
+            'error_rows': sorted((record.timestamp, record.level, record.message) for record in aggregator.error_records),
+        }
+    return aggregate_totals
+
+LOG_START = datetime(2024, 5, 1, 8, 0, tzinfo=timezone.utc)
+
+# Synthetic log lines shared by the tests. Line i of access_lines() is a
+# request logged step seconds after start, whose client, page, status and
+# other fields cycle through small pools, so runs over the same lines are
+# easy to compare. Error lines use the Apache 2.4 layout unless legacy.
+class LogLines:
+    @staticmethod
+    def access_line(moment, ip='192.0.2.1', url='/index.html', status=200, size=512, referer='-', agent='curl/8.4.0',
+                    suffix=''):
+        stamp = moment.strftime('%d/%b/%Y:%H:%M:%S %z')
+        return f'{ip} - - [{stamp}] "GET {url} HTTP/1.1" {status} {size} "{referer}" "{agent}"{suffix}\n'
+
+    # pages, queries, referers and agents give the size of each pool (no
+    # query string, referer or distinct agents when 0); response_time adds
+    # a %D field
+    def access_lines(self, first, count, start=LOG_START, step=11, ips=17, pages=9, statuses=(200,), queries=0,
+                     referers=0, agents=0, response_time=False):
+        lines = []
+        for i in range(first, first + count):
+            lines.append(self.access_line(
+                start + timedelta(seconds=i * step), f'198.51.100.{i % ips}',
+                f'/page/{i % pages}' + (f'?q={i % queries}' if queries else ''), statuses[i % len(statuses)], i,
+                f'https://example.com/{i % referers}' if referers else '-', f'agent-{i % agents}' if agents else 'curl/8.4.0',
+                f' {i * 97}' if response_time else ''))
+        return ''.join(lines)
+
+    @staticmethod
+    def error_lines(first, count, start=LOG_START, step=60, legacy=False):
+        lines = []
+        for i in range(first, first + count):
+            moment = start + timedelta(seconds=i * step)
+            if legacy:
+                lines.append(f'[{moment.strftime("%a %b %d %H:%M:%S %Y")}] [error] [client 192.0.2.1] '
+                             f'File does not exist: /srv/{i % 4}\n')
+            else:
+                lines.append(f'[{moment.strftime("%a %b %d %H:%M:%S.%f %Y")}] [core:error] [pid {i}] '
+                             f'[client 192.0.2.{i % 5}:4000] AH00128: File does not exist: /srv/{i % 4}\n')
+        return ''.join(lines)
+
+# A log directory to write synthetic logs into
+class LogDirectory(LogLines):
+    def __init__(self, path):
+        self.path = path
+        path.mkdir(exist_ok=True)
+
+    # Write a log, or add to its end with append; .gz logs are compressed
+    def write(self, name, text, append=False):
+        log_path = self.path / name
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(log_path, 'at' if append else 'wt', encoding='utf-8') as f:
+            f.write(text)
+        return log_path
+
+@pytest.fixture(scope='session')
+def log_lines():
+    return LogLines()
+
+@pytest.fixture
+def logs(tmp_path):
+    return LogDirectory(tmp_path / 'logs')
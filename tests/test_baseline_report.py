@@ -0,0 +1,36 @@
+import os
+import glob
+
+import pytest
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), 'data', 'baseline_report')
+PAGES = ('index.html', 'reporte_2024-01.html', 'reporte_2024-02.html', 'reporte_2024-03.html')
+
+def read_lines(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+# The pages the original single-pass script wrote for the logs in
+# data/baseline_report. Error messages now show their client in a column of
+# their own and are grouped by template, so lines with one are left out.
+def baseline_lines(page):
+    return [line for line in read_lines(os.path.join(BASELINE_DIR, page)) if '[client ' not in line]
+
+# Every line of the baseline page, in order, with only additions in between
+def assert_keeps_baseline(expected, lines):
+    position = 0
+    for line in expected:
+        try:
+            position = lines.index(line, position) + 1
+        except ValueError:
+            pytest.fail(f"Falta la línea del reporte original: {line}")
+
+@pytest.mark.parametrize('jobs', [1, 3])
+def test_report_keeps_baseline_output(report, tmp_path, monkeypatch, jobs):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(report.sys, 'argv', ['httpd-fancyreport.py', os.path.join(BASELINE_DIR, 'logs'), '--pdf', 'none',
+                                             '--no-cache', '--jobs', str(jobs)])
+    report.main()
+    output_folder, = glob.glob(str(tmp_path / 'reporte_apache_logs-*'))
+    for page in PAGES:
+        assert_keeps_baseline(baseline_lines(page), read_lines(os.path.join(output_folder, page)))
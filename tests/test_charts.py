@@ -0,0 +1,61 @@
+import pytest
+
+SPECS = {
+    'line': {'kind': 'line', 'figsize': (6, 4), 'x': ['2024-01', '2024-02'], 'y': [3, 5], 'color': 'blue',
+             'xlabel': 'Mes', 'ylabel': 'Peticiones', 'title': 'Peticiones por Mes'},
+    'bars': {'kind': 'bar', 'figsize': (6, 4), 'x': ['200', '404'], 'y': [10, 2], 'color': 'green',
+             'xlabel': 'Estado', 'ylabel': 'Cantidad', 'title': 'Códigos de Estado'},
+    'ranking': {'kind': 'barh', 'figsize': (6, 4), 'x': ['/a', '/b'], 'y': [4, 7], 'color': 'green',
+                'xlabel': 'Frecuencia', 'ylabel': 'URL', 'title': 'Top URLs'},
+    'shares': {'kind': 'pie', 'figsize': (6, 4), 'x': ['error', 'warn'], 'y': [3, 1], 'title': 'Niveles'},
+    'grouped': {'kind': 'grouped_bar', 'figsize': (6, 4), 'x': ['p50', 'p99'], 'series': [('GET', [1, 9]), ('POST', [2, 8])],
+                'xlabel': 'Percentil', 'ylabel': 'ms', 'title': 'Percentiles'},
+}
+
+def add_all(charts):
+    return [charts.add(name, spec) for name, spec in SPECS.items()]
+
+@pytest.mark.parametrize('chart_format, magic', [('png', b'\x89PNG'), ('svg', b'<?xml')])
+@pytest.mark.parametrize('jobs', [1, 3])
+def test_every_chart_kind_is_rendered(report, tmp_path, chart_format, magic, jobs, capsys):
+    charts = report.ChartRenderer(str(tmp_path), chart_format)
+    paths = add_all(charts)
+    assert paths == [str(tmp_path / f'{name}.{chart_format}') for name in SPECS]
+    charts.render(jobs)
+    for path in paths:
+        with open(path, 'rb') as f:
+            assert f.read(5).startswith(magic)
+    assert 'Gráficos: 5 generados, 0 reutilizados' in capsys.readouterr().out
+
+# Charts whose spec was rendered before are copied from the cache; a changed
+# spec or format is rendered again
+def test_cached_charts_are_reused(report, tmp_path, monkeypatch, capsys):
+    cache = report.ParseCache(str(tmp_path / 'cache'), 1 << 30)
+    first = tmp_path / 'first'
+    first.mkdir()
+    charts = report.ChartRenderer(str(first), cache=cache)
+    add_all(charts)
+    charts.render()
+    capsys.readouterr()
+
+    drawn = []
+    render_chart = report.render_chart
+    monkeypatch.setattr(report, 'render_chart', lambda spec, chart_path: drawn.append(spec['title']) or render_chart(spec, chart_path))
+    second = tmp_path / 'second'
+    second.mkdir()
+    charts = report.ChartRenderer(str(second), cache=cache)
+    add_all(charts)
+    charts.add('changed', dict(SPECS['bars'], y=[11, 2]))
+    charts.render()
+    assert drawn == ['Códigos de Estado']
+    assert 'Gráficos: 1 generados, 5 reutilizados' in capsys.readouterr().out
+    for name in SPECS:
+        assert (first / f'{name}.png').read_bytes() == (second / f'{name}.png').read_bytes()
+    assert cache.chart_entry(SPECS['line'], 'png') != cache.chart_entry(SPECS['line'], 'svg')
+
+def test_render_clears_pending_and_can_be_quiet(report, tmp_path, capsys):
+    charts = report.ChartRenderer(str(tmp_path))
+    charts.add('line', SPECS['line'])
+    charts.render(quiet=True)
+    assert charts.pending == [] and (tmp_path / 'line.png').exists()
+    assert capsys.readouterr().out == ''
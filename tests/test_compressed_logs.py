@@ -0,0 +1,74 @@
+import bz2
+import gzip
+import lzma
+import shutil
+import subprocess
+
+import pytest
+
+LINES = [f'192.0.2.{i % 250} - - [05/Mar/2024:10:00:{i % 60:02d} +0000] "GET /page/{i} HTTP/1.1" 200 {i} "-" "-"\n'
+         for i in range(20000)]
+
+def write_compressed(path, data):
+    suffix = path.suffix
+    if suffix == '.gz':
+        path.write_bytes(gzip.compress(data))
+    elif suffix == '.bz2':
+        path.write_bytes(bz2.compress(data))
+    elif suffix == '.xz':
+        path.write_bytes(lzma.compress(data))
+    else:
+        if not shutil.which('zstd'):
+            pytest.skip("zstd no está instalado")
+        subprocess.run(['zstd', '-q', '-o', str(path)], input=data, check=True)
+
+# Through the external tool when installed, and decompressed in-process
+# otherwise, every format yields the lines of the plain file
+@pytest.mark.parametrize('suffix', ['.gz', '.bz2', '.xz', '.zst'])
+@pytest.mark.parametrize('external', [True, False])
+def test_compressed_logs_read_like_plain(report, tmp_path, monkeypatch, suffix, external):
+    log_path = tmp_path / f'access_log.1{suffix}'
+    write_compressed(log_path, ''.join(LINES).encode())
+    if not external:
+        if suffix == '.zst' and report.zstandard is None:
+            pytest.skip("zstandard no está instalado")
+        monkeypatch.setitem(report.external_decompressors, suffix, None)
+    elif report.find_external_decompressor(suffix) is None:
+        pytest.skip(f"no hay descompresor externo para {suffix}")
+    with report.open_log_file(str(log_path)) as f:
+        assert list(f) == LINES
+    aggregator = report.aggregate_log_file(str(log_path), 'access')
+    assert aggregator.total_requests == len(LINES)
+
+def test_zst_without_module_or_tool_is_reported(report, tmp_path, monkeypatch):
+    monkeypatch.setattr(report, 'zstandard', None)
+    monkeypatch.setitem(report.external_decompressors, '.zst', None)
+    with pytest.raises(OSError, match='zstandard'):
+        report.open_log_binary(str(tmp_path / 'access_log.1.zst'))
+
+def test_corrupt_archive_fails_loudly(report, tmp_path):
+    if report.find_external_decompressor('.gz') is None:
+        pytest.skip("no hay descompresor externo para .gz")
+    log_path = tmp_path / 'access_log.1.gz'
+    log_path.write_bytes(gzip.compress(''.join(LINES).encode())[:5000])
+    with pytest.raises(OSError, match='no pudo descomprimir'):
+        with report.open_log_file(str(log_path)) as f:
+            for line in f:
+                pass
+
+# Stopping early (e.g. past --until) ends the decompressor without an error
+def test_closing_pipe_early_stops_decompressor(report, tmp_path):
+    command = report.find_external_decompressor('.gz')
+    if command is None:
+        pytest.skip("no hay descompresor externo para .gz")
+    log_path = tmp_path / 'access_log.1.gz'
+    log_path.write_bytes(gzip.compress(''.join(LINES * 20).encode()))
+    pipe = report.DecompressorPipe(command, str(log_path))
+    assert pipe.readline() == LINES[0].encode()
+    pipe.close()
+    assert pipe.process.returncode is not None
+
+def test_decode_log_lines_drops_invalid_bytes_and_translates_newlines(report):
+    assert report.decode_log_lines(b'a\r\nb\xff\xfec\rd\n') == ['a', 'bc', 'd']
+    assert report.decode_log_lines(b'') == []
+    assert report.decode_log_lines(b'unterminated') == ['unterminated']
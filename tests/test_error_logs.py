@@ -0,0 +1,72 @@
+from datetime import datetime
+
+import pytest
+
+STAMP_24 = '[Wed Oct 11 14:32:52.123456 2024]'
+STAMP_22 = '[Wed Oct 11 14:32:52 2024]'
+
+# (line, module, pid, client, code, message)
+SAMPLE_LINES = [
+    (f'{STAMP_22} [error] [client 192.0.2.1] File does not exist: /var/www/favicon.ico',
+     '-', None, '192.0.2.1', '-', 'File does not exist: /var/www/favicon.ico'),
+    (f'{STAMP_24} [core:error] [pid 1234:tid 140230] [client 192.0.2.1:51234] AH00128: File does not exist: /var/www/x',
+     'core', 1234, '192.0.2.1', 'AH00128', 'AH00128: File does not exist: /var/www/x'),
+    # OS error before the client block
+    (f'{STAMP_24} [proxy:error] [pid 5:tid 140] (70007)The timeout specified has expired: '
+     f'[client 10.0.0.1:443] AH01075: Error dispatching request to : (polling)',
+     'proxy', 5, '10.0.0.1', 'AH01075',
+     '(70007)The timeout specified has expired: AH01075: Error dispatching request to : (polling)'),
+    # OS error without a client
+    (f'{STAMP_24} [proxy:error] [pid 5] (111)Connection refused: AH00957: http: attempt to connect to '
+     f'127.0.0.1:8080 (127.0.0.1:8080) failed',
+     'proxy', 5, '-', 'AH00957',
+     '(111)Connection refused: AH00957: http: attempt to connect to 127.0.0.1:8080 (127.0.0.1:8080) failed'),
+    # IPv6 clients, with the 2.4 port after the last colon
+    (f'{STAMP_24} [authz_core:error] [pid 77] [client 2001:db8::1:5678] AH01630: client denied by server configuration: /srv',
+     'authz_core', 77, '2001:db8::1', 'AH01630', 'AH01630: client denied by server configuration: /srv'),
+    (f'{STAMP_22} [error] [client 2001:db8::1] File does not exist: /var/www/x',
+     '-', None, '2001:db8::1', '-', 'File does not exist: /var/www/x'),
+]
+
+@pytest.mark.parametrize('line, module, pid, client, code, message', SAMPLE_LINES)
+def test_parse_error_log_line(report, line, module, pid, client, code, message):
+    entry = report.parse_error_log_line(line)
+    assert entry is not None
+    assert (entry['module'], entry['pid'], entry['client'], entry['code'], entry['message']) == \
+        (module, pid, client, code, message)
+    assert entry['level'] == 'error'
+    assert entry['month'] == '2024-10'
+
+def test_microseconds_are_kept(report):
+    entry = report.parse_error_log_line(SAMPLE_LINES[1][0])
+    assert entry['timestamp'] == datetime(2024, 10, 11, 14, 32, 52, 123456)
+
+@pytest.mark.parametrize('message, template', [
+    ('AH01114: HTTP: failed to make connection to backend: 2001:db8::1',
+     'AH01114: HTTP: failed to make connection to backend: {ip}'),
+    ('AH01114: HTTP: failed to make connection to backend: [2001:db8::1]:8080',
+     'AH01114: HTTP: failed to make connection to backend: {ip}'),
+    ('connect to ::1 or fe80::1%eth0 refused', 'connect to {ip} or {ip} refused'),
+    ('from ::ffff:192.0.2.1 and 2001:db8:0:0:0:0:0:1.', 'from {ip} and {ip}.'),
+    ('client 2001:db8::1:5678 denied', 'client {ip} denied'),
+    ('AH00957: http: attempt to connect to 10.0.0.1:80 (10.0.0.1:80) failed',
+     'AH00957: http: attempt to connect to {ip} ({ip}) failed'),
+    ('AH00128: File does not exist: /var/www/html/img/12.png', 'AH00128: File does not exist: {path}'),
+    ('script not found or unable to stat: http://example.com/cgi-bin/x?id=7', 'script not found or unable to stat: {url}'),
+    ('child pid 4711 exit signal Segmentation fault (11)', 'child pid {n} exit signal Segmentation fault ({n})'),
+    # Times, C++ names and a bare "::" are not addresses
+    ('at 12:30:00 in std::string a::b ::', 'at {n}:{n}:{n} in std::string a::b ::'),
+])
+def test_error_message_template_masks_variable_tokens(report, message, template):
+    assert report.error_message_template(message) == template
+
+# Messages that differ only in the IPv6 client share a template
+def test_ipv6_clients_group_together(report):
+    first = report.parse_error_log_line(
+        f'{STAMP_24} [proxy:error] [pid 5] (70007)The timeout specified has expired: '
+        f'[client 2001:db8::1:443] AH01102: error reading status line from remote server [2001:db8::7]:8080')
+    second = report.parse_error_log_line(
+        f'{STAMP_24} [proxy:error] [pid 6] (70007)The timeout specified has expired: '
+        f'[client 2001:db8::2:443] AH01102: error reading status line from remote server [2001:db8::9]:8080')
+    assert first['client'] == '2001:db8::1'
+    assert report.error_message_template(first['message']) == report.error_message_template(second['message'])
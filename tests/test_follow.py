@@ -0,0 +1,115 @@
+import os
+import sys
+import time
+import asyncio
+from datetime import datetime, timezone
+
+def access_entry(report, log_lines, moment, url='/index.html', status=200):
+    return report.access_log_parser(report.DEFAULT_LOG_FORMAT)(log_lines.access_line(moment, url=url, status=status))
+
+def test_rolling_windows_merge_and_expire(report, log_lines):
+    windows = report.RollingWindows(report.ReportAggregator(detail_limit=100))
+    now = time.time()
+    for seconds_ago, url in ((30, '/a'), (90, '/b'), (2 * 3600, '/c'), (23 * 3600, '/d'), (25 * 3600, '/old')):
+        windows.add('access', access_entry(report, log_lines, datetime.fromtimestamp(now - seconds_ago, timezone.utc), url))
+    # Entries older than the longest window are not kept at all
+    assert len(windows.minutes) == 4
+    assert windows.window(5 * 60, now).total_requests == 2
+    assert windows.window(3600, now).total_requests == 2
+    day = windows.window(24 * 3600, now)
+    assert list(day.url_counter) == ['/d', '/c', '/b', '/a']
+    # Windows keep no detail rows, whatever the report keeps
+    assert len(day.access_records) == 0
+    per_minute = windows.requests_per_minute(3600, now)
+    assert len(per_minute) == 60 and sum(count for minute, count in per_minute) == 2
+    # 22 hours later only the entry of 23 hours ago has left the day window
+    windows.expire(now + 22 * 3600)
+    assert len(windows.minutes) == 3
+    assert list(windows.window(24 * 3600, now + 22 * 3600).url_counter) == ['/c', '/b', '/a']
+
+# The live page is written in a thread while the event loop keeps printing,
+# so rendering must not swap the process-wide stdout
+def test_follow_report_leaves_stdout_alone(report, log_lines, tmp_path, monkeypatch, capsys):
+    stdout = sys.stdout
+    seen = []
+    monkeypatch.setattr(report, 'render_chart', lambda spec, chart_path: seen.append(sys.stdout is stdout))
+    windows = report.RollingWindows(report.ReportAggregator())
+    now = time.time()
+    windows.add('access', access_entry(report, log_lines, datetime.fromtimestamp(now - 10, timezone.utc)))
+    snapshot = [(title, windows.window(seconds, now)) for title, seconds in report.FOLLOW_WINDOWS]
+    report.write_follow_report(snapshot, windows.requests_per_minute(3600, now), str(tmp_path), 5)
+    assert seen and all(seen)
+    assert capsys.readouterr().out == ''
+    with open(tmp_path / 'index.html', encoding='utf-8') as f:
+        assert 'Reporte de Logs de Apache en Vivo' in f.read()
+
+# New lines are followed across a rename-and-recreate rotation
+def test_follow_log_file_across_rotation(report, logs, monkeypatch, capsys):
+    monkeypatch.setattr(report, 'FOLLOW_POLL_INTERVAL', 0.01)
+    log_path = logs.path / 'access_log'
+    now = datetime.now(timezone.utc)
+    logs.write('access_log', logs.access_line(now, url='/history'))
+    windows = report.RollingWindows(report.ReportAggregator())
+
+    async def run():
+        parse_line = report.access_log_parser(report.DEFAULT_LOG_FORMAT)
+        task = asyncio.ensure_future(report.follow_log_file(str(log_path), 'access', windows, parse_line))
+        await asyncio.sleep(0.05)
+        logs.write('access_log', logs.access_line(now, url='/before'), append=True)
+        await asyncio.sleep(0.05)
+        os.rename(log_path, logs.path / 'access_log.1')
+        logs.write('access_log', logs.access_line(now, url='/after'))
+        await asyncio.sleep(0.1)
+        task.cancel()
+
+    asyncio.run(run())
+    # History before the start is never read
+    assert list(windows.window(3600, time.time()).url_counter) == ['/before', '/after']
+    assert 'Rotación detectada' in capsys.readouterr().out
+
+# A log created after the start is read from its beginning, a half-written
+# line waits for its newline, and a copytruncate starts over
+def test_follow_log_file_waits_for_lines_and_truncation(report, logs, monkeypatch, capsys):
+    monkeypatch.setattr(report, 'FOLLOW_POLL_INTERVAL', 0.01)
+    log_path = logs.path / 'access_log'
+    now = datetime.now(timezone.utc)
+    windows = report.RollingWindows(report.ReportAggregator())
+
+    async def run():
+        parse_line = report.access_log_parser(report.DEFAULT_LOG_FORMAT)
+        task = asyncio.ensure_future(report.follow_log_file(str(log_path), 'access', windows, parse_line))
+        await asyncio.sleep(0.05)
+        line = logs.access_line(now, url='/created')
+        logs.write('access_log', line + logs.access_line(now, url='/partial')[:20])
+        await asyncio.sleep(0.05)
+        assert list(windows.window(3600, time.time()).url_counter) == ['/created']
+        logs.write('access_log', logs.access_line(now, url='/partial')[20:], append=True)
+        await asyncio.sleep(0.05)
+        logs.write('access_log', '')
+        await asyncio.sleep(0.05)
+        logs.write('access_log', logs.access_line(now, url='/truncated'))
+        await asyncio.sleep(0.1)
+        task.cancel()
+
+    asyncio.run(run())
+    assert list(windows.window(3600, time.time()).url_counter) == ['/created', '/partial', '/truncated']
+    assert 'Rotación detectada' in capsys.readouterr().out
+
+# Each window of the live page shows only its own requests and errors
+def test_follow_report_lists_each_window(report, log_lines, tmp_path):
+    windows = report.RollingWindows(report.ReportAggregator())
+    now = time.time()
+    for seconds_ago, url in ((60, '/recent'), (2 * 3600, '/earlier')):
+        windows.add('access', access_entry(report, log_lines, datetime.fromtimestamp(now - seconds_ago, timezone.utc), url, 404))
+    stamp = datetime.fromtimestamp(now - 30).strftime('%a %b %d %H:%M:%S %Y')
+    windows.add('error', report.parse_error_log_line(f'[{stamp}] [error] [client 192.0.2.1] File does not exist: /x'))
+    snapshot = [(title, windows.window(seconds, now)) for title, seconds in report.FOLLOW_WINDOWS]
+    report.write_follow_report(snapshot, windows.requests_per_minute(3600, now), str(tmp_path), 5)
+    with open(tmp_path / 'index.html', encoding='utf-8') as f:
+        html = f.read()
+    sections = html.split('<h2>')[1:4]
+    assert [section.split('</h2>')[0] for section in sections] == [title for title, seconds in report.FOLLOW_WINDOWS]
+    assert '<strong>Peticiones:</strong> 1<' in sections[0] and '<strong>Errores:</strong> 1<' in sections[0]
+    assert '<strong>Peticiones:</strong> 2<' in sections[2] and '/earlier: 1 peticiones' in sections[2]
+    assert '<meta http-equiv="refresh" content="5">' in html
+    assert (tmp_path / 'follow_requests_per_minute.png').exists()
@@ -0,0 +1,109 @@
+import math
+import random
+
+import pytest
+
+# Exact percentile of sorted values, with the rank rule of LogHistogram
+def exact_percentile(values, quantile):
+    return values[max(1, math.ceil(quantile * len(values))) - 1]
+
+def histogram_of(report, values):
+    histogram = report.LogHistogram()
+    for value in values:
+        histogram[report.histogram_bucket(value)] += 1
+    return histogram
+
+def test_buckets_are_exact_below_128_and_never_low(report):
+    assert [report.histogram_value(report.histogram_bucket(value)) for value in range(128)] == list(range(128))
+    for value in (128, 129, 1000, 65535, 10 ** 6, 10 ** 9 + 7, 2 ** 40):
+        reported = report.histogram_value(report.histogram_bucket(value))
+        assert value <= reported <= value * (1 + 1 / report.HISTOGRAM_SUB_BUCKETS)
+    # Buckets grow monotonically with the value
+    buckets = [report.histogram_bucket(value) for value in range(0, 200000, 37)]
+    assert buckets == sorted(buckets)
+
+@pytest.mark.parametrize('distribution', ['uniform', 'lognormal'])
+def test_percentiles_within_bucket_precision(report, distribution):
+    rng = random.Random(3)
+    if distribution == 'uniform':
+        values = [rng.randrange(0, 5000000) for i in range(20000)]
+    else:
+        values = [int(rng.lognormvariate(9, 1.5)) for i in range(20000)]
+    stats = histogram_of(report, values).percentiles()
+    values.sort()
+    assert stats['count'] == len(values)
+    for name, quantile in report.PERCENTILES:
+        exact = exact_percentile(values, quantile)
+        assert exact <= stats[name] <= exact * (1 + 1 / report.HISTOGRAM_SUB_BUCKETS) + 1
+    assert values[-1] <= stats['max'] <= values[-1] * (1 + 1 / report.HISTOGRAM_SUB_BUCKETS)
+
+def test_small_histograms(report):
+    assert histogram_of(report, [42]).percentiles() == {'count': 1, 'p50': 42, 'p90': 42, 'p99': 42, 'max': 42}
+    assert histogram_of(report, [1, 2, 3, 100]).percentiles() == {'count': 4, 'p50': 2, 'p90': 100, 'p99': 100, 'max': 100}
+
+# Merging histograms gives the histogram of all the values
+def test_merged_histograms_match_whole(report):
+    rng = random.Random(5)
+    parts = [[rng.randrange(0, 10 ** 6) for i in range(3000)] for part in range(4)]
+    merged = report.LogHistogram()
+    for part in parts:
+        merged.update(histogram_of(report, part))
+    assert merged == histogram_of(report, [value for part in parts for value in part])
+
+def access_entry(report, url, status, response_time, size):
+    parse = report.access_log_parser('%h %l %u %t "%r" %>s %b %D')
+    return parse(f'192.0.2.1 - - [05/Mar/2024:10:00:00 +0000] "GET {url} HTTP/1.1" {status} {size} {response_time}')
+
+# Per status class and per URL, latency comes from %D and size from %b
+def test_response_percentiles_by_class_and_url(report):
+    aggregator = report.ReportAggregator(log_format='%h %l %u %t "%r" %>s %b %D')
+    for i in range(1, 101):
+        aggregator.add_access(access_entry(report, '/fast', 200, i, 100))
+        aggregator.add_access(access_entry(report, '/slow', 503, i * 1000, 10 ** 6))
+    percentiles = report.response_percentiles(aggregator, ['/slow', '/unknown'])
+    latency = dict(percentiles['latency'])
+    assert list(latency) == ['Estado 2xx', 'Estado 5xx', '/slow']
+    assert (latency['Estado 2xx']['p50'], latency['Estado 2xx']['p99']) == (50, 99)
+    assert 90000 <= latency['/slow']['p90'] <= 90000 * (1 + 1 / report.HISTOGRAM_SUB_BUCKETS)
+    size = dict(percentiles['size'])
+    assert size['Estado 2xx']['max'] == 100 and size['/slow']['p50'] >= 10 ** 6
+
+# Without %D or %T only sizes are recorded
+def test_formats_without_latency_record_sizes_only(report):
+    aggregator = report.ReportAggregator()
+    parse = report.access_log_parser(report.DEFAULT_LOG_FORMAT)
+    aggregator.add_access(parse('192.0.2.1 - - [05/Mar/2024:10:00:00 +0000] "GET / HTTP/1.1" 200 512 "-" "-"'))
+    percentiles = report.response_percentiles(aggregator, ['/'])
+    assert percentiles['latency'] == []
+    assert dict(percentiles['size'])['/']['p50'] == report.histogram_value(report.histogram_bucket(512))
+
+# Beyond twice the capacity only the most requested URLs keep histograms
+def test_url_histograms_are_bounded(report, monkeypatch):
+    monkeypatch.setattr(report, 'URL_HISTOGRAM_CAPACITY', 5)
+    aggregator = report.ReportAggregator(log_format='%h %l %u %t "%r" %>s %b %D')
+    for i in range(3):
+        aggregator.add_access(access_entry(report, '/popular', 200, 10, 10))
+    for i in range(30):
+        aggregator.add_access(access_entry(report, f'/rare/{i}', 200, 10, 10))
+    assert len(aggregator.url_distributions) <= 10
+    assert '/popular' in aggregator.url_distributions
+
+# A URL whose histogram was pruned and restarted is marked as sampled
+def test_restarted_url_histograms_are_marked(report, monkeypatch):
+    monkeypatch.setattr(report, 'URL_HISTOGRAM_CAPACITY', 5)
+    aggregator = report.ReportAggregator(log_format='%h %l %u %t "%r" %>s %b %D')
+    for i in range(3):
+        aggregator.add_access(access_entry(report, '/popular', 200, 10, 10))
+    aggregator.add_access(access_entry(report, '/comeback', 200, 10, 10))
+    for i in range(30):
+        for repeat in range(2):
+            aggregator.add_access(access_entry(report, f'/rare/{i}', 200, 10, 10))
+    assert '/comeback' not in aggregator.url_distributions
+    for i in range(2):
+        aggregator.add_access(access_entry(report, '/comeback', 200, 10, 10))
+    percentiles = report.response_percentiles(aggregator, ['/popular', '/comeback'])
+    assert percentiles['sampled'] == ['/comeback']
+    size = dict(percentiles['size'])
+    assert size['/popular']['count'] == 3
+    assert size['/comeback *']['count'] == 2
+    assert aggregator.url_counter['/comeback'] == 3
@@ -0,0 +1,202 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+START = datetime(2024, 3, 5, 10, 0, tzinfo=timezone(timedelta(hours=-3)))
+BURST_IP = '203.0.113.9'
+
+# 40 minutes of background traffic with a burst of one IP between 10:15 and
+# 10:29:59, whose 5xx responses also make /api/login burst. A few slow
+# requests are logged up to 40 seconds late, as httpd does.
+def burst_lines(log_lines):
+    lines = []
+    for second in range(40 * 60):
+        moment = START + timedelta(seconds=second)
+        lines.append((moment, log_lines.access_line(moment, f'198.51.100.{second % 50}', f'/page/{second % 7}', 200)))
+        if 15 * 60 <= second < 30 * 60:
+            for i in range(2):
+                status = 503 if (second + i) % 3 == 0 else 200
+                lines.append((moment, log_lines.access_line(moment, BURST_IP, '/api/login', status)))
+        if second % 97 == 0 and second >= 40:
+            late = moment - timedelta(seconds=40)
+            lines.append((late, log_lines.access_line(late, BURST_IP, '/slow', 500)))
+    return [line for moment, line in lines]
+
+def detector(report):
+    return report.IncidentDetector(window=5, request_rate=400, error_rate=120)
+
+# Incidents straight from their definition: minutes of a key with events
+# whose window reaches the threshold, chained while less than a window apart
+def reference_incidents(report, lines, window, request_rate, error_rate):
+    parse = report.access_log_parser(report.DEFAULT_LOG_FORMAT)
+    events = defaultdict(lambda: defaultdict(list))
+    for line in lines:
+        entry = parse(line)
+        events['ip_rate', entry['ip']][report.rollup_minute(entry['timestamp'])].append(entry['timestamp'])
+        if entry['status'] >= 400:
+            events['ip_errors', entry['ip']][report.rollup_minute(entry['timestamp'])].append(entry['timestamp'])
+            events['url_errors', entry['request']][report.rollup_minute(entry['timestamp'])].append(entry['timestamp'])
+    incidents = []
+    for (kind, key), minutes in events.items():
+        threshold = request_rate if kind == 'ip_rate' else error_rate
+        current = None
+        for minute in sorted(minutes):
+            total = sum(len(minutes.get(past, ())) for past in range(minute - window + 1, minute + 1))
+            if total < threshold:
+                continue
+            if current is None or minute - current['last_minute'] > window:
+                current = {'kind': kind, 'key': key, 'start': min(minutes[minute]), 'end': max(minutes[minute]),
+                           'first_minute': minute, 'last_minute': minute, 'peak': total}
+                incidents.append(current)
+            current['end'] = max(current['end'], max(minutes[minute]))
+            current['last_minute'] = minute
+            current['peak'] = max(current['peak'], total)
+    return sorted(incidents, key=lambda incident: (incident['first_minute'], incident['kind'], incident['key']))
+
+def incidents_of(aggregator):
+    return [vars(incident) for incident in aggregator.detector.report()]
+
+def parse_dir(report, log_dir, jobs=1, chunk_size=0, cache=None):
+    aggregator = report.ReportAggregator(detector=detector(report))
+    report.parse_access_logs(str(log_dir), aggregator, jobs, chunk_size, cache)
+    return aggregator
+
+@pytest.fixture(scope='module')
+def expected(report, log_lines):
+    settings = detector(report).settings()
+    return reference_incidents(report, burst_lines(log_lines), *settings)
+
+def test_serial_run_matches_definition(report, logs, expected):
+    logs.write('access_log', ''.join(burst_lines(logs)))
+    found = incidents_of(parse_dir(report, logs.path))
+    assert found == expected
+    assert {incident['kind'] for incident in found} == {'ip_rate', 'ip_errors', 'url_errors'}
+    burst = next(incident for incident in found if incident['kind'] == 'url_errors')
+    assert (burst['start'], burst['end']) == (START + timedelta(minutes=17), START + timedelta(minutes=29, seconds=59))
+
+# Byte ranges shorter and longer than a window, parsed in a pool
+@pytest.mark.parametrize('chunk_size', [16 * 1024, 96 * 1024])
+def test_chunked_runs_match_serial(report, logs, expected, chunk_size):
+    logs.write('access_log', ''.join(burst_lines(logs)))
+    assert incidents_of(parse_dir(report, logs.path, jobs=4, chunk_size=chunk_size)) == expected
+
+# A rotation splits the burst; access_log sorts before access_log.1, so the
+# newer file is merged first
+@pytest.mark.parametrize('jobs', [1, 3])
+def test_rotated_logs_match_serial(report, logs, expected, jobs):
+    lines = burst_lines(logs)
+    middle = len(lines) // 2
+    logs.write('access_log.1', ''.join(lines[:middle]))
+    logs.write('access_log', ''.join(lines[middle:]))
+    assert incidents_of(parse_dir(report, logs.path, jobs=jobs)) == expected
+
+# Cached partials of compressed rotations give the incidents of a cold run
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_cached_runs_match_serial(report, logs, tmp_path, expected, jobs):
+    lines = burst_lines(logs)
+    third = len(lines) // 3
+    logs.write('access_log.2.gz', ''.join(lines[:third]))
+    logs.write('access_log.1.gz', ''.join(lines[third:2 * third]))
+    logs.write('access_log', ''.join(lines[2 * third:]))
+    cache = report.ParseCache(str(tmp_path / 'cache'), 1 << 30)
+    assert incidents_of(parse_dir(report, logs.path, jobs, cache=cache)) == expected
+    assert incidents_of(parse_dir(report, logs.path, jobs, cache=cache)) == expected
+
+# Partials merged one minute at a time still recount every window
+def test_minute_partials_merge_like_serial(report, log_lines, expected):
+    parse = report.access_log_parser(report.DEFAULT_LOG_FORMAT)
+    merged = report.ReportAggregator(detector=detector(report))
+    partial = None
+    for line in burst_lines(log_lines):
+        entry = parse(line)
+        if partial is None or entry['timestamp'].minute != partial.last_timestamp.minute:
+            if partial is not None:
+                merged.merge(partial)
+            partial = merged.new_partial()
+        partial.add_access(entry)
+    merged.merge(partial)
+    assert incidents_of(merged) == expected
+
+def test_window_counter_counts_late_lines(report):
+    counter = report.WindowCounter(window=3)
+    stamp = START.replace(tzinfo=None)
+    assert [counter.add('a', minute, stamp) for minute in (10, 10, 11)] == [1, 2, 3]
+    # One minute late: still in the window, so the later minutes are recounted
+    assert counter.add('a', 10, stamp) is None
+    assert [(minute, total) for minute, total, first, last in counter.recount('a', 10)] == [(10, 3), (11, 4)]
+    # A whole window late: not counted
+    assert counter.add('a', 8, stamp) == 0
+    # Minutes leave the window as it slides
+    assert counter.add('a', 13, stamp) == 2
+    assert counter.add('a', 20, stamp) == 1
+
+def test_window_counter_evicts_idle_keys(report, monkeypatch):
+    monkeypatch.setattr(report, 'INCIDENT_KEY_CAPACITY', 10)
+    counter = report.WindowCounter(window=2)
+    stamp = START.replace(tzinfo=None)
+    for i in range(10):
+        counter.add(f'idle-{i}', 0, stamp)
+    counter.add('busy', 4, stamp)
+    # Keys idle for two windows make room first
+    assert set(counter.rings) == {'busy'}
+    for i in range(20):
+        counter.add(f'active-{i}', 4, stamp)
+    assert len(counter.rings) <= 10
+
+@pytest.mark.parametrize('request_rate, error_rate, kinds', [
+    (0, 0, set()),
+    (400, 0, {'ip_rate'}),
+    (0, 120, {'ip_errors', 'url_errors'}),
+])
+def test_zero_threshold_disables_check(report, log_lines, request_rate, error_rate, kinds):
+    aggregator = report.ReportAggregator(detector=report.IncidentDetector(5, request_rate, error_rate))
+    parse = report.access_log_parser(report.DEFAULT_LOG_FORMAT)
+    for line in burst_lines(log_lines):
+        aggregator.add_access(parse(line))
+    assert {incident.kind for incident in aggregator.detector.report()} == kinds
+
+# Severe error_log levels burst too; warnings never do
+def test_error_log_level_bursts(report):
+    aggregator = report.ReportAggregator(detector=report.IncidentDetector(5, 0, 50))
+    start = START.replace(tzinfo=None)
+    for second in range(0, 20 * 60, 4):
+        moment = start + timedelta(seconds=second)
+        stamp = moment.strftime('%a %b %d %H:%M:%S %Y')
+        level = 'crit' if 5 * 60 <= second < 10 * 60 else 'warn'
+        aggregator.add_error(report.parse_error_log_line(f'[{stamp}] [{level}] [client 192.0.2.1] Something failed'))
+    incidents = aggregator.detector.report()
+    assert [(incident.kind, incident.key) for incident in incidents] == [('error_level', 'crit')]
+    # 50 entries arrive after 3:20 of the burst, which ends at 9:56
+    assert (incidents[0].start, incidents[0].end) == (start + timedelta(minutes=8), start + timedelta(minutes=9, seconds=56))
+    assert incidents[0].peak == 75
+
+# Beyond INCIDENT_LIMIT only the highest peaks are reported, and the rest
+# are counted in the summary note
+def test_incident_limit_keeps_highest_peaks(report, log_lines, monkeypatch):
+    monkeypatch.setattr(report, 'INCIDENT_LIMIT', 3)
+    aggregator = report.ReportAggregator(detector=report.IncidentDetector(1, 10, 0))
+    parse = report.access_log_parser(report.DEFAULT_LOG_FORMAT)
+    for i in range(10):
+        line = log_lines.access_line(START + timedelta(minutes=i * 5), f'192.0.2.{i}', '/', 200)
+        for request in range(10 + i):
+            aggregator.add_access(parse(line))
+    incidents = aggregator.detector.report()
+    assert [incident.key for incident in incidents] == ['192.0.2.7', '192.0.2.8', '192.0.2.9']
+    assert [incident.peak for incident in incidents] == [17, 18, 19]
+    summary = report.generate_incident_summary(aggregator)
+    assert summary['notes'][-1] == 'Se omitieron 7 incidentes con picos menores.'
+
+# Monthly reports list the incidents that start in their month
+def test_incidents_by_month(report, log_lines, tmp_path):
+    aggregator = report.ReportAggregator(detector=report.IncidentDetector(1, 5, 0))
+    parse = report.access_log_parser(report.DEFAULT_LOG_FORMAT)
+    for moment in (datetime(2024, 1, 31, 23, 59, tzinfo=timezone.utc), datetime(2024, 2, 15, 12, 0, tzinfo=timezone.utc)):
+        for request in range(5):
+            aggregator.add_access(parse(log_lines.access_line(moment, BURST_IP, '/', 200)))
+    assert [incident.start.month for incident in aggregator.detector.report('2024-01')] == [1]
+    assert [incident.start.month for incident in aggregator.detector.report('2024-02')] == [2]
+    report.generate_monthly_reports(aggregator, str(tmp_path), report.ChartRenderer(str(tmp_path)), pdf_mode='none')
+    with open(tmp_path / 'reporte_2024-02.html', encoding='utf-8') as f:
+        html = f.read()
+    assert '2024-02-15 12:00:00' in html and '2024-01-31' not in html
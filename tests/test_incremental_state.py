@@ -0,0 +1,139 @@
+import os
+import gzip
+import shutil
+
+STATUSES = (404, 200, 200, 200, 200, 200)
+
+def access_lines(logs, first, count):
+    return logs.access_lines(first, count, statuses=STATUSES)
+
+def run(report, log_dir, state_path, jobs=1, chunk_size=0, **settings):
+    return report.parse_logs_incrementally(str(log_dir), str(state_path), report.ReportAggregator(**settings),
+                                           jobs, chunk_size)
+
+def full_parse(report, log_dir):
+    aggregator = report.ReportAggregator()
+    report.parse_access_logs(str(log_dir), aggregator)
+    report.parse_error_logs(str(log_dir), aggregator)
+    return aggregator
+
+# Each run parses only what was appended; a half-written line waits for the
+# next run
+def test_resume_parses_only_new_lines(report, totals, logs, tmp_path, capsys):
+    log_dir = logs.path
+    state_path = tmp_path / 'state'
+    logs.write('access_log', access_lines(logs, 0, 300))
+    logs.write('error_log', logs.error_lines(0, 20, legacy=True))
+    assert run(report, log_dir, state_path).total_requests == 300
+    capsys.readouterr()
+
+    tail = access_lines(logs, 300, 50)
+    logs.write('access_log', tail[:-30], append=True)
+    aggregator = run(report, log_dir, state_path)
+    assert aggregator.total_requests == 349
+    assert 'Encontradas 49 entradas nuevas' in capsys.readouterr().out
+
+    logs.write('access_log', tail[-30:], append=True)
+    logs.write('error_log', logs.error_lines(20, 5, legacy=True), append=True)
+    aggregator = run(report, log_dir, state_path)
+    assert aggregator.total_requests == 350
+    assert aggregator.rejected_lines['access'] == 0
+    assert totals(aggregator) == totals(full_parse(report, log_dir))
+
+    # Nothing new: the files are not read at all
+    capsys.readouterr()
+    assert totals(run(report, log_dir, state_path)) == totals(aggregator)
+    assert 'Procesando' not in capsys.readouterr().out
+
+# A log renamed, then compressed, is followed through its fingerprint and
+# only its unseen tail is parsed
+def test_rotation_and_compression_are_followed(report, totals, logs, tmp_path, capsys):
+    log_dir = logs.path
+    state_path = tmp_path / 'state'
+    access_path = log_dir / 'access_log'
+    logs.write('access_log', access_lines(logs, 0, 200))
+    logs.write('error_log', logs.error_lines(0, 5, legacy=True))
+    run(report, log_dir, state_path)
+
+    logs.write('access_log', access_lines(logs, 200, 40), append=True)
+    os.rename(access_path, log_dir / 'access_log.1')
+    logs.write('access_log', access_lines(logs, 240, 60))
+    aggregator = run(report, log_dir, state_path, jobs=2)
+    output = capsys.readouterr().out
+    assert 'Rotación detectada' in output and 'access_log.1 continúa' in output
+    assert aggregator.total_requests == 300
+
+    with open(log_dir / 'access_log.1', 'rb') as f, gzip.open(log_dir / 'access_log.1.gz', 'wb') as g:
+        shutil.copyfileobj(f, g)
+    os.remove(log_dir / 'access_log.1')
+    os.rename(access_path, log_dir / 'access_log.2')
+    logs.write('access_log', access_lines(logs, 300, 10))
+    aggregator = run(report, log_dir, state_path)
+    assert aggregator.total_requests == 310
+    assert totals(aggregator) == totals(full_parse(report, log_dir))
+
+# copytruncate: the copy continues the old record, the emptied log is read
+# again from its start
+def test_copytruncate_rereads_the_truncated_log(report, totals, logs, tmp_path, capsys):
+    log_dir = logs.path
+    state_path = tmp_path / 'state'
+    access_path = log_dir / 'access_log'
+    logs.write('access_log', access_lines(logs, 0, 100))
+    logs.write('error_log', logs.error_lines(0, 5, legacy=True))
+    run(report, log_dir, state_path)
+    capsys.readouterr()
+
+    shutil.copy(access_path, log_dir / 'access_log.1')
+    logs.write('access_log', access_lines(logs, 100, 10))
+    aggregator = run(report, log_dir, state_path)
+    output = capsys.readouterr().out
+    assert 'access_log.1 continúa' in output
+    assert 'Encontradas 0 entradas nuevas' not in output and 'Encontradas 10 entradas nuevas' in output
+    assert aggregator.total_requests == 110
+    assert totals(aggregator) == totals(full_parse(report, log_dir))
+
+# A log shorter than what was parsed, with the same head, cannot be resumed
+def test_shrunk_log_rebuilds_state(report, totals, logs, tmp_path, capsys):
+    log_dir = logs.path
+    state_path = tmp_path / 'state'
+    logs.write('access_log', access_lines(logs, 0, 100))
+    logs.write('error_log', logs.error_lines(0, 5, legacy=True))
+    run(report, log_dir, state_path)
+
+    logs.write('access_log', access_lines(logs, 0, 60))
+    aggregator = run(report, log_dir, state_path)
+    assert 'se reconstruye desde cero' in capsys.readouterr().out
+    assert totals(aggregator) == totals(full_parse(report, log_dir))
+
+def test_changed_settings_or_unreadable_state_rebuild(report, logs, tmp_path, capsys):
+    log_dir = logs.path
+    state_path = tmp_path / 'state'
+    logs.write('access_log', access_lines(logs, 0, 100))
+    logs.write('error_log', logs.error_lines(0, 5, legacy=True))
+    run(report, log_dir, state_path)
+
+    aggregator = run(report, log_dir, state_path, approximate=True)
+    assert 'se reconstruye desde cero' in capsys.readouterr().out
+    assert aggregator.approximate and aggregator.total_requests == 100
+
+    # Combined lines do not match the common format, so every line is read again and rejected
+    aggregator = run(report, log_dir, state_path, approximate=True, log_format='common')
+    assert 'se reconstruye desde cero' in capsys.readouterr().out
+    assert (aggregator.total_requests, aggregator.rejected_lines['access']) == (0, 100)
+
+    state_path.write_bytes(b'not a pickle')
+    assert run(report, log_dir, state_path).total_requests == 100
+    assert 'No se pudo leer el estado incremental' in capsys.readouterr().out
+
+# Appended ranges parsed in a pool count what a serial resume counts
+def test_parallel_resume_matches_serial(report, totals, logs, tmp_path):
+    results = []
+    for jobs, chunk_size in ((1, 0), (3, 2048)):
+        state_path = tmp_path / f'state-{jobs}'
+        logs.write('access_log', access_lines(logs, 0, 500))
+        logs.write('error_log', logs.error_lines(0, 5, legacy=True))
+        run(report, logs.path, state_path, jobs, chunk_size)
+        logs.write('access_log', access_lines(logs, 500, 500), append=True)
+        results.append(totals(run(report, logs.path, state_path, jobs, chunk_size)))
+    assert results[0] == results[1]
+    assert results[0]['requests'] == 1000
@@ -0,0 +1,114 @@
+import sys
+
+import pytest
+
+STAMP = '[10/Oct/2024:13:55:36 -0700]'
+REQUEST = '"GET /index.html HTTP/1.1"'
+AGENTS = '"https://example.com/" "curl/8.4.0"'
+COMBINED_LINE = f'192.0.2.1 - frank {STAMP} {REQUEST} 200 2326 {AGENTS}\n'
+
+# %D is in microseconds; %T in seconds unless its argument names the unit
+@pytest.mark.parametrize('directive, value, microseconds', [
+    ('%D', '1520', 1520),
+    ('%T', '2', 2000000),
+    ('%{s}T', '3', 3000000),
+    ('%{ms}T', '15', 15000),
+    ('%{us}T', '1520', 1520),
+])
+def test_response_time_is_converted_to_microseconds(report, directive, value, microseconds):
+    parse = report.access_log_parser(f'%h %t "%r" %>s %b {directive}')
+    assert parse(f'192.0.2.1 {STAMP} {REQUEST} 200 512 {value}\n')['response_time'] == microseconds
+
+# Fields the reports do not read are matched without being captured
+def test_uncaptured_fields_are_left_out(report):
+    entry = report.access_log_parser('combined')(COMBINED_LINE)
+    assert 'referer' not in entry
+    assert set(entry) == set(report.ACCESS_FIELDS) | {'month'}
+
+# The default parser gives the entries of the full-field combined parser
+def test_default_format_matches_combined_fields(report):
+    entry = report.access_log_parser(report.DEFAULT_LOG_FORMAT)(COMBINED_LINE)
+    full = report.parse_access_log_line(COMBINED_LINE)
+    assert entry == {field: full.get(field) for field in report.ACCESS_FIELDS + ('month',)}
+    assert (full['ident'], full['authuser'], full['protocol'], full['referer']) == \
+        ('-', 'frank', 'HTTP/1.1', 'https://example.com/')
+
+# vhost_combined starts with %v:%p, which the combined layout does not allow
+def test_vhost_combined_lines_are_read(report):
+    parse = report.access_log_parser('vhost_combined')
+    entry = parse(f'www.example.com:443 192.0.2.1 - frank {STAMP} {REQUEST} 200 2326 {AGENTS}\n')
+    assert (entry['ip'], entry['request'], entry['status'], entry['user_agent']) == \
+        ('192.0.2.1', '/index.html', 200, 'curl/8.4.0')
+    assert report.access_log_parser('combined')(f'www.example.com:443 {COMBINED_LINE}') is None
+
+# vhost_combined logs %O (mod_logio) instead of %b
+def test_vhost_combined_reads_bytes_from_logio(report):
+    parse = report.access_log_parser('vhost_combined')
+    entry = parse(f'www.example.com:443 192.0.2.1 - - {STAMP} {REQUEST} 200 5120 {AGENTS}\n')
+    assert entry['bytes_sent'] == 5120
+    assert entry['ip'] == '192.0.2.1'
+    assert 'bytes_sent' in parse.fields
+
+# With both, %b is the response size the reports use, wherever %O is
+def test_response_bytes_win_over_logio(report):
+    line = f'192.0.2.1 - - {STAMP} {REQUEST} 200 2326 {AGENTS} 431 2890\n'
+    assert report.access_log_parser('combinedio')(line)['bytes_sent'] == 2326
+    parse = report.access_log_parser('%h %t "%r" %>s %O %b')
+    assert parse(f'192.0.2.1 {STAMP} {REQUEST} 200 2890 2326\n')['bytes_sent'] == 2326
+
+def test_format_without_bytes_says_so(report):
+    parse = report.access_log_parser('%h %t "%r" %>s')
+    assert 'bytes_sent' not in parse.fields
+    assert parse(f'192.0.2.1 {STAMP} {REQUEST} 404\n')['bytes_sent'] == 0
+
+# %U%q rebuilds the request as %r logs it; %q alone is not the request
+def test_path_and_query_make_the_request(report):
+    parse = report.access_log_parser('%h %t "%m %U%q %H" %>s %b')
+    assert parse(f'192.0.2.1 {STAMP} "GET /search?q=1 HTTP/1.1" 200 512\n')['request'] == '/search?q=1'
+    assert parse(f'192.0.2.1 {STAMP} "GET /search HTTP/1.1" 200 512\n')['request'] == '/search'
+    entry = report.access_log_parser('%h %t %q %>s %b')(f'192.0.2.1 {STAMP} ?q=1 200 512\n')
+    assert entry['request'] == '-'
+
+# Quoted values may contain spaces, unquoted ones may not
+def test_unknown_directives_follow_their_quoting(report):
+    quoted = report.access_log_parser('%h %t "%r" %>s %b "%{X-Forwarded-For}i"')
+    assert quoted(f'192.0.2.1 {STAMP} {REQUEST} 200 512 "198.51.100.7, 203.0.113.9"\n')['status'] == 200
+    unquoted = report.access_log_parser('%h %t "%r" %>s %b %{X-Forwarded-For}i')
+    assert unquoted(f'192.0.2.1 {STAMP} {REQUEST} 200 512 198.51.100.7\n')['status'] == 200
+    assert unquoted(f'192.0.2.1 {STAMP} {REQUEST} 200 512 198.51.100.7, 203.0.113.9\n') is None
+
+# Formats copied from httpd.conf keep their \" escapes; %% is a literal %
+def test_escaped_quotes_and_percent(report):
+    parse = report.access_log_parser('%h %l %u %t \\"%r\\" %>s %b')
+    assert parse(f'192.0.2.1 - frank {STAMP} {REQUEST} 200 2326\n')['request'] == '/index.html'
+    parse = report.access_log_parser('%h %t "%r" %>s %b 100%%')
+    assert parse(f'192.0.2.1 {STAMP} {REQUEST} 200 2326 100%\n')['bytes_sent'] == 2326
+
+@pytest.mark.parametrize('nickname', ['common', 'combined', 'combinedio', 'vhost_combined'])
+def test_nicknames_compile_like_their_format(report, nickname):
+    line = {
+        'common': f'192.0.2.1 - frank {STAMP} {REQUEST} 200 2326\n',
+        'combined': COMBINED_LINE,
+        'combinedio': f'192.0.2.1 - frank {STAMP} {REQUEST} 200 2326 {AGENTS} 431 2890\n',
+        'vhost_combined': f'www.example.com:443 192.0.2.1 - frank {STAMP} {REQUEST} 200 2326 {AGENTS}\n',
+    }[nickname]
+    expanded = report.LOG_FORMAT_NICKNAMES[nickname]
+    assert report.access_log_parser(nickname)(line) == report.access_log_parser(expanded)(line) is not None
+
+@pytest.mark.parametrize('log_format', [
+    '%h "%r" %>s %b',
+    'combined_typo',
+    '%h %{%d/%b/%Y}t "%r" %>s %b',
+    '%h %t "%r" %>s %b %{ns}T',
+])
+def test_malformed_formats_raise_value_error(report, log_format):
+    with pytest.raises(ValueError):
+        report.compile_access_format(log_format)
+
+def test_invalid_log_format_stops_the_run(report, tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, 'argv', ['httpd-fancyreport.py', str(tmp_path), '--pdf', 'none', '--no-cache',
+                                      '--log-format', '%h "%r"'])
+    with pytest.raises(SystemExit):
+        report.main()
+    assert 'Formato de log inválido' in capsys.readouterr().out
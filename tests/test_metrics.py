@@ -0,0 +1,78 @@
+import os
+import json
+import pstats
+
+import pytest
+
+@pytest.fixture
+def log_dir(logs):
+    logs.write('access_log.1.gz', logs.access_lines(0, 500))
+    logs.write('access_log', logs.access_lines(500, 300) + 'garbage\n')
+    logs.write('error_log', logs.error_lines(0, 30, legacy=True))
+    return logs.path
+
+def run_report(report, monkeypatch, tmp_path, *argv):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(report.sys, 'argv', ['httpd-fancyreport.py', *argv])
+    report.main()
+
+def test_metrics_cover_every_stage_and_file(report, log_dir, tmp_path, monkeypatch):
+    metrics_path = tmp_path / 'metrics.json'
+    cache_dir = tmp_path / 'cache'
+    for run in range(2):
+        run_report(report, monkeypatch, tmp_path, str(log_dir), '--pdf', 'none', '--cache-dir', str(cache_dir),
+                   '--metrics', str(metrics_path), '--jobs', '2')
+        metrics = json.loads(metrics_path.read_text())
+        stages = [stage['stage'] for stage in metrics['stages']]
+        assert stages == ['parse_access', 'parse_error', 'summaries', 'monthly_reports', 'charts', 'index']
+        files = {os.path.basename(entry['path']): entry for entry in metrics['files']}
+        assert (files['access_log']['lines'], files['access_log']['rejected_lines']) == (301, 1)
+        assert files['access_log']['bytes_read'] == (log_dir / 'access_log').stat().st_size
+        assert files['access_log.1.gz']['lines'] == 500
+        # The compressed rotation comes from the cache on the second run
+        assert [files[name]['cached'] for name in ('access_log', 'access_log.1.gz')] == [False, run == 1]
+        parse_access = metrics['stages'][0]
+        assert (parse_access['lines'], parse_access['rejected_lines']) == (801, 1)
+        assert all(stage['wall_seconds'] >= 0 and stage['peak_rss_kib'] > 0 for stage in metrics['stages'])
+        assert metrics['argv'][0] == str(log_dir)
+
+# The profile of a serial run includes the line-by-line parsing
+def test_profile_dump_covers_parsing(report, log_dir, tmp_path, monkeypatch, capsys):
+    profile_path = tmp_path / 'parse.prof'
+    run_report(report, monkeypatch, tmp_path, str(log_dir), '--pdf', 'none', '--no-cache', '--profile', str(profile_path))
+    assert 'Perfil del análisis guardado' in capsys.readouterr().out
+    functions = {name for filename, line, name in pstats.Stats(str(profile_path)).stats}
+    assert {'aggregate_lines', 'add_access', 'parse_error_log_line'} <= functions
+    # Summaries, charts and pages are not part of the profile
+    assert 'generate_monthly_reports' not in functions
+
+# Resetting the peak for each file keeps the peaks of the stage and the run
+def test_peaks_survive_resets(report):
+    metrics = report.RunMetrics()
+    with metrics.stage('allocate'):
+        block = b'x' * (64 * 1024 * 1024)
+        peak = report.peak_rss_kib()
+        del block
+        report.run_measured(len, '')
+    assert metrics.stages[0]['peak_rss_kib'] >= peak
+    report.reset_peak_rss()
+    assert report.peak_rss_kib('run') >= peak
+
+# A stage that stops the run is still recorded, with the reason
+def test_failed_stage_is_recorded(report, tmp_path, monkeypatch, capsys):
+    metrics_path = tmp_path / 'metrics.json'
+    with pytest.raises(SystemExit):
+        run_report(report, monkeypatch, tmp_path, 'merge', str(tmp_path / 'missing.summary'), '--pdf', 'none',
+                   '--metrics', str(metrics_path))
+    stages = json.loads(metrics_path.read_text())['stages']
+    assert [(stage['stage'], stage['error']) for stage in stages] == [('merge', 'SystemExit: 1')]
+    assert stages[0]['wall_seconds'] >= 0
+
+def test_stage_raising_is_recorded(report):
+    metrics = report.RunMetrics()
+    with pytest.raises(ValueError):
+        with metrics.stage('parse'):
+            raise ValueError('bad line')
+    with metrics.stage('index'):
+        pass
+    assert [stage.get('error') for stage in metrics.stages] == ['ValueError: bad line', None]
@@ -0,0 +1,133 @@
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+def access_entry(minute, url):
+    timestamp = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=minute)
+    return {'ip': f'198.51.100.{minute % 200}', 'timestamp': timestamp, 'method': 'GET', 'request': url,
+            'status': 200, 'bytes_sent': 100, 'user_agent': '-', 'response_time': None,
+            'month': timestamp.strftime('%Y-%m')}
+
+# With --approximate the monthly URL sketch overcounts once it evicts keys;
+# the "first N of M" note of the detail table must still give the exact M
+def test_detail_total_is_exact_with_approximate_counters(report, tmp_path):
+    aggregator = report.ReportAggregator(detail_limit=10, approximate=True)
+    requests = 6000
+    for minute in range(requests):
+        # Many one-off URLs between a few popular ones force evictions
+        url = '/popular' if minute % 3 == 0 else f'/page/{minute}'
+        aggregator.add_access(access_entry(minute % (31 * 1440), url))
+    bucket = aggregator.months['2024-01']
+    assert sum(bucket.url_counter.values()) != requests
+    assert bucket.requests == requests
+
+    charts = report.ChartRenderer(str(tmp_path))
+    report.generate_monthly_reports(aggregator, str(tmp_path), charts, pdf_mode='none')
+    with open(tmp_path / 'reporte_2024-01.html', encoding='utf-8') as f:
+        html = f.read()
+    assert f'Se muestran las primeras 10 de {requests} entradas.' in html
+
+# Partials merge their exact monthly counts
+def test_monthly_requests_merge(report):
+    first = report.ReportAggregator(approximate=True)
+    second = first.new_partial()
+    for minute in range(50):
+        first.add_access(access_entry(minute, f'/a/{minute}'))
+        second.add_access(access_entry(minute + 40 * 1440, f'/b/{minute}'))
+    first.merge(second)
+    assert first.months['2024-01'].requests == 50
+    assert first.months['2024-02'].requests == 50
+
+# Workers keep only detail_limit rows per month, and merging their partials
+# in order still gives the rows of a serial run
+def test_partials_keep_only_detail_limit_rows(report):
+    entries = [access_entry(minute * 97, f'/a/{minute}') for minute in range(900)]
+    serial = report.ReportAggregator(detail_limit=25)
+    for entry in entries:
+        serial.add_access(entry)
+    merged = report.ReportAggregator(detail_limit=25)
+    for start in range(0, len(entries), 200):
+        partial = merged.new_partial()
+        for entry in entries[start:start + 200]:
+            partial.add_access(entry)
+        assert all(partial.access_records.month_count(month) <= 25 for month in partial.months)
+        merged.merge(partial)
+    assert [record.request for record in merged.access_records] == [record.request for record in serial.access_records]
+    assert len(serial.access_records) == sum(min(25, bucket.requests) for bucket in serial.months.values())
+
+def test_cache_entries_depend_on_detail_limit(report):
+    assert report.ReportAggregator(10).cache_variant() != report.ReportAggregator(20).cache_variant()
+    assert report.ReportAggregator(10).cache_variant(detail=False) == report.ReportAggregator().cache_variant()
+
+def monthly_aggregator(report, requests, detail_limit=None):
+    aggregator = report.ReportAggregator(detail_limit=detail_limit)
+    for minute in range(requests):
+        aggregator.add_access(access_entry(minute, f'/row/{minute}'))
+    return aggregator
+
+def read(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+# With a page size the web report links to pages of rows, while the PDF
+# version keeps the whole table
+def test_detail_pages_split_rows_in_order(report, tmp_path):
+    aggregator = monthly_aggregator(report, 25)
+    charts = report.ChartRenderer(str(tmp_path))
+    report.generate_monthly_reports(aggregator, str(tmp_path), charts, page_size=10)
+    html = read(tmp_path / 'reporte_2024-01.html')
+    assert '25 entradas en 3 páginas' in html
+    assert '/row/0<' not in html
+    pages = [read(tmp_path / f'reporte_2024-01_accesos_{page}.html') for page in (1, 2, 3)]
+    assert not (tmp_path / 'reporte_2024-01_accesos_4.html').exists()
+    rows = [[minute for minute in range(25) if f'>/row/{minute}<' in page] for page in pages]
+    assert rows == [list(range(10)), list(range(10, 20)), list(range(20, 25))]
+    assert 'Siguiente' in pages[0] and 'Anterior' not in pages[0]
+    assert 'Página 3 de 3' in pages[2] and 'Siguiente' not in pages[2]
+    pdf_html = read(tmp_path / 'reporte_2024-01_pdf.html')
+    assert all(f'>/row/{minute}<' in pdf_html for minute in range(25))
+
+@pytest.mark.parametrize('pdf_mode, pdf_rows', [('full', True), ('summary', False), ('none', None)])
+def test_pdf_mode_controls_pdf_version(report, tmp_path, pdf_mode, pdf_rows):
+    aggregator = monthly_aggregator(report, 5)
+    charts = report.ChartRenderer(str(tmp_path))
+    assert report.generate_monthly_reports(aggregator, str(tmp_path), charts, pdf_mode=pdf_mode) == ['2024-01']
+    assert '>/row/4<' in read(tmp_path / 'reporte_2024-01.html')
+    pdf_path = tmp_path / 'reporte_2024-01_pdf.html'
+    if pdf_rows is None:
+        assert not pdf_path.exists()
+    else:
+        assert ('>/row/4<' in read(pdf_path)) == pdf_rows
+
+# The row cap is noted in both versions, with the exact month total
+def test_detail_rows_cap_is_noted(report, tmp_path):
+    aggregator = monthly_aggregator(report, 30, detail_limit=12)
+    charts = report.ChartRenderer(str(tmp_path))
+    report.generate_monthly_reports(aggregator, str(tmp_path), charts)
+    for name in ('reporte_2024-01.html', 'reporte_2024-01_pdf.html'):
+        html = read(tmp_path / name)
+        assert 'Se muestran las primeras 12 de 30 entradas.' in html
+        assert '>/row/11<' in html and '>/row/12<' not in html
+
+# Every monthly PDF and the complete report are rendered
+def test_generate_pdfs_renders_every_document(report, tmp_path, monkeypatch, capsys):
+    rendered = []
+
+    def render_pdf(source, target, output_folder):
+        rendered.append((os.path.basename(source), os.path.basename(target)))
+        return 0.0
+    monkeypatch.setattr(report, 'render_pdf', render_pdf)
+    report.generate_pdfs(str(tmp_path), ['2024-01', '2024-02'], str(tmp_path / 'index_pdf.html'))
+    assert sorted(rendered) == [('index_pdf.html', 'reporte_completo.pdf'),
+                                ('reporte_2024-01_pdf.html', 'reporte_2024-01.pdf'),
+                                ('reporte_2024-02_pdf.html', 'reporte_2024-02.pdf')]
+    assert '3 PDF generados' in capsys.readouterr().out
+
+def test_missing_weasyprint_stops_before_parsing(report, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(report, 'HTML', None)
+    monkeypatch.setattr(sys, 'argv', ['httpd-fancyreport.py', str(tmp_path), '--pdf', 'summary'])
+    with pytest.raises(SystemExit):
+        report.main()
+    assert 'use --pdf none' in capsys.readouterr().out
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+START = datetime(2024, 1, 28, tzinfo=timezone(timedelta(hours=1)))
+
+# Two compressed rotations and a plain current file, with a line no parser
+# accepts and an unfinished last line
+@pytest.fixture
+def log_dir(logs):
+    lines = logs.access_lines(0, 9000, START, 37, 61, 23, (200, 200, 304, 404, 500), queries=4,
+                              agents=3).splitlines(keepends=True)
+    lines[100] = 'not a log line\n'
+    logs.write('access_log.2.gz', ''.join(lines[:3000]))
+    logs.write('access_log.1.gz', ''.join(lines[3000:6000]))
+    logs.write('access_log', ''.join(lines[6000:]) + 'truncated line without newline')
+    logs.write('error_log.1', logs.error_lines(0, 1500, START, 90))
+    logs.write('error_log', logs.error_lines(1500, 500, START, 90))
+    return logs.path
+
+def parse(report, log_dir, jobs=1, chunk_size=0, **settings):
+    aggregator = report.ReportAggregator(detail_limit=500, **settings)
+    report.parse_access_logs(str(log_dir), aggregator, jobs, chunk_size)
+    report.parse_error_logs(str(log_dir), aggregator, jobs, chunk_size)
+    return report.aggregator_data(aggregator)
+
+# Whole files, byte ranges smaller than a block and ranges of one line each
+# give the aggregate of a serial run, detail rows included
+@pytest.mark.parametrize('jobs, chunk_size', [(3, 0), (4, 16 * 1024), (2, 1)])
+def test_parallel_runs_match_serial(report, log_dir, jobs, chunk_size):
+    serial = parse(report, log_dir)
+    assert serial['total_requests'] == 8999
+    assert report.counter_from_data(serial['rejected_lines'])['access'] == 2
+    assert serial['total_errors'] == 2000
+    assert parse(report, log_dir, jobs, chunk_size) == serial
+
+# Partials are merged with the approximate counters and with grouped URLs
+# like a serial run
+@pytest.mark.parametrize('settings', [
+    lambda report: {'approximate': True},
+    lambda report: {'url_normalizer': report.UrlNormalizer()},
+])
+def test_parallel_runs_match_serial_with_settings(report, log_dir, settings):
+    settings = settings(report)
+    assert parse(report, log_dir, 3, 32 * 1024, **settings) == parse(report, log_dir, **settings)
+
+def test_split_log_file_ends_ranges_at_newlines(report, logs):
+    log_path = logs.write('access_log', logs.access_lines(0, 500))
+    data = log_path.read_bytes()
+    ranges = report.split_log_file(str(log_path), 4096)
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    assert all(previous[1] == current[0] for previous, current in zip(ranges, ranges[1:]))
+    assert all(data[end - 1:end] == b'\n' for start, end in ranges)
+    assert all(end - start >= 4096 for start, end in ranges[:-1])
+
+def test_split_log_file_keeps_small_and_compressed_files_whole(report, logs):
+    plain = logs.write('access_log', logs.access_lines(0, 10))
+    compressed = logs.write('access_log.1.gz', logs.access_lines(0, 5000))
+    assert report.split_log_file(str(plain), 1 << 20) == [None]
+    assert report.split_log_file(str(plain), 0) == [None]
+    assert report.split_log_file(str(compressed), 1024) == [None]
+    # Read from an offset, a file is one range even without a chunk size
+    assert report.split_log_file(str(plain), 0, start=100) == [(100, plain.stat().st_size)]
+
+# Mapped ranges yield the lines text mode reads, CRLF and bad bytes included,
+# whatever the decode block size
+@pytest.mark.parametrize('block_size', [8, 64, 1 << 20])
+def test_mapped_lines_match_text_mode(report, tmp_path, monkeypatch, block_size):
+    log_path = tmp_path / 'access_log'
+    log_path.write_bytes(b'first\r\nsecond \xff\xfe line\nthird\rfourth\n' + b'x' * 100 + b'\nlast')
+    with report.open_log_file(str(log_path)) as f:
+        expected = [line.rstrip('\n') for line in f]
+    monkeypatch.setattr(report, 'MMAP_BLOCK_SIZE', block_size)
+    with open(log_path, 'rb') as f:
+        mapped = report.mmap.mmap(f.fileno(), 0, access=report.mmap.ACCESS_READ)
+        lines = list(report.iter_mapped_lines(mapped, 0, log_path.stat().st_size))
+        mapped.close()
+    assert lines == expected
@@ -0,0 +1,104 @@
+import os
+from datetime import datetime
+
+import pytest
+
+@pytest.fixture
+def log_dir(logs):
+    logs.write('access_log.2.gz', logs.access_lines(0, 400))
+    logs.write('access_log.1.gz', logs.access_lines(400, 400))
+    logs.write('access_log', logs.access_lines(800, 100))
+    return logs.path
+
+def parse(report, log_dir, cache, jobs=1):
+    aggregator = report.ReportAggregator(detail_limit=50)
+    report.parse_access_logs(str(log_dir), aggregator, jobs, 0, cache)
+    return report.aggregator_data(aggregator)
+
+# Refuse to parse compressed logs other than `allowed`, so only cache hits
+# can succeed
+def forbid_parsing_compressed(report, monkeypatch, allowed=()):
+    aggregate_log_file = report.aggregate_log_file
+
+    def parse_uncached_only(file_path, kind, partial=None):
+        assert not report.compression_suffix(file_path) or file_path in allowed, f"{file_path} no se leyó de la caché"
+        return aggregate_log_file(file_path, kind, partial)
+    monkeypatch.setattr(report, 'aggregate_log_file', parse_uncached_only)
+
+def test_compressed_logs_are_read_from_cache(report, log_dir, tmp_path, monkeypatch):
+    cache = report.ParseCache(str(tmp_path / 'cache'), 1 << 30)
+    cold = parse(report, log_dir, cache)
+    entries = [name for name in os.listdir(cache.cache_dir) if name.endswith('.bin')]
+    # Only the rotated, compressed logs get entries
+    assert len(entries) == 2
+    forbid_parsing_compressed(report, monkeypatch)
+    assert parse(report, log_dir, cache) == cold
+
+# Entries are addressed by content: a rotation renaming every file still hits
+def test_renamed_logs_hit_the_cache(report, logs, log_dir, tmp_path, monkeypatch):
+    cache = report.ParseCache(str(tmp_path / 'cache'), 1 << 30)
+    parse(report, log_dir, cache)
+    os.rename(log_dir / 'access_log.2.gz', log_dir / 'access_log.3.gz')
+    os.rename(log_dir / 'access_log.1.gz', log_dir / 'access_log.2.gz')
+    logs.write('access_log.1.gz', logs.access_lines(900, 10))
+    forbid_parsing_compressed(report, monkeypatch, allowed={str(log_dir / 'access_log.1.gz')})
+    assert parse(report, log_dir, cache)['total_requests'] == 910
+
+def test_changed_content_misses_the_cache(report, logs, log_dir, tmp_path):
+    cache = report.ParseCache(str(tmp_path / 'cache'), 1 << 30)
+    parse(report, log_dir, cache)
+    logs.write('access_log.1.gz', logs.access_lines(400, 300))
+    assert parse(report, log_dir, cache)['total_requests'] == 800
+
+# The index saved by finish() spares rehashing files that did not change
+def test_unchanged_files_are_not_rehashed(report, log_dir, tmp_path, monkeypatch):
+    cache = report.ParseCache(str(tmp_path / 'cache'), 1 << 30)
+    parse(report, log_dir, cache)
+    cache.finish()
+    monkeypatch.setattr(report, 'hash_file', lambda file_path: pytest.fail(f"{file_path} se volvió a leer"))
+    cache = report.ParseCache(str(tmp_path / 'cache'), 1 << 30)
+    assert cache.entry_path(str(log_dir / 'access_log.1.gz'), 'access') is not None
+    # Plain logs may still grow and are never cached
+    assert cache.entry_path(str(log_dir / 'access_log'), 'access') is None
+
+def test_invalid_entry_is_replaced(report, log_dir, tmp_path, capsys):
+    cache = report.ParseCache(str(tmp_path / 'cache'), 1 << 30)
+    cold = parse(report, log_dir, cache)
+    entry = cache.entry_path(str(log_dir / 'access_log.1.gz'), 'access', report.ReportAggregator(50).cache_variant())
+    with open(entry, 'wb') as f:
+        f.write(b'garbage')
+    assert parse(report, log_dir, cache) == cold
+    assert 'Entrada de caché inválida' in capsys.readouterr().out
+    assert parse(report, log_dir, cache) == cold
+
+@pytest.mark.parametrize('jobs', [1, 3])
+def test_cached_runs_match_uncached(report, log_dir, tmp_path, jobs):
+    cache = report.ParseCache(str(tmp_path / 'cache'), 1 << 30)
+    uncached = parse(report, log_dir, None)
+    assert parse(report, log_dir, cache, jobs) == uncached
+    assert parse(report, log_dir, cache, jobs) == uncached
+
+# Beyond max_bytes the least recently used entries go first
+def test_finish_evicts_least_recently_used(report, tmp_path):
+    cache = report.ParseCache(str(tmp_path / 'cache'), 2500)
+    now = datetime.now().timestamp()
+    for age, name in enumerate(('newest.bin', 'recent.png', 'old.bin', 'oldest.svg')):
+        path = os.path.join(cache.cache_dir, name)
+        with open(path, 'wb') as f:
+            f.write(b'x' * 1000)
+        os.utime(path, (now - age * 60, now - age * 60))
+    cache.finish()
+    assert sorted(name for name in os.listdir(cache.cache_dir) if not name.endswith('.pkl')) == ['newest.bin', 'recent.png']
+
+# A hit refreshes the entry, so it outlives entries written after it
+def test_cache_hit_refreshes_entry(report, log_dir, tmp_path):
+    cache = report.ParseCache(str(tmp_path / 'cache'), 1 << 30)
+    parse(report, log_dir, cache)
+    variant = report.ReportAggregator(50).cache_variant()
+    entries = [cache.entry_path(str(log_dir / name), 'access', variant) for name in ('access_log.2.gz', 'access_log.1.gz')]
+    for entry in entries:
+        os.utime(entry, (0, 0))
+    cache.entry_path(str(log_dir / 'access_log.2.gz'), 'access', variant)
+    cache.max_bytes = os.path.getsize(entries[0])
+    cache.finish()
+    assert [os.path.exists(entry) for entry in entries] == [True, False]
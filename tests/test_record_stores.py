@@ -0,0 +1,109 @@
+import pickle
+from datetime import datetime, timedelta, timezone
+
+def access_entry(moment, url, ip='192.0.2.1'):
+    return {'ip': ip, 'timestamp': moment, 'method': 'GET', 'request': url, 'status': 200, 'bytes_sent': 512,
+            'user_agent': 'curl/8.4.0', 'month': moment.strftime('%Y-%m')}
+
+def filled_store(report, moments):
+    store = report.AccessRecordStore()
+    for i, moment in enumerate(moments):
+        store.append(access_entry(moment, f'/page/{i}', ip=f'198.51.100.{i % 3}'))
+    return store
+
+def test_string_column_encodes_repeated_values_once(report):
+    column = report.StringColumn()
+    for value in ('a', 'b', 'a', 'c', 'a'):
+        column.append(value)
+    assert column.values == ['a', 'b', 'c']
+    assert [column[row] for row in range(len(column))] == ['a', 'b', 'a', 'c', 'a']
+    # The reverse index is rebuilt after unpickling
+    copy = pickle.loads(pickle.dumps(column))
+    copy.append('b')
+    assert copy.values == ['a', 'b', 'c'] and copy[5] == 'b'
+
+# Rows rebuild the timestamp the parser produced, offset or naive
+def test_rows_keep_timestamps_and_fields(report):
+    moments = [datetime(2024, 3, 5, 10, 0, tzinfo=timezone(timedelta(hours=-3))),
+               datetime(2024, 3, 5, 10, 0, tzinfo=timezone(timedelta(hours=5, minutes=30))),
+               datetime(2024, 3, 5, 10, 0)]
+    store = filled_store(report, moments)
+    assert [record.timestamp for record in store] == moments
+    assert [record.timestamp.utcoffset() for record in store] == [moment.utcoffset() for moment in moments]
+    record = store[1]
+    assert (record.ip, record.request, record.status, record.bytes_sent) == ('198.51.100.1', '/page/1', 200, 512)
+    assert store.ip.values == ['198.51.100.0', '198.51.100.1', '198.51.100.2']
+
+def test_error_rows_keep_level_message_and_client(report):
+    store = report.ErrorRecordStore()
+    moment = datetime(2024, 3, 5, 10, 0)
+    for level in ('error', 'warn', 'error'):
+        store.append({'timestamp': moment, 'level': level, 'message': f'{level} message', 'month': '2024-03',
+                      'module': 'core', 'pid': 7, 'client': '192.0.2.1', 'code': '-'})
+    assert [(record.timestamp, record.level, record.message) for record in store] == [
+        (moment, 'error', 'error message'), (moment, 'warn', 'warn message'), (moment, 'error', 'error message')]
+    assert (store[1].module, store[1].client) == ('core', '192.0.2.1')
+    assert store.level.values == ['error', 'warn']
+
+# Stores survive pickling, as the monthly tables read them after a round trip
+def test_store_pickles_with_its_rows(report):
+    moments = [datetime(2024, 1, 31, 23, 0, tzinfo=timezone.utc), datetime(2024, 2, 1, 1, 0, tzinfo=timezone.utc)]
+    store = filled_store(report, moments)
+    list(store.month_records('2024-01'))
+    copy = pickle.loads(pickle.dumps(store))
+    assert [record.timestamp for record in copy] == moments
+    assert copy.months() == ['2024-01', '2024-02']
+    assert [record.request for record in copy.month_records('2024-02')] == ['/page/1']
+
+def test_string_column_extend_remaps_codes(report):
+    first, second = report.StringColumn(), report.StringColumn()
+    for value in ('x', 'y'):
+        first.append(value)
+    for value in ('y', 'z', 'y'):
+        second.append(value)
+    first.extend(second)
+    assert [first[row] for row in range(len(first))] == ['x', 'y', 'y', 'z', 'y']
+    assert first.values == ['x', 'y', 'z']
+
+def test_extend_appends_in_order_and_keeps_months(report):
+    january = datetime(2024, 1, 15, tzinfo=timezone.utc)
+    first = filled_store(report, [january, january + timedelta(days=31)])
+    second = filled_store(report, [january + timedelta(hours=1), january + timedelta(days=40)])
+    first.extend(second)
+    assert [record.request for record in first] == ['/page/0', '/page/1', '/page/0', '/page/1']
+    assert [record.ip for record in first] == ['198.51.100.0', '198.51.100.1', '198.51.100.0', '198.51.100.1']
+    assert [record.timestamp for record in first.month_records('2024-01')] == [january, january + timedelta(hours=1)]
+    assert len(list(first.month_records('2024-02'))) == 2
+
+# Months are indexed at append time, in input order within each month
+def test_rows_are_partitioned_by_month(report):
+    moments = [datetime(2024, month, 1, tzinfo=timezone.utc) + timedelta(days=day)
+               for day in (0, 10) for month in (3, 1, 2)]
+    store = filled_store(report, moments)
+    assert store.months() == ['2024-01', '2024-02', '2024-03']
+    assert {month: list(rows) for month, rows in store.month_rows.items()} == {
+        '2024-03': [0, 3], '2024-01': [1, 4], '2024-02': [2, 5]}
+    assert [record.request for record in store.month_records('2024-03')] == ['/page/0', '/page/3']
+    assert list(store.month_records('2023-12')) == []
+
+# Merged month rows point past the rows already in the store
+def test_extend_shifts_month_rows(report):
+    january = datetime(2024, 1, 15, tzinfo=timezone.utc)
+    first = filled_store(report, [january, january + timedelta(days=31)])
+    second = filled_store(report, [january + timedelta(days=40), january + timedelta(hours=1)])
+    first.extend(second)
+    assert {month: list(rows) for month, rows in first.month_rows.items()} == {'2024-01': [0, 3], '2024-02': [1, 2]}
+    assert [record.timestamp for record in first.month_records('2024-02')] == [
+        january + timedelta(days=31), january + timedelta(days=40)]
+
+# With a limit each month keeps its first rows, whichever store they came from
+def test_extend_with_month_limit_keeps_first_rows(report):
+    january = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    february = datetime(2024, 2, 1, tzinfo=timezone.utc)
+    first = filled_store(report, [january, january, february])
+    second = filled_store(report, [february, january, february, january, february])
+    first.extend(second, month_limit=3)
+    assert first.month_count('2024-01') == 3
+    assert first.month_count('2024-02') == 3
+    assert [(record.timestamp.month, record.request) for record in first] == [
+        (1, '/page/0'), (1, '/page/1'), (2, '/page/2'), (2, '/page/0'), (1, '/page/1'), (2, '/page/2')]
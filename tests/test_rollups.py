@@ -0,0 +1,100 @@
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+START = datetime(2024, 4, 30, 22, 0, tzinfo=timezone(timedelta(hours=2)))
+
+def access_entries(report, count):
+    parse = report.access_log_parser(report.DEFAULT_LOG_FORMAT)
+    entries = []
+    for i in range(count):
+        stamp = (START + timedelta(seconds=i * 20)).strftime('%d/%b/%Y:%H:%M:%S %z')
+        status = (200, 301, 404, 503, 200)[i % 5]
+        entries.append(parse(f'192.0.2.1 - - [{stamp}] "GET /x HTTP/1.1" {status} {i} "-" "-"'))
+    return entries
+
+def error_entries(report, count):
+    entries = []
+    for i in range(count):
+        stamp = (START + timedelta(seconds=i * 45)).replace(tzinfo=None).strftime('%a %b %d %H:%M:%S %Y')
+        level = ('error', 'warn', 'crit')[i % 3]
+        entries.append(report.parse_error_log_line(f'[{stamp}] [{level}] [client 192.0.2.1] Something: {i}'))
+    return entries
+
+def filled_rollup(report, access, errors):
+    rollup = report.MinuteRollup()
+    for entry in access:
+        rollup.add_access(entry['timestamp'], entry['status'], entry['bytes_sent'])
+    for entry in errors:
+        rollup.add_error(entry['timestamp'], entry['level'])
+    return rollup
+
+def bucket_start(report, timestamp, step):
+    minute = report.rollup_minute(timestamp)
+    return report.rollup_datetime(minute - minute % step)
+
+# Series at any resolution give the totals counted straight from the entries,
+# bucketed on the log's own wall clock
+def test_series_match_entries(report):
+    access, errors = access_entries(report, 1000), error_entries(report, 300)
+    rollup = filled_rollup(report, access, errors)
+    for resolution, step in report.ROLLUP_RESOLUTIONS.items():
+        expected = {}
+        for entry in access:
+            totals = expected.setdefault(bucket_start(report, entry['timestamp'], step), Counter())
+            totals['requests'] += 1
+            totals['bytes'] += entry['bytes_sent']
+            totals['4xx'] += entry['status'] // 100 == 4
+        for entry in errors:
+            expected.setdefault(bucket_start(report, entry['timestamp'], step), Counter())['crit'] += entry['level'] == 'crit'
+        series = rollup.series(resolution=resolution)
+        assert [bucket for bucket, totals in series] == sorted(expected)
+        assert {bucket: {name: totals[name] for name in ('requests', 'bytes', '4xx', 'crit')} for bucket, totals in series} == \
+            {bucket: {name: totals[name] for name in ('requests', 'bytes', '4xx', 'crit')} for bucket, totals in expected.items()}
+    # Days follow the +02:00 wall clock of the log, not UTC
+    assert [bucket.day for bucket, totals in rollup.series(resolution='day')] == [30, 1]
+
+def test_series_range_is_half_open(report):
+    rollup = filled_rollup(report, access_entries(report, 1000), [])
+    start = datetime(2024, 4, 30, 23, 0)
+    series = rollup.series(start, start + timedelta(hours=1))
+    assert series[0][0] == start and series[-1][0] == start + timedelta(minutes=59)
+    assert sum(totals['requests'] for bucket, totals in series) == 180
+    assert rollup.series(datetime(2030, 1, 1), datetime(2030, 1, 2)) == []
+
+# Rollups of parts merge into the rollup of the whole; a coarsened copy has
+# one row per bucket and the same series at its resolution or above
+def test_merge_and_coarsen(report):
+    access, errors = access_entries(report, 1200), error_entries(report, 200)
+    whole = filled_rollup(report, access, errors)
+    merged = filled_rollup(report, access[600:], errors[100:])
+    merged.merge(filled_rollup(report, access[:600], errors[:100]))
+    assert merged.series() == whole.series()
+    hourly = whole.coarsened('hour')
+    assert len(hourly.minutes) == len(whole.series(resolution='hour'))
+    assert hourly.series(resolution='hour') == whole.series(resolution='hour')
+    assert hourly.series(resolution='day') == whole.series(resolution='day')
+
+def test_save_and_load(report, tmp_path, capsys):
+    rollup = filled_rollup(report, access_entries(report, 100), error_entries(report, 10))
+    rollup_path = str(tmp_path / 'rollup.pkl')
+    report.save_rollup(rollup_path, rollup)
+    loaded = report.load_rollup(rollup_path)
+    assert loaded.series() == rollup.series()
+    # The minute shortcut is not saved: the first new entry finds its row
+    loaded.add_access(START + timedelta(days=3), 200, 1)
+    assert loaded.series()[-1][1]['requests'] == 1
+    (tmp_path / 'broken.pkl').write_bytes(b'nope')
+    assert report.load_rollup(str(tmp_path / 'broken.pkl')) is None
+    assert 'No se pudo leer el resumen por minuto' in capsys.readouterr().out
+
+# --rollup saves the totals of a run and --rollup-query prints them later
+# without reading any log
+def test_rollup_query_command(report, tmp_path, monkeypatch, capsys):
+    rollup_path = str(tmp_path / 'rollup.pkl')
+    report.save_rollup(rollup_path, filled_rollup(report, access_entries(report, 1000), error_entries(report, 300)))
+    monkeypatch.setattr(report.sys, 'argv', ['httpd-fancyreport.py', '--rollup', rollup_path,
+                                             '--rollup-query', '2024-04-30T23:00', '2024-05-01', '--resolution', 'hour'])
+    report.main()
+    rows = [line.split('\t') for line in capsys.readouterr().out.splitlines()]
+    assert rows[0][:3] == ['inicio', 'requests', 'bytes']
+    assert [(row[0], row[1]) for row in rows[1:]] == [('2024-04-30 23:00', '180')]
@@ -0,0 +1,86 @@
+import pickle
+import random
+from collections import Counter
+
+import pytest
+
+@pytest.mark.parametrize('count', [10, 1000, 100000])
+def test_hyperloglog_estimate_within_error(report, count):
+    sketch = report.HyperLogLog()
+    for i in range(count):
+        sketch.add(f'198.51.{i // 256}.{i % 256}')
+        sketch.add(f'198.51.{i // 256}.{i % 256}')
+    # Three standard errors; small counts use linear counting and are near exact
+    assert abs(sketch.estimate() - count) <= max(1, 3 * sketch.relative_error() * count)
+
+# Sketches of overlapping sets merge into the sketch of their union
+def test_hyperloglog_merge_is_union(report):
+    first, second, union = report.HyperLogLog(), report.HyperLogLog(), report.HyperLogLog()
+    for i in range(30000):
+        first.add(str(i))
+        union.add(str(i))
+    for i in range(20000, 60000):
+        second.add(str(i))
+        union.add(str(i))
+    first.merge(second)
+    assert first.registers == union.registers
+    assert abs(first.estimate() - 60000) <= 3 * first.relative_error() * 60000
+
+def zipf_stream(keys, length, seed=7):
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(keys)]
+    return [f'/page/{key}' for key in rng.choices(range(keys), weights, k=length)]
+
+# Counts are never below the true count and at most floor above it, and the
+# heavy hitters come out in the right order
+def test_space_saving_bounds(report):
+    stream = zipf_stream(5000, 50000)
+    exact = Counter(stream)
+    sketch = report.SpaceSaving(capacity=100)
+    for url in stream:
+        sketch[url] += 1
+    assert len(sketch) <= 200 and sketch.floor > 0
+    for url, count in sketch.items():
+        assert exact[url] <= count <= exact[url] + sketch.floor
+    assert [url for url, count in sketch.most_common(5)] == [url for url, count in exact.most_common(5)]
+
+# Merged sketches, and sketches merged with exact counters, keep the bounds
+def test_space_saving_merge_bounds(report):
+    streams = [zipf_stream(3000, 20000, seed) for seed in (1, 2, 3)]
+    exact = Counter()
+    merged = report.SpaceSaving(capacity=100)
+    for stream in streams:
+        exact.update(stream)
+        sketch = report.SpaceSaving(capacity=100)
+        for url in stream:
+            sketch[url] += 1
+        merged.update(sketch)
+    merged.update(Counter({'/page/0': 5, '/only-exact': 3}))
+    exact.update({'/page/0': 5, '/only-exact': 3})
+    for url, count in merged.items():
+        assert exact[url] <= count <= exact[url] + merged.floor
+    assert merged.most_common(1)[0][0] == '/page/0'
+
+def test_space_saving_pickles_with_capacity(report):
+    sketch = report.SpaceSaving(capacity=3)
+    for url in 'abcdefgaab':
+        sketch[url] += 1
+    copy = pickle.loads(pickle.dumps(sketch))
+    assert (copy.capacity, copy.floor, dict(copy)) == (3, sketch.floor, dict(sketch))
+
+# --approximate keeps unique visitors and rankings close to the exact run
+def test_approximate_aggregate_is_close_to_exact(report):
+    parse = report.access_log_parser(report.DEFAULT_LOG_FORMAT)
+    entries = []
+    for i, url in enumerate(zipf_stream(5000, 20000)):
+        ip = f'10.{i % 7}.{(i * 31) % 256}.{(i * 17) % 250}'
+        entries.append(parse(f'{ip} - - [05/Mar/2024:10:{i // 1000 % 60:02d}:00 +0000] "GET {url} HTTP/1.1" 200 10 "-" "-"'))
+    exact = report.ReportAggregator()
+    approximate = report.ReportAggregator(approximate=True)
+    for entry in entries:
+        exact.add_access(entry)
+        approximate.add_access(entry)
+    visitors = len(exact.ip_counter)
+    assert abs(approximate.visitors.estimate() - visitors) <= 3 * approximate.visitors.relative_error() * visitors
+    assert [url for url, count in approximate.url_counter.most_common(3)] == \
+        [url for url, count in exact.url_counter.most_common(3)]
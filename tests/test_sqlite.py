@@ -0,0 +1,98 @@
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+LOG_FORMAT = '%h %l %u %t "%r" %>s %b "%{Referer}i" "%{User-Agent}i" %D'
+START = datetime(2024, 6, 30, 23, 0, tzinfo=timezone(timedelta(hours=-4)))
+
+def access_lines(logs, first, count):
+    return logs.access_lines(first, count, START, 7, 13, 8, (200, 404, 500), referers=2, agents=4, response_time=True)
+
+@pytest.fixture
+def log_dir(logs):
+    logs.write('access_log', access_lines(logs, 0, 1500) + 'not a log line\n')
+    logs.write('error_log', logs.error_lines(0, 200, START, 30))
+    return logs.path
+
+def export(report, log_dir, db_path):
+    report.export_logs_to_sqlite(str(log_dir), str(db_path), LOG_FORMAT)
+
+def parse_logs(report, log_dir, time_range=None):
+    aggregator = report.ReportAggregator(log_format=LOG_FORMAT, time_range=time_range)
+    report.parse_access_logs(str(log_dir), aggregator)
+    report.parse_error_logs(str(log_dir), aggregator)
+    return aggregator
+
+def from_sqlite(report, db_path, time_range=None):
+    return report.aggregate_sqlite(str(db_path), report.ReportAggregator(log_format=LOG_FORMAT, time_range=time_range))
+
+def table_count(db_path, table):
+    with sqlite3.connect(db_path) as connection:
+        return connection.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+# A report from the database counts what a report from the logs counts,
+# offsets, latencies and 2.4 error fields included
+def test_report_from_sqlite_matches_logs(report, totals, log_dir, tmp_path):
+    db_path = tmp_path / 'logs.db'
+    export(report, log_dir, db_path)
+    parsed = parse_logs(report, log_dir)
+    loaded = from_sqlite(report, db_path)
+    assert totals(loaded) == totals(parsed)
+    assert report.response_percentiles(loaded, ['/page/1']) == report.response_percentiles(parsed, ['/page/1'])
+    assert [record.timestamp.utcoffset() for record in loaded.access_records][:1] == [timedelta(hours=-4)]
+    with sqlite3.connect(db_path) as connection:
+        assert connection.execute("SELECT referer, response_time FROM access WHERE rowid = 2").fetchone() == \
+            ('https://example.com/1', 97)
+        assert connection.execute("SELECT module, pid, client, code FROM errors WHERE rowid = 1").fetchone() == \
+            ('core', 0, '192.0.2.0', 'AH00128')
+        indexes = {name for (name,) in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {'access_time', 'access_status', 'access_ip', 'access_url', 'errors_time'} <= indexes
+
+@pytest.mark.parametrize('since, until', [(datetime(2024, 7, 1, 0, 30), None), (None, datetime(2024, 6, 30, 23, 45)),
+                                          (datetime(2024, 6, 30, 23, 20), datetime(2024, 7, 1, 1, 0))])
+def test_time_range_from_sqlite_matches_logs(report, totals, log_dir, tmp_path, since, until):
+    db_path = tmp_path / 'logs.db'
+    export(report, log_dir, db_path)
+    assert totals(from_sqlite(report, db_path, (since, until))) == totals(parse_logs(report, log_dir, (since, until)))
+
+# Each export appends only the lines the logs gained, across a rotation too
+def test_export_appends_only_new_lines(report, logs, log_dir, tmp_path, capsys):
+    db_path = tmp_path / 'logs.db'
+    export(report, log_dir, db_path)
+    assert (table_count(db_path, 'access'), table_count(db_path, 'errors')) == (1500, 200)
+    export(report, log_dir, db_path)
+    assert (table_count(db_path, 'access'), table_count(db_path, 'errors')) == (1500, 200)
+
+    logs.write('access_log', access_lines(logs, 1500, 100), append=True)
+    os.rename(log_dir / 'access_log', log_dir / 'access_log.1')
+    logs.write('access_log', access_lines(logs, 1600, 50))
+    capsys.readouterr()
+    export(report, log_dir, db_path)
+    output = capsys.readouterr().out
+    assert 'Exportadas 100 entradas nuevas' in output and 'Exportadas 50 entradas nuevas' in output
+    assert table_count(db_path, 'access') == 1650
+    with sqlite3.connect(db_path) as connection:
+        assert connection.execute('SELECT COUNT(DISTINCT time || url || ip) FROM access').fetchone()[0] == 1650
+
+def test_query_prints_rows_and_schema(report, log_dir, tmp_path, capsys):
+    db_path = tmp_path / 'logs.db'
+    export(report, log_dir, db_path)
+    capsys.readouterr()
+    report.run_query([str(db_path), 'SELECT status, COUNT(*) AS n FROM access GROUP BY status ORDER BY status'])
+    assert capsys.readouterr().out.splitlines() == ['status\tn', '200\t500', '404\t500', '500\t500']
+    report.run_query([str(db_path)])
+    assert 'access (1500 filas): time, utc_offset, ip' in capsys.readouterr().out
+
+# Queries run read-only, and SQL errors are reported without a traceback
+def test_query_cannot_change_the_database(report, log_dir, tmp_path, capsys):
+    db_path = tmp_path / 'logs.db'
+    export(report, log_dir, db_path)
+    for sql in ('DELETE FROM access', 'SELECT nope FROM access'):
+        with pytest.raises(SystemExit):
+            report.run_query([str(db_path), sql])
+        assert 'Error de SQLite' in capsys.readouterr().out
+    assert table_count(db_path, 'access') == 1500
+    with pytest.raises(SystemExit):
+        report.run_query([str(tmp_path / 'missing.db'), 'SELECT 1'])
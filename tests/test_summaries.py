@@ -0,0 +1,99 @@
+import gzip
+import json
+from types import SimpleNamespace
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+START = datetime(2024, 1, 30, 12, 0, tzinfo=timezone(timedelta(hours=-3)))
+
+# Aggregate with every part a summary carries: counters, histograms, months,
+# rollup, incidents, rejected lines and detail rows
+def sample_aggregator(report, **settings):
+    aggregator = report.ReportAggregator(detail_limit=20, **settings)
+    for i in range(3000):
+        timestamp = START + timedelta(seconds=i * 2)
+        aggregator.add_access({
+            'ip': '192.0.2.1' if i % 2 else f'198.51.100.{i % 50}', 'timestamp': timestamp, 'method': 'GET',
+            'request': f'/item/{i % 40}?ref={i}', 'status': 404 if i % 7 == 0 else 200, 'bytes_sent': i * 13,
+            'user_agent': f'agent-{i % 5}', 'response_time': i * 101, 'month': timestamp.strftime('%Y-%m'),
+        })
+    for i in range(300):
+        timestamp = (START + timedelta(seconds=i * 3)).replace(tzinfo=None)
+        aggregator.add_error({
+            'timestamp': timestamp, 'level': 'error', 'message': f'File does not exist: /var/www/{i}',
+            'month': timestamp.strftime('%Y-%m'), 'module': 'core', 'pid': i, 'client': '192.0.2.1', 'code': '-',
+        })
+    aggregator.rejected_lines['access'] += 3
+    return aggregator
+
+def save_and_load(report, tmp_path, aggregator, name='node.summary'):
+    summary_path = str(tmp_path / name)
+    report.save_summary(summary_path, aggregator, '/var/log/httpd')
+    return summary_path, report.load_summary(summary_path)
+
+def as_json(data):
+    return json.loads(json.dumps(data))
+
+@pytest.mark.parametrize('approximate', [False, True])
+def test_summary_round_trip(report, tmp_path, approximate):
+    aggregator = sample_aggregator(report, approximate=approximate, url_normalizer=report.UrlNormalizer())
+    summary_path, summary = save_and_load(report, tmp_path, aggregator)
+    loaded = summary['aggregator']
+    assert as_json(report.aggregator_data(loaded)) == as_json(report.aggregator_data(aggregator))
+    assert report.summary_settings(loaded) == report.summary_settings(aggregator)
+    assert report.generate_access_summary(loaded) == report.generate_access_summary(aggregator)
+    assert report.generate_error_summary(loaded) == report.generate_error_summary(aggregator)
+    assert [vars(incident) for incident in loaded.detector.report()] == \
+        [vars(incident) for incident in aggregator.detector.report()]
+    assert len(aggregator.detector.incidents) > 0
+    assert [tuple(record.timestamp.isoformat() for record in store) for store in
+            (loaded.access_records, loaded.error_records)] == \
+        [tuple(record.timestamp.isoformat() for record in store) for store in
+         (aggregator.access_records, aggregator.error_records)]
+    assert loaded.rollup.series() == aggregator.rollup.series()
+    # A loaded summary merges like the aggregate it came from
+    merged = report.ReportAggregator(approximate=approximate).merge(loaded)
+    assert merged.total_requests == aggregator.total_requests
+
+# Summaries are plain JSON: nothing in them is unpickled or executed
+def test_summary_is_plain_json(report, tmp_path):
+    summary_path, summary = save_and_load(report, tmp_path, sample_aggregator(report))
+    with gzip.open(summary_path, 'rt', encoding='utf-8') as f:
+        data = json.load(f)
+    assert data['format'] == report.SUMMARY_FORMAT
+    assert data['version'] == report.SUMMARY_VERSION
+    assert data['settings']['log_format'] == 'combined'
+
+def test_damaged_summary_is_rejected(report, tmp_path):
+    summary_path = str(tmp_path / 'bad.summary')
+    with gzip.open(summary_path, 'wt', encoding='utf-8') as f:
+        json.dump({'format': report.SUMMARY_FORMAT, 'version': report.SUMMARY_VERSION, 'settings': {}, 'aggregate': {}}, f)
+    assert report.load_summary(summary_path) is None
+    with open(summary_path, 'wb') as f:
+        f.write(b'\x80\x04not a summary')
+    assert report.load_summary(summary_path) is None
+
+@pytest.mark.parametrize('other_settings, setting', [
+    (lambda report: {'approximate': True}, '--approximate'),
+    (lambda report: {'log_format': 'common'}, '--log-format'),
+    (lambda report: {'url_normalizer': report.UrlNormalizer()}, 'agrupación de URL'),
+    (lambda report: {'detector': report.IncidentDetector(window=5)}, 'umbrales de incidentes'),
+])
+def test_merge_rejects_different_settings(report, tmp_path, capsys, other_settings, setting):
+    first_path, first = save_and_load(report, tmp_path, sample_aggregator(report), 'first.summary')
+    second_path, second = save_and_load(report, tmp_path, sample_aggregator(report, **other_settings(report)),
+                                        'second.summary')
+    args = SimpleNamespace(summaries=[first_path, second_path], pdf='none', detail_rows=0)
+    with pytest.raises(SystemExit):
+        report.merge_summaries(args, report.RunMetrics())
+    assert setting in capsys.readouterr().out
+
+def test_summary_with_other_histogram_layout_is_rejected(report, tmp_path):
+    summary_path, summary = save_and_load(report, tmp_path, sample_aggregator(report))
+    with gzip.open(summary_path, 'rt', encoding='utf-8') as f:
+        data = json.load(f)
+    data['settings']['histogram_sub_bucket_bits'] = report.HISTOGRAM_SUB_BUCKET_BITS + 1
+    with gzip.open(summary_path, 'wt', encoding='utf-8') as f:
+        json.dump(data, f)
+    assert report.load_summary(summary_path) is None
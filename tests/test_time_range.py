@@ -0,0 +1,120 @@
+import gzip
+import argparse
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+START = datetime(2024, 8, 1, tzinfo=timezone(timedelta(hours=3)))
+
+# One line every 10 seconds over three days; every 50th request is logged
+# a minute late, as slow requests are
+def access_lines(first_day, days):
+    lines = []
+    for i in range(first_day * 8640, (first_day + days) * 8640):
+        moment = START + timedelta(seconds=i * 10)
+        if i % 50 == 0:
+            moment -= timedelta(minutes=1)
+        stamp = moment.strftime('%d/%b/%Y:%H:%M:%S %z')
+        lines.append(f'198.51.100.{i % 31} - - [{stamp}] "GET /page/{i % 11} HTTP/1.1" 200 {i % 900} "-" "curl/8.4.0"\n')
+    return lines
+
+# A compressed rotation for the first day, a plain one for the second and
+# the current log for the third
+@pytest.fixture(scope='module')
+def log_dir(tmp_path_factory):
+    log_dir = tmp_path_factory.mktemp('logs')
+    with gzip.open(log_dir / 'access_log.2.gz', 'wt') as f:
+        f.writelines(access_lines(0, 1))
+    (log_dir / 'access_log.1').write_text(''.join(access_lines(1, 1)))
+    (log_dir / 'access_log').write_text(''.join(access_lines(2, 1)))
+    return log_dir
+
+def parse_range(report, log_dir, since, until, jobs=1, cache=None):
+    aggregator = report.ReportAggregator(time_range=(since, until))
+    report.parse_access_logs(str(log_dir), aggregator, jobs, 256 * 1024, cache)
+    return aggregator
+
+# The entries of the range straight from every line
+def filter_lines(report, since, until):
+    parse = report.access_log_parser(report.DEFAULT_LOG_FORMAT)
+    aggregator = report.ReportAggregator()
+    for line in access_lines(0, 3):
+        entry = parse(line)
+        wall = entry['timestamp'].replace(tzinfo=None)
+        if (since is None or wall >= since) and (until is None or wall < until):
+            aggregator.add_access(entry)
+    return aggregator
+
+RANGES = [
+    (datetime(2024, 8, 2, 6, 0), None),
+    (None, datetime(2024, 8, 1, 12, 0)),
+    (datetime(2024, 8, 1, 23, 58), datetime(2024, 8, 2, 0, 3)),
+    (datetime(2024, 8, 2, 12, 0), datetime(2024, 8, 3, 12, 0)),
+    (datetime(2024, 9, 1), None),
+]
+
+@pytest.mark.parametrize('since, until', RANGES)
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_time_range_matches_filtering_every_line(report, totals, log_dir, since, until, jobs):
+    assert totals(parse_range(report, log_dir, since, until, jobs)) == totals(filter_lines(report, since, until))
+
+@pytest.mark.parametrize('since, until', RANGES[:3])
+def test_cached_time_range_matches_uncached(report, totals, log_dir, tmp_path, since, until):
+    cache = report.ParseCache(str(tmp_path / 'cache'), 1 << 30)
+    expected = totals(filter_lines(report, since, until))
+    assert totals(parse_range(report, log_dir, since, until, cache=cache)) == expected
+    assert totals(parse_range(report, log_dir, since, until, cache=cache)) == expected
+
+# Rotations outside the range are skipped, the log the range starts in is
+# read from a sought offset, and only logs wholly inside are unfiltered
+def test_plan_skips_and_seeks(report, log_dir, tmp_path, monkeypatch, capsys):
+    log_files = report.find_log_files(str(log_dir), 'access_log')
+    cache = report.ParseCache(str(tmp_path / 'cache'), 1 << 30)
+    aggregator = report.ReportAggregator(time_range=(datetime(2024, 8, 2, 6, 0), None))
+    plan = {path.rsplit('/', 1)[1]: (start, filtered) for path, start, filtered in
+            report.plan_time_range(log_files, 'access', aggregator, cache)}
+    assert 'Se omite' in capsys.readouterr().out
+    assert set(plan) == {'access_log', 'access_log.1'}
+    assert plan['access_log'] == (0, False)
+    start, filtered = plan['access_log.1']
+    assert filtered and 0 < start < (log_dir / 'access_log.1').stat().st_size // 3
+
+    # The span of the compressed rotation is remembered in the cache
+    log_time_span = report.log_time_span
+
+    def span_of_plain_logs(file_path, *args, **kwargs):
+        assert not file_path.endswith('.gz'), f"{file_path} se descomprimió de nuevo"
+        return log_time_span(file_path, *args, **kwargs)
+    monkeypatch.setattr(report, 'log_time_span', span_of_plain_logs)
+    report.plan_time_range(log_files, 'access', aggregator, cache)
+    monkeypatch.undo()
+
+    aggregator = report.ReportAggregator(time_range=(None, datetime(2024, 8, 1, 12, 0)))
+    plan = report.plan_time_range(log_files, 'access', aggregator)
+    assert [(path.rsplit('/', 1)[1], start) for path, start, filtered in plan] == [('access_log.2.gz', 0)]
+
+# The sought offset starts a line, and every line before it is older than
+# the bound
+@pytest.mark.parametrize('hour', [0, 1, 7, 13, 23])
+def test_seek_log_time_lands_before_bound(report, log_dir, hour):
+    log_path = log_dir / 'access_log.1'
+    data = log_path.read_bytes()
+    bound = datetime(2024, 8, 2, hour, 30)
+    offset = report.seek_log_time(str(log_path), 'access', report.DEFAULT_LOG_FORMAT, bound)
+    assert offset == 0 or data[offset - 1:offset] == b'\n'
+    parse = report.access_log_parser(report.DEFAULT_LOG_FORMAT)
+    assert all(parse(line)['timestamp'].replace(tzinfo=None) < bound for line in report.decode_log_lines(data[:offset]))
+    # Within a few seek windows of the first line at the bound
+    position = 0
+    for line in data.splitlines(keepends=True):
+        if parse(line.decode()[:-1])['timestamp'].replace(tzinfo=None) >= bound:
+            break
+        position += len(line)
+    assert position - 2 * report.SEEK_WINDOW <= offset <= position
+
+def test_parse_time_bound(report):
+    assert report.parse_time_bound('2024-05-01') == datetime(2024, 5, 1)
+    assert report.parse_time_bound('2024-05-01T12:30') == datetime(2024, 5, 1, 12, 30)
+    for value in ('2024-05-01T12:00+02:00', 'mayo'):
+        with pytest.raises(argparse.ArgumentTypeError):
+            report.parse_time_bound(value)
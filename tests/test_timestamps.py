@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+OFFSETS = ('+0000', '-0000', '+0100', '-0300', '+0530', '-0930', '+0545', '+1245', '-1200', '+1400')
+
+# Stamps the fast decoder must read exactly like the strptime fallback:
+# every month, positive and negative offsets with and without minutes, and
+# day, month, year and leap-day boundaries
+def valid_stamps():
+    stamps = [f'15/{month}/2024:12:34:56 {offset}' for month in MONTHS for offset in OFFSETS]
+    stamps += [
+        '01/Jan/2024:00:00:00 +0000',
+        '31/Dec/2023:23:59:59 -0000',
+        '31/Dec/1999:23:59:59 +1400',
+        '01/Jan/2000:00:00:00 -1200',
+        '29/Feb/2024:12:00:00 +0100',
+        '28/Feb/2023:23:59:59 -0300',
+        '01/Mar/2023:00:00:00 -0300',
+        '30/Apr/2024:23:59:59 +0545',
+        '31/Jan/2024:00:00:01 -0930',
+        '31/Dec/9999:23:59:59 +0000',
+    ]
+    start = datetime(2023, 12, 30, 22, 0, 0)
+    for hours in range(0, 80, 7):
+        moment = start + timedelta(hours=hours, minutes=hours, seconds=hours)
+        stamps.append(moment.strftime('%d/%b/%Y:%H:%M:%S') + ' -0300')
+    return stamps
+
+# Stamps the fast decoder must refuse, so they go through the fallback:
+# missing offset, odd spacing or separators, years with leading zeros and
+# out of range fields. Some of them the fallback can still read.
+MALFORMED_STAMPS = [
+    '09/Sep/0001:09:09:09 +0000',
+    '15/Jan/2024:12:34:56',
+    '15/Jan/2024:12:34:56  +0000',
+    '15/Jan/2024 12:34:56 +0000',
+    '15-Jan-2024:12:34:56 +0000',
+    '5/Jan/2024:12:34:56 +0000',
+    '15/jan/2024:12:34:56 +0000',
+    '15/Foo/2024:12:34:56 +0000',
+    '30/Feb/2024:12:00:00 +0000',
+    '29/Feb/2023:12:00:00 +0000',
+    '32/Jan/2024:12:00:00 +0000',
+    '00/Jan/2024:12:00:00 +0000',
+    '15/Jan/2024:24:00:00 +0000',
+    '15/Jan/2024:12:60:00 +0000',
+    '15/Jan/2024:12:00:60 +0000',
+    '15/Jan/2024:12:00:00 +0060',
+    '15/Jan/2024:12:00:00 *0000',
+    '15/Jan/2024:12:00:00 +00a0',
+    '15/Jan/0000:12:00:00 +0000',
+    '１5/Jan/2024:12:00:00 +0000',
+    '',
+    'garbage',
+]
+
+def same_timestamp(first, second):
+    if first is None or second is None:
+        return first is second
+    # datetime equality ignores the offset, so compare it separately
+    return first == second and first.utcoffset() == second.utcoffset() and first.tzinfo is not None
+
+@pytest.mark.parametrize('stamp', valid_stamps())
+def test_fast_decoder_matches_fallback(report, stamp):
+    fast = report.decode_apache_timestamp(stamp)
+    fallback = report.parse_apache_timestamp_fallback(stamp)
+    assert fast is not None
+    assert same_timestamp(fast[0], fallback[0])
+    assert fast[1] == fallback[1]
+
+@pytest.mark.parametrize('stamp', MALFORMED_STAMPS)
+def test_malformed_stamps_fall_back(report, stamp):
+    assert report.decode_apache_timestamp(stamp) is None
+    parsed = report.parse_access_timestamp(stamp)
+    fallback = report.parse_apache_timestamp_fallback(stamp)
+    assert parsed[1] == fallback[1]
+    if fallback[0] is None:
+        assert parsed[0] is None
+    else:
+        assert parsed[0] == fallback[0] and parsed[0].utcoffset() == fallback[0].utcoffset()
+
+def access_line(stamp):
+    return (f'203.0.113.7 - frank [{stamp}] "GET /index.html?q=1 HTTP/1.1" 200 2326 '
+            f'"https://example.com/" "Mozilla/5.0 (X11; Linux x86_64)"\n')
+
+# Whole records of the cached fast path against records whose timestamp and
+# month come from the fallback, for valid and malformed stamps alike. A
+# stamp the fallback cannot read rejects the line.
+@pytest.mark.parametrize('stamp', valid_stamps() + MALFORMED_STAMPS)
+def test_records_match_fallback(report, stamp):
+    parse = report.access_log_parser(report.DEFAULT_LOG_FORMAT)
+    # Parse twice so the second record comes from the timestamp cache
+    for attempt in range(2):
+        record = parse(access_line(stamp))
+        timestamp, month = report.parse_apache_timestamp_fallback(stamp)
+        if timestamp is None:
+            assert record is None
+            continue
+        expected = {
+            'ip': '203.0.113.7', 'timestamp': timestamp, 'method': 'GET', 'request': '/index.html?q=1',
+            'status': 200, 'bytes_sent': 2326, 'user_agent': 'Mozilla/5.0 (X11; Linux x86_64)', 'response_time': None,
+            'month': month,
+        }
+        assert record == expected
+        assert record['timestamp'].utcoffset() == timestamp.utcoffset()
+
+# parse_access_log_line returns every field of the combined format
+@pytest.mark.parametrize('stamp', valid_stamps() + MALFORMED_STAMPS)
+def test_full_records_match_fallback(report, stamp):
+    record = report.parse_access_log_line(access_line(stamp))
+    timestamp, month = report.parse_apache_timestamp_fallback(stamp)
+    if timestamp is None:
+        assert record is None
+        return
+    assert record == {
+        'ip': '203.0.113.7', 'ident': '-', 'authuser': 'frank', 'timestamp': timestamp,
+        'method': 'GET', 'request': '/index.html?q=1', 'protocol': 'HTTP/1.1', 'status': 200,
+        'bytes_sent': 2326, 'referer': 'https://example.com/', 'user_agent': 'Mozilla/5.0 (X11; Linux x86_64)',
+        'month': month,
+    }
@@ -0,0 +1,80 @@
+import pickle
+import argparse
+
+import pytest
+
+UUID = '3f2504e0-4f89-11d3-9a0c-0305e82c3301'
+
+@pytest.mark.parametrize('url, canonical', [
+    ('/', '/'),
+    ('/index.html', '/index.html'),
+    ('/product/123', '/product/{id}'),
+    ('/product/123/reviews/7?page=2', '/product/{id}/reviews/{id}'),
+    (f'/orders/{UUID}/', '/orders/{uuid}/'),
+    (f'/orders/{UUID.upper()}', '/orders/{uuid}'),
+    # Only whole segments are placeholders
+    ('/v2/item-12/abc123', '/v2/item-12/abc123'),
+    ('/search?q=shoes&page=3', '/search'),
+])
+def test_default_rules(report, url, canonical):
+    assert report.UrlNormalizer().canonical(url) == canonical
+
+@pytest.mark.parametrize('url, canonical', [
+    ('/product/abc-shoe/reviews', '/product/{slug}/reviews'),
+    ('/product/abc-shoe/reviews/', '/product/{slug}/reviews'),
+    ('/product/42/reviews?sort=new', '/product/{slug}/reviews'),
+    # Routes match whole paths and a placeholder is one non-empty segment
+    ('/product//reviews', '/product//reviews'),
+    ('/product/a/b/reviews', '/product/a/b/reviews'),
+    ('/product/abc-shoe/reviews/9', '/product/abc-shoe/reviews/{id}'),
+    # The first matching route wins
+    ('/static/app.js', '/static/{file}'),
+    ('/static/12', '/static/{file}'),
+])
+def test_routes(report, url, canonical):
+    normalizer = report.UrlNormalizer(['/product/{slug}/reviews', '/static/{file}', '/static/{id}'])
+    assert normalizer.canonical(url) == canonical
+
+# Kept parameters are sorted by name, so their order in the URL does not matter
+def test_keep_query_params(report):
+    normalizer = report.UrlNormalizer(keep_query=['page', 'lang'])
+    assert normalizer.canonical('/list/5?session=x&page=2&lang=es') == '/list/{id}?lang=es&page=2'
+    assert normalizer.canonical('/list/5?lang=es&page=2') == '/list/{id}?lang=es&page=2'
+    assert normalizer.canonical('/list/5?session=x') == '/list/{id}'
+    assert normalizer.canonical('/list/5?page') == '/list/{id}?page'
+
+def test_normalizer_pickles_its_rules(report):
+    normalizer = report.UrlNormalizer(['/a/{x}'], ['q'])
+    normalizer.canonical('/a/1')
+    copy = pickle.loads(pickle.dumps(normalizer))
+    assert copy == normalizer and copy.canonical('/a/2?q=1&r=2') == '/a/{x}?q=1'
+    assert copy != report.UrlNormalizer(['/a/{x}'])
+
+# Counters, monthly rankings and per-URL histograms use the canonical URL,
+# while the detail rows keep the raw one
+def test_aggregator_counts_canonical_urls(report):
+    aggregator = report.ReportAggregator(url_normalizer=report.UrlNormalizer(['/user/{name}']))
+    parse = report.access_log_parser(report.DEFAULT_LOG_FORMAT)
+    for url in ('/user/ana', '/user/bo?x=1', '/item/1', '/item/2', '/item/3'):
+        aggregator.add_access(parse(f'192.0.2.1 - - [05/Mar/2024:10:00:00 +0000] "GET {url} HTTP/1.1" 200 1 "-" "-"'))
+    assert aggregator.url_counter == {'/item/{id}': 3, '/user/{name}': 2}
+    assert aggregator.months['2024-03'].url_counter == aggregator.url_counter
+    assert set(aggregator.url_distributions) == {'/item/{id}', '/user/{name}'}
+    assert [record.request for record in aggregator.access_records][:2] == ['/user/ana', '/user/bo?x=1']
+
+# Different rules must never share cached partials or merge into one report
+def test_rules_change_cache_variant_and_settings(report):
+    variants = {report.ReportAggregator(url_normalizer=normalizer).cache_variant()
+                for normalizer in (None, report.UrlNormalizer(), report.UrlNormalizer(['/a/{x}']),
+                                   report.UrlNormalizer(keep_query=['q']))}
+    assert len(variants) == 4
+    assert report.ReportAggregator(url_normalizer=report.UrlNormalizer(['/a/{x}'])).settings() != \
+        report.ReportAggregator(url_normalizer=report.UrlNormalizer()).settings()
+
+def test_command_line_options(report):
+    args = report.parse_arguments(['logs', '--route', '/p/{id}/r', '--keep-query-param', 'page'])
+    assert report.url_normalizer_from_args(args) == report.UrlNormalizer(['/p/{id}/r'], ['page'])
+    assert report.url_normalizer_from_args(report.parse_arguments(['logs'])) is None
+    assert report.url_normalizer_from_args(report.parse_arguments(['logs', '--normalize-urls'])) == report.UrlNormalizer()
+    with pytest.raises(argparse.ArgumentTypeError):
+        report.parse_route('p/{id}')